@@ -1,10 +1,11 @@
 import re
-import sys
-from typing import Dict, List, NamedTuple
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Pattern, Tuple
 
 import numpy as np
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.sparql import WIKIDATA_ENDPOINT, get_batched_query_values
 
 
 class LiteralSyntaxResult(NamedTuple):
@@ -22,62 +23,95 @@ class LiteralSyntaxResult(NamedTuple):
         return 1-(self.fails/self.total)
 
 
+# the number of the distinct literals matched by each task of the process pool
+LITERALS_CHUNK_SIZE = 1 << 16
+
+
+def compile_regexes(regexes: List[str]) -> Tuple[List[Pattern], List[str]]:
+    """
+    the compiled regexes and the regexes which are not compiled
+    """
+    patterns, errors = [], []
+    for regex in regexes:
+        try:
+            patterns.append(re.compile(regex))
+        except re.error:
+            errors.append(regex)
+    return patterns, errors
+
+
+def get_failed_values(regexes: List[str], values: List[str]) -> List[str]:
+    """
+    the values which match none of the regexes
+    """
+    patterns = compile_regexes(regexes)[0]
+    return [value for value in values if not any(pattern.match(value) for pattern in patterns)]
+
+
+def _get_chunk_failed_values(task: Tuple[List[str], List[str]]) -> List[str]:
+    return get_failed_values(*task)
+
+
 class WikibaseRefLiteralSyntaxChecker:
     results: List[LiteralSyntaxResult] = None
     _properties_values: Dict
     _regexes: Dict
+    _endpoint: str = WIKIDATA_ENDPOINT
+    _jobs: int = 1
 
-    def __init__(self, prop_vals: Dict, regexes: Dict = None):
+    def __init__(self, prop_vals: Dict, regexes: Dict = None, endpoint: str = WIKIDATA_ENDPOINT, jobs: int = 1):
         self._properties_values = prop_vals
+        self._endpoint = endpoint
+        self._jobs = max(1, jobs)
         if regexes == None:
             self._regexes = self.get_property_regex_from_Wikidata()
         else:
             self._regexes = regexes
 
     def check_literals_regex(self) -> List[LiteralSyntaxResult]:
+        """
+        count the literals of each property which match none of its regexes.
+        The regexes are compiled once per property, and with jobs > 1 the
+        literals are matched in chunks by a pool of processes
+        """
         self.results = []
+        # the distinct literals of each property are matched once
+        counts, tasks = {}, []
         for prop in self._properties_values.keys():
+            if len(self._regexes[str(prop)]) > 0:
+                counts[str(prop)] = Counter(self._properties_values[str(prop)])
+                distinct = list(counts[str(prop)])
+                tasks.extend((self._regexes[str(prop)], distinct[start:start + LITERALS_CHUNK_SIZE])
+                             for start in range(0, len(distinct), LITERALS_CHUNK_SIZE))
+        if self._jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(self._jobs) as executor:
+                failed = iter(list(executor.map(_get_chunk_failed_values, tasks)))
+        else:
+            failed = map(_get_chunk_failed_values, tasks)
+        for prop in self._properties_values.keys():
+            values = self._properties_values[str(prop)]
             # return an empty result (only not_exists tag=true) for properties that have not any regex in Wikidata
             if len(self._regexes[str(prop)]) == 0:
-                self.results.append(LiteralSyntaxResult(str(prop), len(
-                    self._properties_values[str(prop)]), np.nan, np.nan, 0))
+                self.results.append(LiteralSyntaxResult(
+                    str(prop), len(values), np.nan, np.nan, 0))
                 continue
-
             num_fails = 0
-            errors = []
-            for value in self._properties_values[str(prop)]:
-                for regex in self._regexes[str(prop)]:
-                    if regex in errors:
-                        continue
-                    try:
-                        pattern = re.compile(regex)
-                        if bool(re.match(pattern, value)):
-                            failed = False
-                            break
-                    except re.error as err:
-                        errors.append(regex)
-                        continue
-                if failed:
-                    num_fails += 1
+            for _ in range(0, len(counts[str(prop)]), LITERALS_CHUNK_SIZE):
+                num_fails += sum(counts[str(prop)][value]
+                                 for value in next(failed))
+            errors = compile_regexes(self._regexes[str(prop)])[1]
             self.results.append(LiteralSyntaxResult(str(prop), len(
-                self._properties_values[str(prop)]), num_fails, len(errors), len(self._regexes[str(prop)])))
+                values), num_fails, len(errors), len(self._regexes[str(prop)])))
         return self.results
 
     def get_property_regex_from_Wikidata(self) -> Dict:
-        ret_val = Dict.fromkeys(self._properties_values.keys())
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
-        for prop in self._properties_values.keys():
-            ret_val[str(prop)] = list()
-            sparql.setQuery(
-                RQSS_QUERIES['get_property_constraints_regex'].format(prop))
-            sparql.setReturnFormat(JSON)
-            results = sparql.query().convert()
-            for result in results["results"]["bindings"]:
-                value = result["to_ret"]["value"]
-                ret_val[str(prop)].append(value)
+        ret_val = get_batched_query_values(RQSS_QUERIES['get_property_constraints_regex_batch'],
+                                           RQSS_QUERIES['get_property_constraints_regex'], self._properties_values.keys(), self._endpoint)
+        # the syntax of a property cannot be checked without its regexes
+        failed = [prop for prop, regexes in ret_val.items() if regexes is None]
+        if failed:
+            raise Exception(
+                'The regexes of the properties {0} are not received from Wikidata'.format(', '.join(failed)))
         return ret_val
 
     @property
@@ -1,4 +1,4 @@
-from typing import Dict, List, NamedTuple
+from typing import Dict, Iterable, List, NamedTuple, Tuple
 
 class TripleSemanticResult(NamedTuple):
     property: int       # the property at the heart of the fact
@@ -23,27 +23,47 @@ class FactReference(NamedTuple):
 class RefTripleSemanticChecker:
     results: List[TripleSemanticResult] = None
     _gold_standard: List[FactReference]
-    _fact_ref_triples: List[FactReference]
+    _fact_ref_triples: Iterable[FactReference]
 
-    def __init__(self, gold_standard: List[FactReference], fact_ref_triples: List[FactReference]):
+    def __init__(self, gold_standard: List[FactReference], fact_ref_triples: Iterable[FactReference]):
+        """
+        the fact reference triples can be any iterable, e.g., read from the
+        file while they are checked, as they are checked in one pass
+        """
         self._gold_standard = gold_standard
         self._fact_ref_triples = fact_ref_triples
 
+    def get_gold_standard_index(self) -> Dict[Tuple[str, str, str], str]:
+        """
+        the (subject, property, reference property) of the gold standard and
+        the reference value of its first gold standard triple, with which the
+        matching reference triples are compared
+        """
+        index = {}
+        for fact_gs in self._gold_standard:
+            index.setdefault(
+                (fact_gs.subject, fact_gs.property, fact_gs.ref_property), fact_gs.ref_value)
+        return index
+
     def check_semantic_to_gold_standard(self) -> List[TripleSemanticResult]:
         self.results = []
-        visited_gs_facts = []
+        index = self.get_gold_standard_index()
         prop_results = {}
+        for fact_gs in self._gold_standard:
+            prop_results.setdefault(str(fact_gs.property), [0, 0])
+        checked = False
         for ref_triple in self._fact_ref_triples:
-            visited_gs_facts.clear()
-            for fact_gs in self._gold_standard:
-                if fact_gs.property not in prop_results.keys():
-                    prop_results[str(fact_gs.property)] = [0, 0]
-                if self.is_sub_rel_match(ref_triple, fact_gs) and (fact_gs.subject, fact_gs.property, fact_gs.ref_property) not in visited_gs_facts:
-                    visited_gs_facts.append(
-                        (fact_gs.subject, fact_gs.property, fact_gs.ref_property))
-                    prop_results[str(fact_gs.property)][0] += 1
-                    if self.is_triple_exact_match(ref_triple, fact_gs):
-                        prop_results[str(fact_gs.property)][1] += 1
+            checked = True
+            key = (ref_triple.subject, ref_triple.property,
+                   ref_triple.ref_property)
+            if key not in index:
+                continue
+            prop_results[str(ref_triple.property)][0] += 1
+            if ref_triple.ref_value == index[key]:
+                prop_results[str(ref_triple.property)][1] += 1
+        # the properties of the gold standard are reported if any triple is checked
+        if not checked:
+            return self.results
         for prop in prop_results.keys():
             self.results.append(TripleSemanticResult(
                 str(prop), prop_results[str(prop)][0], prop_results[str(prop)][1]))
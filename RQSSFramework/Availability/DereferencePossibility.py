@@ -1,7 +1,8 @@
-from typing import Iterator, List, NamedTuple
+from typing import Iterator, List, NamedTuple, Optional
 
-import requests
 from rdflib import URIRef
+from utils.fetch import FetchEngine, FetchOptions, FetchResult
+from utils.probes import ProbeStore
 
 
 class DerefOfURI(NamedTuple):
@@ -14,26 +15,27 @@ class DerefOfURI(NamedTuple):
 
 class DerefrenceExplorer:
     _uris = []
+    _fetch_options: FetchOptions = None
+    _probes: ProbeStore = None
     results = None
 
-    def __init__(self, uris: Iterator[URIRef]):
+    def __init__(self, uris: Iterator[URIRef], fetch_options: Optional[FetchOptions] = None, probes: Optional[ProbeStore] = None):
         self._uris = list(dict.fromkeys(uris))  # remove duplications
+        self._fetch_options = fetch_options
+        self._probes = probes  # if given, the results are derived from the probed URIs
+
+    def _get_deref(self, response: FetchResult) -> DerefOfURI:
+        if response.error is not None:
+            print(response.error)
+        return DerefOfURI(response.url, response.ok)
 
     def check_dereferencies(self) -> List[DerefOfURI]:
         """
         check the accssessibility of each URI in the class
         """
-        self.results = []
-        for u in self._uris:
-            try:
-                r = requests.get(u, timeout=(10, 60))
-                if r.status_code == 200:
-                    self.results.append(DerefOfURI(u, True))
-                else:
-                    self.results.append(DerefOfURI(u, False))
-            except Exception as e:
-                self.results.append(DerefOfURI(u, False))
-                print(e)
+        fetcher = self._probes if self._probes is not None else FetchEngine(
+            self._fetch_options)
+        self.results = fetcher.fetch_all(self._uris, process=self._get_deref)
         return self.results
 
     @property
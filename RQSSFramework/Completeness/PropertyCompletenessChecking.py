@@ -43,19 +43,26 @@ class PropertyCompletenessChecker:
             self._input, columns=self._input[0]._fields)
 
     def check_property_completeness_Wikidata(self) -> List[PropertyCompletenessResult]:
+        """
+        count the distinct statements of each fact, of each fact with any
+        reference property and of each fact and reference property, grouping
+        the distinct rows once
+        """
         self.results = []
+        rows = self._df.drop_duplicates()
+        refed_rows = rows.loc[rows['ref_predicate'].notna()]
+        total_instances = refed_rows.groupby('fact', sort=False)[
+            'statement_id'].nunique(dropna=False).to_dict()
+        total_instances_not_refed = rows.groupby('fact', sort=False)[
+            'statement_id'].nunique(dropna=False).to_dict()
+        total_refed = refed_rows.groupby(['fact', 'ref_predicate'], sort=False)[
+            'statement_id'].nunique(dropna=False).to_dict()
         fact_equivalence_classes_refs = self._get_distinct_fact_and_ref_predicates()
         for fact in fact_equivalence_classes_refs:
             for ref in fact_equivalence_classes_refs[fact]:
-                print('computing fact {0}, ref {1}'.format(fact, ref))
-                total_instances = len(self._df.loc[(self._df['fact'] == fact) & ~(
-                    self._df['ref_predicate'].isna())].drop_duplicates('statement_id'))
-                total_instances_not_refed = len(self._df.loc[(
-                    self._df['fact'] == fact)].drop_duplicates('statement_id'))
-                total_refed = len(self._df.loc[(self._df['fact'] == fact) & (
-                    self._df['ref_predicate'] == ref)].drop_duplicates('statement_id'))
                 self.results.append(PropertyCompletenessResult(
-                    fact, ref, total_instances, total_instances_not_refed, total_refed))
+                    fact, ref, int(total_instances.get(fact, 0)), int(total_instances_not_refed.get(fact, 0)),
+                    int(total_refed.get((fact, ref), 0))))
         return self.results
 
     def _get_distinct_fact_and_ref_predicates(self) -> Dict:
@@ -63,10 +70,8 @@ class PropertyCompletenessChecker:
         for fact_ref in self._input:
             if fact_ref.ref_predicate is None:
                 continue
-            if fact_ref.fact not in ret_dict.keys():
-                ret_dict[fact_ref.fact] = []
-            if fact_ref.ref_predicate not in ret_dict[fact_ref.fact]:
-                ret_dict[fact_ref.fact].append(fact_ref.ref_predicate)
+            # the reference properties of each fact in a dict, which keeps their order
+            ret_dict.setdefault(fact_ref.fact, {})[fact_ref.ref_predicate] = None
         return ret_dict
 
     @property
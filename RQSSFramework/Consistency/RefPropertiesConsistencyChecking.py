@@ -1,8 +1,7 @@
-import sys
 from typing import List, NamedTuple
 
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.sparql import WIKIDATA_ENDPOINT, get_batched_query_values
 
 
 class PropConsistencyResult(NamedTuple):
@@ -16,32 +15,23 @@ class PropConsistencyResult(NamedTuple):
 class RefPropertiesConsistencyChecker:
     results: List[PropConsistencyResult] = None
     _ref_properties: List[str]
+    _endpoint: str = WIKIDATA_ENDPOINT
 
-    def __init__(self, ref_properties: List[str]):
+    def __init__(self, ref_properties: List[str], endpoint: str = WIKIDATA_ENDPOINT):
         self._ref_properties = ref_properties
+        self._endpoint = endpoint
 
     def check_reference_specificity_from_Wikdiata(self) -> List[PropConsistencyResult]:
         self.results = []
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
+        print('\t Getting specificity of {0} reference properties'.format(len(self._ref_properties)))
+        prop_values = get_batched_query_values(RQSS_QUERIES['get_property_constraints_specificity_batch'],
+                                               RQSS_QUERIES['get_property_constraints_specificity'], self._ref_properties, self._endpoint)
         for prop in self._ref_properties:
-            print('\t Getting specificity of reference property: ', prop)
-            sparql.setQuery(
-                RQSS_QUERIES['get_property_constraints_specificity'].format(prop))
-            sparql.setReturnFormat(JSON)
-            try:
-                results = sparql.query().convert()
-                for result in results["results"]["bindings"]:
-                    value = result["to_ret"]["value"]
-                    if value == 'true':
-                        self.results.append(PropConsistencyResult(prop, True))
-                    else:
-                        self.results.append(PropConsistencyResult(prop, False))
-            except Exception as e:
-                print('\t\t ERROR: ', e)
-                continue
+            for value in prop_values[str(prop)] or []:
+                if value == 'true':
+                    self.results.append(PropConsistencyResult(prop, True))
+                else:
+                    self.results.append(PropConsistencyResult(prop, False))
         return self.results
 
     @property
@@ -1,9 +1,10 @@
-import sys
+from collections import Counter
 from typing import Dict, List, NamedTuple
 
 import numpy as np
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.class_hierarchy import ClassHierarchyIndex
+from utils.sparql import WIKIDATA_ENDPOINT, get_query_values
 
 
 class RangeConsistencyResult(NamedTuple):
@@ -24,14 +25,27 @@ class TriplesRangeConsistencyChecker:
     results: List[RangeConsistencyResult] = None
     _properties_values: Dict
     _ranges: Dict
-    _instances_subclass_of: Dict
+    _instances_subclass_of: Dict = None
+    _class_hierarchy: ClassHierarchyIndex = None
+    _endpoint: str = WIKIDATA_ENDPOINT
 
-    def __init__(self, prop_vals: Dict, ranges: Dict = None):
+    def __init__(self, prop_vals: Dict, ranges: Dict = None, endpoint: str = WIKIDATA_ENDPOINT, class_hierarchy: ClassHierarchyIndex = None):
+        """
+        with a class_hierarchy index, the classes of the values are found in
+        the index instead of querying Wikidata for each value
+        """
         self._properties_values = prop_vals
+        self._endpoint = endpoint
         self._ranges = self.get_property_ranges_from_Wikidata() if ranges is None else ranges
-        self._instances_subclass_of = self.get_instances_subclass_of_values_from_Wikidata()
+        self._class_hierarchy = class_hierarchy
+        if class_hierarchy is None:
+            self._instances_subclass_of = self.get_instances_subclass_of_values_from_Wikidata()
 
     def check_all_value_ranges(self) -> List[RangeConsistencyResult]:
+        """
+        count the values of each property which are in none of its ranges.
+        Each distinct value of a property is checked once
+        """
         self.results = []
         for prop in self._properties_values.keys():
             if len(self._ranges[str(prop)]) == 0:
@@ -39,40 +53,28 @@ class TriplesRangeConsistencyChecker:
                     str(prop), len(self._properties_values[str(prop)]), np.nan, 0))
                 continue
             num_fails = 0
-            for value in self._properties_values[str(prop)]:
-                failed = True
-                for range in self._ranges[str(prop)]:
-                    if self.check_range_value(value, range):
-                        failed = False
-                        break
-                if failed:
-                    num_fails += 1
+            for value, count in Counter(self._properties_values[str(prop)]).items():
+                if not any(self.check_range_value(value, range) for range in self._ranges[str(prop)]):
+                    num_fails += count
             self.results.append(RangeConsistencyResult(str(prop), len(
                 self._properties_values[str(prop)]), num_fails, len(self._ranges[str(prop)])))
         return self.results
 
     def check_range_value(self, value: str, range: str):
+        if self._class_hierarchy is not None:
+            return self._class_hierarchy.is_instance_or_subclass(value, range)
         if range in self._instances_subclass_of[value]:
             return True
         return False
 
     def get_property_ranges_from_Wikidata(self) -> Dict:
         ret_val = Dict.fromkeys(self._properties_values.keys())
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
         for prop in self._properties_values.keys():
             ret_val[str(prop)] = list()
             print('\t Getting ranges of reference property: ', prop)
-            sparql.setQuery(
-                RQSS_QUERIES['get_property_range_wikimedia'].format(prop))
-            sparql.setReturnFormat(JSON)
             try:
-                results = sparql.query().convert()
-                for result in results["results"]["bindings"]:
-                    value = result["to_ret"]["value"]
-                    ret_val[str(prop)].append(value)
+                ret_val[str(prop)] = get_query_values(
+                    self._endpoint, RQSS_QUERIES['get_property_range_wikimedia'].format(prop), result_format='json')
             except Exception as e:
                 print('\t\t ERROR: ', e)
                 continue
@@ -83,22 +85,14 @@ class TriplesRangeConsistencyChecker:
         distinct_values = set.union(
             *[set(value) for key, value in self._properties_values.items()])
 
+        # the classes of each value are kept in a set, for the membership checks of the ranges
         ret_val = Dict.fromkeys(distinct_values)
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
         for ref_value in distinct_values:
-            ret_val[ref_value] = list()
+            ret_val[ref_value] = frozenset()
             print('\t Getting instances or subclasses of value: ', ref_value)
-            sparql.setQuery(
-                RQSS_QUERIES['get_instances_subclass_of_values_wikimedia'].format(ref_value))
             try:
-                sparql.setReturnFormat(JSON)
-                results = sparql.query().convert()
-                for result in results["results"]["bindings"]:
-                    query_value = result["to_ret"]["value"]
-                    ret_val[ref_value].append(query_value)
+                ret_val[ref_value] = frozenset(get_query_values(
+                    self._endpoint, RQSS_QUERIES['get_instances_subclass_of_values_wikimedia'].format(ref_value), result_format='json'))
             except Exception as e:
                 print('\t\t ERROR: ', e)
                 continue
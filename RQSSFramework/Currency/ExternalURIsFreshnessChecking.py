@@ -2,12 +2,14 @@ import datetime
 import re
 import time
 from random import randint
-from typing import Iterator, List, NamedTuple
+from typing import Iterator, List, NamedTuple, Optional
 
 import requests
 from fake_useragent import UserAgent
 from lxml import html
 from rdflib import URIRef
+from utils.fetch import FetchEngine, FetchOptions, FetchResult
+from utils.probes import ProbeStore
 
 
 class FreshnessOfURI(NamedTuple):
@@ -23,24 +25,30 @@ class ExternalURIsFreshnessChecker:
     _uris: List[URIRef] = []
     _base_time: datetime.datetime
     _extract_google_cache: bool
+    _fetch_options: FetchOptions = None
+    _probes: ProbeStore = None
     results: List[FreshnessOfURI] = None
 
-    def __init__(self, uris: Iterator[URIRef], base_time: datetime.datetime = datetime.datetime(2012, 10, 29), extract_google_cache: bool = False):
+    def __init__(self, uris: Iterator[URIRef], base_time: datetime.datetime = datetime.datetime(2012, 10, 29), extract_google_cache: bool = False, fetch_options: Optional[FetchOptions] = None, probes: Optional[ProbeStore] = None):
         self._uris = list(dict.fromkeys(uris))  # remove duplications
         self._base_time = base_time
         self._extract_google_cache = extract_google_cache
+        self._fetch_options = fetch_options
+        self._probes = probes  # if given, the Last-Modified tags are derived from the probed URIs
+
+    def _get_fetcher(self):
+        return self._probes if self._probes is not None else FetchEngine(self._fetch_options)
 
     def check_external_uris_freshness(self) -> List[FreshnessOfURI]:
         self.results = []
         t_now = datetime.datetime.now()
         t_base = (t_now - self._base_time).total_seconds()
-        for uri in self._uris:
+        # the HEAD requests of all URIs are sent concurrently
+        last_modif_times = self._get_fetcher().fetch_all(
+            self._uris, 'HEAD', process=self._get_last_modified_time)
+        for uri, last_modif_time in zip(self._uris, last_modif_times):
             last_modif_freshness = None
             google_cache_freshness = None
-            try:
-                last_modif_time = self.get_last_modified_tag(uri)
-            except:
-                last_modif_time = None
             if last_modif_time is not None:
                 last_modif_freshness = (
                     t_now - last_modif_time).total_seconds()/t_base
@@ -55,13 +63,15 @@ class ExternalURIsFreshnessChecker:
         return self.results
 
     def get_last_modified_tag(self, uri: URIRef) -> datetime.datetime:
-        try:
-            response = requests.head(uri)
-        except:
-            return None
+        return self._get_fetcher().fetch_all([uri], 'HEAD', process=self._get_last_modified_time)[0]
+
+    def _get_last_modified_time(self, response: FetchResult) -> Optional[datetime.datetime]:
         if response.headers.get('Last-Modified') is not None:
             ret_date_str = response.headers.get('Last-Modified')
-            return datetime.datetime.strptime(ret_date_str, '%a, %d %b %Y %H:%M:%S %Z')
+            try:
+                return datetime.datetime.strptime(ret_date_str, '%a, %d %b %Y %H:%M:%S %Z')
+            except ValueError:
+                return None
         return None
 
     def get_google_cache_last_indexed(self, uri: URIRef) -> datetime.datetime:
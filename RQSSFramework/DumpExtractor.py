@@ -0,0 +1,962 @@
+import bz2
+import gzip
+import os
+import queue
+import re
+import zlib
+from collections import Counter
+from multiprocessing import Process, Queue
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional, Set,
+                    TextIO, Tuple)
+
+from Queries import RQSS_QUERIES
+from utils.sparql import unescape_string
+
+# the nodes of the parsed triples are strings: IRIs without the angle
+# brackets, blank nodes as _:label and literals as '"' + lexical form
+Triple = Tuple[str, str, str]
+
+DUMP_FORMATS = ('nt', 'ttl')
+
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+PROV_WAS_DERIVED_FROM = 'http://www.w3.org/ns/prov#wasDerivedFrom'
+WIKIBASE_STATEMENT = 'http://wikiba.se/ontology#Statement'
+WIKIBASE_REFERENCE = 'http://wikiba.se/ontology#Reference'
+WIKIBASE_ITEM = 'http://wikiba.se/ontology#Item'
+WIKIBASE_TIME_VALUE = 'http://wikiba.se/ontology#TimeValue'
+WIKIBASE_QUANTITY_VALUE = 'http://wikiba.se/ontology#QuantityValue'
+WDT_INSTANCE_OF = 'http://www.wikidata.org/prop/direct/P31'
+WDT_SUBCLASS_OF = 'http://www.wikidata.org/prop/direct/P279'
+PR_PREFIX = 'http://www.wikidata.org/prop/reference/'
+ENTITY_PREFIX = 'http://www.wikidata.org/entity/'
+
+WIKIMEDIA_DOMAINS = ('wikipedia.org', 'wikimedia.org', 'wikivoyage.org', 'mediawiki.org', 'wikiversity.org',
+                     'wikinews.org', 'wikisource.org', 'wikibooks.org', 'wikiquote.org', 'wiktionary.org', 'wikiba.se')
+
+# the p: predicates that link the items to their statement nodes
+_STATEMENT_LINK = re.compile(r'/prop/P\d+$')
+
+_NT_SUBJECT = r'(<[^>]*>|_:\S*[^\s.])'
+_NT_PREDICATE = r'(<[^>]*>)'
+_NT_OBJECT = r'(<[^>]*>|_:\S*[^\s.]|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+_NT_TRIPLE = re.compile(r'\s*{0}\s*{1}\s*{2}\s*\.\s*(?:#.*)?$'.format(
+    _NT_SUBJECT, _NT_PREDICATE, _NT_OBJECT))
+
+_TTL_TOKEN = re.compile(r'''
+    (?P<skip>\s+|\#[^\n]*)
+  | (?P<iri><[^>\s]*>)
+  | (?P<long_string>"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^'\\]|\\.|'(?!\'\'))*\'\'\')
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<lang>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<datatype>\^\^)
+  | (?P<bnode>_:[\w-]+(?:\.+[\w-]+)*)
+  | (?P<number>[+-]?(?:\d*\.\d+(?:[eE][+-]?\d+)?|\d+[eE][+-]?\d+|\d+))
+  | (?P<pname>(?:[A-Za-z][\w-]*(?:\.+[\w-]+)*)?:(?:(?:[\w:%-]|\\.)+(?:\.+(?:[\w:%-]|\\.)+)*)?)
+  | (?P<word>[A-Za-z]+)
+  | (?P<punct>[;,.\[\]()])
+''', re.X)
+# the size of the byte ranges (or of the compressed BGZF blocks) of the N-Triples
+# dumps that are parsed in parallel, and of the line batches of other compressed dumps
+CHUNK_SIZE = 1 << 26
+# the read-ahead of the tokenizer, longer tokens (e.g., long strings) are read in more than one step
+_TTL_LOOKAHEAD = 1 << 16
+
+
+def open_dump(path: str) -> TextIO:
+    """
+    open the plain, gzip (.gz) or bzip2 (.bz2) dump file as text
+    """
+    if path.endswith('.gz') or path.endswith('.bgz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def _nt_node(term: str) -> str:
+    if term[0] == '<':
+        return term[1:-1]
+    if term[0] == '"':
+        end = term.rfind('"')
+        return '"' + unescape_string(term[1:end])
+    return term
+
+
+def parse_ntriples_line(line: str) -> Optional[Triple]:
+    """
+    parse one line of N-Triples. None for the empty and comment lines,
+    ValueError for the malformed ones
+    """
+    stripped = line.strip()
+    if not stripped or stripped[0] == '#':
+        return None
+    match = _NT_TRIPLE.match(stripped)
+    if match is None:
+        raise ValueError('Malformed N-Triples line: {0}'.format(stripped))
+    return _nt_node(match.group(1)), match.group(2)[1:-1], _nt_node(match.group(3))
+
+
+def iter_ntriples(lines: Iterable[str]) -> Iterator[Triple]:
+    """
+    yield the triples of the N-Triples lines. The malformed lines are
+    skipped with a warning
+    """
+    for number, line in enumerate(lines, 1):
+        try:
+            triple = parse_ntriples_line(line)
+        except ValueError as e:
+            print('WARNING: skipped line {0}. {1}'.format(number, e))
+            continue
+        if triple is not None:
+            yield triple
+
+
+def _iter_turtle_tokens(stream: TextIO, chunk_size: int = 1 << 20) -> Iterator[Tuple[str, str]]:
+    """
+    yield the (kind, text) tokens of the Turtle stream, reading it chunk by chunk
+    """
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        if not eof and len(buffer) - position < _TTL_LOOKAHEAD:
+            chunk = stream.read(chunk_size)
+            eof = chunk == ''
+            buffer = buffer[position:] + chunk
+            position = 0
+        if position >= len(buffer):
+            return
+        match = _TTL_TOKEN.match(buffer, position)
+        if match is None or (match.end() == len(buffer) and not eof):
+            if eof:
+                raise ValueError('Turtle syntax error at: {0}'.format(
+                    buffer[position:position + 80]))
+            # the token continues in the next chunk
+            chunk = stream.read(chunk_size)
+            eof = chunk == ''
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = match.end()
+        if match.lastgroup != 'skip':
+            yield match.lastgroup, match.group()
+
+
+class TurtleParser:
+    """
+    a streaming parser of the Turtle subset that is used in RDF dumps
+    (e.g., Wikidata dumps): prefix/base directives, prefixed names, 'a',
+    predicate/object lists, blank node property lists and literals.
+    Collections are not supported
+    """
+    _tokens: Iterator[Tuple[str, str]]
+    _prefixes: Dict[str, str]
+    _base: str
+    _peeked: Optional[Tuple[str, str]]
+    _bnodes: int
+
+    def __init__(self, stream: TextIO):
+        self._tokens = _iter_turtle_tokens(stream)
+        self._prefixes = {}
+        self._base = ''
+        self._peeked = None
+        self._bnodes = 0
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        if self._peeked is None:
+            self._peeked = next(self._tokens, None)
+        return self._peeked
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise ValueError('Unexpected end of the Turtle document')
+        self._peeked = None
+        return token
+
+    def _expect(self, text: str) -> None:
+        kind, value = self._next()
+        if value != text:
+            raise ValueError(
+                'Expected "{0}" but found "{1}" in the Turtle document'.format(text, value))
+
+    def _iri(self, text: str) -> str:
+        iri = unescape_string(text[1:-1])
+        # resolving the relative IRIs
+        if self._base and ':' not in iri:
+            return self._base + iri
+        return iri
+
+    def _pname(self, text: str) -> str:
+        prefix, local = text.split(':', 1)
+        if prefix not in self._prefixes:
+            raise ValueError(
+                'Undefined prefix "{0}" in the Turtle document'.format(prefix))
+        return self._prefixes[prefix] + re.sub(r'\\(.)', r'\1', local)
+
+    def _new_bnode(self) -> str:
+        self._bnodes += 1
+        return '_:genid{0}'.format(self._bnodes)
+
+    def _directive(self, name: str) -> None:
+        if name == 'prefix':
+            kind, prefix = self._next()
+            if kind != 'pname' or not prefix.endswith(':'):
+                raise ValueError(
+                    'Invalid prefix "{0}" in the Turtle document'.format(prefix))
+            self._prefixes[prefix[:-1]] = self._iri(self._next()[1])
+        else:
+            self._base = self._iri(self._next()[1])
+
+    def _subject(self, triples: List[Triple]) -> str:
+        kind, value = self._next()
+        if kind == 'iri':
+            return self._iri(value)
+        if kind == 'pname':
+            return self._pname(value)
+        if kind == 'bnode':
+            return value
+        if value == '[':
+            node = self._new_bnode()
+            if self._peek() != ('punct', ']'):
+                self._predicate_objects(node, triples)
+            self._expect(']')
+            return node
+        raise ValueError(
+            'Unsupported subject "{0}" in the Turtle document'.format(value))
+
+    def _predicate(self) -> str:
+        kind, value = self._next()
+        if kind == 'iri':
+            return self._iri(value)
+        if kind == 'pname':
+            return self._pname(value)
+        if kind == 'word' and value == 'a':
+            return RDF_TYPE
+        raise ValueError(
+            'Unsupported predicate "{0}" in the Turtle document'.format(value))
+
+    def _object(self, subject: str, predicate: str, triples: List[Triple]) -> None:
+        kind, value = self._next()
+        if kind == 'iri':
+            triples.append((subject, predicate, self._iri(value)))
+        elif kind == 'pname':
+            triples.append((subject, predicate, self._pname(value)))
+        elif kind == 'bnode':
+            triples.append((subject, predicate, value))
+        elif value == '[':
+            node = self._new_bnode()
+            triples.append((subject, predicate, node))
+            if self._peek() != ('punct', ']'):
+                self._predicate_objects(node, triples)
+            self._expect(']')
+        elif kind in ('string', 'long_string'):
+            quotes = 3 if kind == 'long_string' else 1
+            triples.append(
+                (subject, predicate, '"' + unescape_string(value[quotes:-quotes])))
+            token = self._peek()
+            if token is not None and token[0] == 'lang':
+                self._next()
+            elif token is not None and token[0] == 'datatype':
+                self._next()
+                self._next()
+        elif kind == 'number' or (kind == 'word' and value in ('true', 'false')):
+            triples.append((subject, predicate, '"' + value))
+        else:
+            raise ValueError(
+                'Unsupported object "{0}" in the Turtle document'.format(value))
+
+    def _predicate_objects(self, subject: str, triples: List[Triple]) -> None:
+        while True:
+            predicate = self._predicate()
+            self._object(subject, predicate, triples)
+            while self._peek() == ('punct', ','):
+                self._next()
+                self._object(subject, predicate, triples)
+            if self._peek() != ('punct', ';'):
+                return
+            # a predicate/object list may end with extra semicolons
+            while self._peek() == ('punct', ';'):
+                self._next()
+            token = self._peek()
+            if token is None or token[1] in ('.', ']'):
+                return
+
+    def triples(self) -> Iterator[Triple]:
+        while self._peek() is not None:
+            kind, value = self._next()
+            if kind == 'lang' and value in ('@prefix', '@base'):
+                self._directive(value[1:])
+                self._expect('.')
+                continue
+            if kind == 'word' and value.lower() in ('prefix', 'base'):
+                self._directive(value.lower())
+                continue
+            self._peeked, triples = (kind, value), []
+            subject = self._subject(triples)
+            if self._peek() != ('punct', '.'):
+                self._predicate_objects(subject, triples)
+            self._expect('.')
+            yield from triples
+
+
+def iter_dump_triples(path: str, rdf_format: str) -> Iterator[Triple]:
+    """
+    yield the triples of the N-Triples (nt) or Turtle (ttl) dump file
+    """
+    if rdf_format not in DUMP_FORMATS:
+        raise ValueError('Unsupported RDF format: {0}'.format(rdf_format))
+    with open_dump(path) as stream:
+        if rdf_format == 'nt':
+            yield from iter_ntriples(stream)
+        else:
+            yield from TurtleParser(stream).triples()
+
+
+def _is_literal(node: str) -> bool:
+    return node[0] == '"'
+
+
+def _is_blank(node: str) -> bool:
+    return node.startswith('_:')
+
+
+def _is_iri(node: str) -> bool:
+    return not _is_literal(node) and not _is_blank(node)
+
+
+def _value(node: str) -> str:
+    """
+    the value of the node in the SPARQL results
+    """
+    if _is_literal(node):
+        return node[1:]
+    if _is_blank(node):
+        return node[2:]
+    return node
+
+
+def _str(node: str) -> Optional[str]:
+    """
+    STR() of the node, None (unbound) for blank nodes
+    """
+    if _is_blank(node):
+        return None
+    return _value(node)
+
+
+def _replace(node: str, letter: str) -> Optional[str]:
+    """
+    REPLACE(STR(node), ".*<letter>", "<letter>") of the extraction queries
+    """
+    value = _str(node)
+    return None if value is None else re.sub(r'.*' + letter, letter, value)
+
+
+def _bound(values: Iterable[Optional[str]]) -> List[str]:
+    # like the JSON bindings, the unbound variables are skipped
+    return [value for value in values if value is not None]
+
+
+# the extraction queries and the methods that answer them over the aggregates
+_QUERY_METHODS = {
+    'get_all_external_sources_filter_wikimedia_distinct': 'get_external_uris',
+    'get_all_external_sources_distinct': 'get_external_sources',
+    'get_all_statement_nodes_wikimedia': 'get_statement_nodes',
+    'get_reference_literals_wikimedia': 'get_reference_literals',
+    'get_fact_ref_triples_wikimedia': 'get_fact_ref_triples',
+    'get_ref_properties_wikimedia': 'get_ref_properties',
+    'get_ref_properties_object_value_types_wikimedia': 'get_ref_properties_object_value_types',
+    'get_ref_nodes_incomings_wikimedia': 'get_ref_nodes_incomings',
+    'get_sattement_nodes_ref_num_wikimedia': 'get_statement_nodes_ref_num',
+    'get_item_refed_facts_wikimedia': 'get_item_refed_facts',
+    'get_classes_and_facts': 'get_classes_and_facts',
+    'get_class_hierarchy_wikimedia': 'get_class_hierarchy',
+    'get_statement_fact_refed_props_wikimedia': 'get_statement_fact_refed_props',
+    'get_num_of_statement_nodes_wikimedia': 'get_num_of_statement_nodes',
+    'get_num_of_ref_nodes_wikimedia': 'get_num_of_ref_nodes',
+    'get_triple_per_ref_node_distribution_wikimedia': 'get_triple_per_ref_node_distribution',
+    'get_literal_per_ref_node_distribution_wikimedia': 'get_literal_per_ref_node_distribution',
+    'get_num_of_reference_properties_wikimedia': 'get_num_of_reference_properties',
+    'get_num_of_reference_triples_wikimedia': 'get_num_of_reference_triples',
+    'get_reference_properties_usage_distribution_wikimedia': 'get_reference_properties_usage_distribution',
+    'get_statement_sources_wikimedia': 'get_statement_sources',
+    'get_num_of_provWasDerivedFrom_wikimedia': 'get_num_of_derived_ref_nodes',
+    'get_num_of_ref_predicate_wikimedia': 'get_num_of_derived_ref_predicates',
+    'get_num_of_ref_value_wikimedia': 'get_num_of_derived_ref_values',
+    'get_num_of_BN_provWasDerivedFrom_wikimedia': 'get_num_of_blank_derived_ref_nodes',
+    'get_num_of_BN_ref_predicate_wikimedia': 'get_num_of_blank_derived_ref_predicates',
+    'get_num_of_BN_ref_value_wikimedia': 'get_num_of_blank_derived_ref_values',
+}
+# the methods that need the item-statement links or the classes of the items
+_STATEMENT_LINK_METHODS = {'get_fact_ref_triples', 'get_item_refed_facts',
+                           'get_classes_and_facts', 'get_statement_fact_refed_props',
+                           'get_class_hierarchy'}
+
+
+class ReferenceGraphAggregator:
+    """
+    keep the parts of the dataset that the extraction queries need (the
+    statement and reference nodes, the triples of the reference nodes and
+    the item-statement links and the classes of the items) while the triples of a dump are added one by
+    one, and answer the extraction queries over them. The duplicated
+    triples (e.g., the shared reference nodes that are repeated in the
+    Wikidata dumps) are added once. Without has_statement_links (e.g.,
+    the aggregates of the reference subgraph of an endpoint), the queries
+    that need the item-statement links or the classes are not supported
+    """
+    has_statement_links: bool
+    statements: Dict[str, None]             # typed statement nodes, in order
+    references: Dict[str, None]             # typed reference nodes, in order
+    items: Set[str]                         # typed items
+    ignored_values: Set[str]                # time and quantity value nodes
+    derived_from: Dict[str, List[str]]      # statement node -> reference nodes
+    derived_references: Dict[str, None]     # objects of prov:wasDerivedFrom, in order
+    ref_triples: Dict[str, List[Tuple[str, str]]]   # reference node -> (predicate, object)
+    blank_triples: Dict[str, List[Tuple[str, str]]]  # blank node not yet known as a reference -> (predicate, object)
+    statement_links: Dict[str, List[Tuple[str, str]]]  # statement node -> (item, p: property)
+    classes: Dict[str, List[str]]           # item -> wdt:P31 values
+    superclasses: Dict[str, List[str]]      # class -> wdt:P279 values
+
+    def __init__(self, has_statement_links: bool = True):
+        self.has_statement_links = has_statement_links
+        self.statements = {}
+        self.references = {}
+        self.items = set()
+        self.ignored_values = set()
+        self.derived_from = {}
+        self.derived_references = {}
+        self.ref_triples = {}
+        self.blank_triples = {}
+        self.statement_links = {}
+        self.classes = {}
+        self.superclasses = {}
+
+    def _is_reference_node(self, node: str) -> bool:
+        return (node in self.references or node in self.derived_references or
+                ('/reference/' in node and '/prop/' not in node))
+
+    @staticmethod
+    def _append(mapping: Dict[str, list], key: str, value) -> None:
+        values = mapping.setdefault(key, [])
+        if value not in values:
+            values.append(value)
+
+    def _add_blank_reference_triples(self, node: str) -> None:
+        """
+        move the triples of the blank node, which is now known as a reference
+        node, to the reference triples
+        """
+        for value in self.blank_triples.pop(node, ()):
+            self._append(self.ref_triples, node, value)
+
+    def add_triple(self, subject: str, predicate: str, obj: str) -> None:
+        if predicate == RDF_TYPE:
+            if obj == WIKIBASE_STATEMENT:
+                self.statements[subject] = None
+                return
+            if obj == WIKIBASE_REFERENCE:
+                self.references[subject] = None
+                self._add_blank_reference_triples(subject)
+                return
+            if obj == WIKIBASE_ITEM:
+                self.items.add(subject)
+                return
+            if obj == WIKIBASE_TIME_VALUE or obj == WIKIBASE_QUANTITY_VALUE:
+                self.ignored_values.add(subject)
+                return
+        if predicate == PROV_WAS_DERIVED_FROM:
+            self._append(self.derived_from, subject, obj)
+            self.derived_references[obj] = None
+            self._add_blank_reference_triples(obj)
+            return
+        if predicate == WDT_INSTANCE_OF:
+            self._append(self.classes, subject, obj)
+            return
+        if predicate == WDT_SUBCLASS_OF:
+            self._append(self.superclasses, subject, obj)
+            return
+        if not _is_literal(obj) and _STATEMENT_LINK.search(predicate):
+            self._append(self.statement_links, obj, (subject, predicate))
+            return
+        if self._is_reference_node(subject):
+            self._append(self.ref_triples, subject, (predicate, obj))
+        elif _is_blank(subject):
+            # a blank node is known as a reference node only by its type or
+            # prov:wasDerivedFrom, which can come later in the dump
+            self._append(self.blank_triples, subject, (predicate, obj))
+
+    def add_triples(self, triples: Iterable[Triple]) -> None:
+        for subject, predicate, obj in triples:
+            self.add_triple(subject, predicate, obj)
+
+    def merge(self, other: 'ReferenceGraphAggregator') -> None:
+        """
+        add the aggregates of another part of the dataset
+        """
+        self.statements.update(other.statements)
+        self.references.update(other.references)
+        self.items |= other.items
+        self.ignored_values |= other.ignored_values
+        self.derived_references.update(other.derived_references)
+        for mine, others in [(self.derived_from, other.derived_from), (self.ref_triples, other.ref_triples),
+                             (self.blank_triples, other.blank_triples), (self.statement_links, other.statement_links),
+                             (self.classes, other.classes), (self.superclasses, other.superclasses)]:
+            for key, values in others.items():
+                for value in values:
+                    self._append(mine, key, value)
+        for node in [i for i in self.blank_triples if i in self.references or i in self.derived_references]:
+            self._add_blank_reference_triples(node)
+
+    def _get_query_method(self, query: str) -> Optional[str]:
+        for name, method in _QUERY_METHODS.items():
+            if RQSS_QUERIES[name] == query:
+                if method in _STATEMENT_LINK_METHODS and not self.has_statement_links:
+                    return None
+                return method
+        return None
+
+    def supports_query(self, query: str) -> bool:
+        return self._get_query_method(query) is not None
+
+    def get_query_rows(self, query: str) -> Iterator[List[str]]:
+        """
+        the result rows of the extraction query over the aggregates, the same
+        as the rows of the query results of an endpoint
+        """
+        method = self._get_query_method(query)
+        if method is None:
+            raise ValueError(
+                'The query is not supported on the aggregates:\n{0}'.format(query))
+        return getattr(self, method)()
+
+    def _is_ref_value(self, obj: str) -> bool:
+        # MINUS the time and quantity values and FILTER (?object != wikibase:Reference)
+        return obj not in self.ignored_values and obj != WIKIBASE_REFERENCE
+
+    def _iter_derived_ref_triples(self) -> Iterator[Tuple[str, str, str, str]]:
+        """
+        (statement node, reference node, predicate, object) of ?statement prov:wasDerivedFrom ?ref. ?ref ?predicate ?object
+        """
+        for statement, refs in self.derived_from.items():
+            for ref in refs:
+                for predicate, obj in self.ref_triples.get(ref, ()):
+                    yield statement, ref, predicate, obj
+
+    def _iter_typed_ref_triples(self) -> Iterator[Tuple[str, str, str]]:
+        """
+        (reference node, predicate, object) of ?ref a wikibase:Reference. ?ref ?predicate ?object,
+        without the time/quantity values
+        """
+        for ref in self.references:
+            for predicate, obj in self.ref_triples.get(ref, ()):
+                if self._is_ref_value(obj):
+                    yield ref, predicate, obj
+
+    def _iter_statement_links(self) -> Iterator[Tuple[str, str, str]]:
+        """
+        (item, property, statement node) of ?item ?property ?statementNode. ?statementNode a wikibase:Statement
+        """
+        for statement, links in self.statement_links.items():
+            if statement in self.statements:
+                for item, prop in links:
+                    yield item, prop, statement
+
+    def _iter_external_sources(self, excluded_domains: Tuple[str, ...]) -> Iterator[List[str]]:
+        sources = {}
+        for statement, ref, predicate, obj in self._iter_derived_ref_triples():
+            if _is_iri(obj) and not any(domain in obj.lower() for domain in excluded_domains):
+                sources[obj] = None
+        for source in sources:
+            yield [source]
+
+    def get_external_uris(self) -> Iterator[List[str]]:
+        return self._iter_external_sources(WIKIMEDIA_DOMAINS + ('wikidata.org',))
+
+    def get_external_sources(self) -> Iterator[List[str]]:
+        return self._iter_external_sources(WIKIMEDIA_DOMAINS)
+
+    def get_statement_nodes(self) -> Iterator[List[str]]:
+        for statement in self.statements:
+            yield [_value(statement)]
+
+    def get_reference_literals(self) -> Iterator[List[str]]:
+        rows = {}
+        for statement, ref, predicate, obj in self._iter_derived_ref_triples():
+            if _is_literal(obj):
+                rows[(_replace(predicate, 'P'), _value(obj))] = None
+        for row in rows:
+            yield list(row)
+
+    def get_fact_ref_triples(self) -> Iterator[List[str]]:
+        rows = {}
+        for item, prop, statement in self._iter_statement_links():
+            for ref in self.derived_from.get(statement, ()):
+                for predicate, obj in self.ref_triples.get(ref, ()):
+                    if self._is_ref_value(obj):
+                        rows[(_replace(item, 'Q'), _replace(prop, 'P'),
+                              _replace(predicate, 'P'), _replace(obj, 'Q'))] = None
+        for row in rows:
+            yield _bound(row)
+
+    def get_ref_properties(self) -> Iterator[List[str]]:
+        properties = {}
+        for ref, predicate, obj in self._iter_typed_ref_triples():
+            if obj != RDF_TYPE:
+                properties[_replace(predicate, 'P')] = None
+        for prop in properties:
+            yield _bound([prop])
+
+    def get_ref_properties_object_value_types(self) -> Iterator[List[str]]:
+        for ref in self.references:
+            for predicate, obj in self.ref_triples.get(ref, ()):
+                value = _str(obj)
+                if predicate.startswith(PR_PREFIX) and value is not None and value.startswith(ENTITY_PREFIX):
+                    yield [_replace(predicate, 'P'), _replace(obj, 'Q')]
+
+    def get_ref_nodes_incomings(self) -> Iterator[List[str]]:
+        incomings = Counter()
+        for statement, refs in self.derived_from.items():
+            if statement in self.statements:
+                incomings.update(refs)
+        for ref, count in incomings.items():
+            yield [_value(ref), str(count)]
+
+    def get_statement_nodes_ref_num(self) -> Iterator[List[str]]:
+        for statement, refs in self.derived_from.items():
+            if statement in self.statements:
+                yield [_value(statement), str(len(refs))]
+
+    def get_item_refed_facts(self) -> Iterator[List[str]]:
+        rows = {}
+        for statement in self.derived_from:
+            for item, prop in self.statement_links.get(statement, ()):
+                if item in self.items:
+                    rows[(_value(item), _value(prop))] = None
+        for row in rows:
+            yield list(row)
+
+    def get_classes_and_facts(self) -> Iterator[List[str]]:
+        rows = {}
+        for item, prop, statement in self._iter_statement_links():
+            # OPTIONAL{?item wdt:P31 ?class}
+            for item_class in self.classes.get(item, [None]):
+                rows[(item_class and _value(item_class), _value(prop))] = None
+        for row in rows:
+            yield _bound(row)
+
+    def get_class_hierarchy(self) -> Iterator[List[str]]:
+        for edges, predicate in [(self.classes, WDT_INSTANCE_OF), (self.superclasses, WDT_SUBCLASS_OF)]:
+            for item, item_classes in edges.items():
+                for item_class in item_classes:
+                    if _is_iri(item) and _is_iri(item_class):
+                        yield [item, predicate, item_class]
+
+    def get_statement_fact_refed_props(self) -> Iterator[List[str]]:
+        for item, prop, statement in self._iter_statement_links():
+            ref_properties = [predicate for ref in self.derived_from.get(statement, ())
+                              for predicate, obj in self.ref_triples.get(ref, ()) if self._is_ref_value(obj)]
+            # OPTIONAL{?statementNode prov:wasDerivedFrom ?refNode. ?refNode ?refProperty ?refObject}
+            for ref_property in ref_properties or [None]:
+                yield _bound([_value(statement), _value(prop), ref_property and _value(ref_property)])
+
+    def get_num_of_statement_nodes(self) -> Iterator[List[str]]:
+        yield [str(len(self.statements))]
+
+    def get_num_of_ref_nodes(self) -> Iterator[List[str]]:
+        yield [str(len(self.references))]
+
+    def _iter_ref_node_distribution(self, is_counted: Callable[[str], bool]) -> Iterator[List[str]]:
+        counts = Counter(ref for ref, predicate, obj in self._iter_typed_ref_triples()
+                         if is_counted(obj))
+        for ref, count in counts.items():
+            yield [_value(ref), str(count)]
+
+    def get_triple_per_ref_node_distribution(self) -> Iterator[List[str]]:
+        return self._iter_ref_node_distribution(lambda obj: True)
+
+    def get_literal_per_ref_node_distribution(self) -> Iterator[List[str]]:
+        return self._iter_ref_node_distribution(_is_literal)
+
+    def get_num_of_reference_properties(self) -> Iterator[List[str]]:
+        yield [str(len({predicate for ref, predicate, obj in self._iter_typed_ref_triples()}))]
+
+    def get_num_of_reference_triples(self) -> Iterator[List[str]]:
+        yield [str(sum(1 for triple in self._iter_typed_ref_triples()))]
+
+    def get_reference_properties_usage_distribution(self) -> Iterator[List[str]]:
+        usages = Counter(
+            predicate for ref, predicate, obj in self._iter_typed_ref_triples())
+        for predicate, usage in usages.most_common():
+            yield [_value(predicate), str(usage)]
+
+    def _get_derived_ref_terms(self) -> Tuple[Set[str], Set[str], Set[str]]:
+        """
+        the distinct reference nodes, reference properties and reference
+        values of the statement nodes
+        """
+        ref_nodes, predicates, values = set(), set(), set()
+        for statement, refs in self.derived_from.items():
+            if statement not in self.statements:
+                continue
+            ref_nodes.update(refs)
+            for ref in refs:
+                for predicate, obj in self.ref_triples.get(ref, ()):
+                    if self._is_ref_value(obj):
+                        predicates.add(predicate)
+                        values.add(obj)
+        return ref_nodes, predicates, values
+
+    def _count_derived_ref_terms(self, index: int, only_blank: bool) -> Iterator[List[str]]:
+        terms = self._get_derived_ref_terms()[index]
+        yield [str(sum(1 for term in terms if _is_blank(term)) if only_blank else len(terms))]
+
+    def get_num_of_derived_ref_nodes(self) -> Iterator[List[str]]:
+        return self._count_derived_ref_terms(0, False)
+
+    def get_num_of_derived_ref_predicates(self) -> Iterator[List[str]]:
+        return self._count_derived_ref_terms(1, False)
+
+    def get_num_of_derived_ref_values(self) -> Iterator[List[str]]:
+        return self._count_derived_ref_terms(2, False)
+
+    def get_num_of_blank_derived_ref_nodes(self) -> Iterator[List[str]]:
+        return self._count_derived_ref_terms(0, True)
+
+    def get_num_of_blank_derived_ref_predicates(self) -> Iterator[List[str]]:
+        return self._count_derived_ref_terms(1, True)
+
+    def get_num_of_blank_derived_ref_values(self) -> Iterator[List[str]]:
+        return self._count_derived_ref_terms(2, True)
+
+    def get_statement_sources(self) -> Iterator[List[str]]:
+        rows = {}
+        for statement, ref, predicate, obj in self._iter_derived_ref_triples():
+            if _is_iri(obj) and self._is_ref_value(obj):
+                rows[(_value(statement), obj)] = None
+        for row in rows:
+            yield list(row)
+
+
+def aggregate_reference_subgraph(rows: Iterable[List[str]]) -> ReferenceGraphAggregator:
+    """
+    aggregate the rows of the get_reference_subgraph_wikimedia query: the
+    statement node, reference node, reference property, reference value
+    and the time/quantity type of the value, '' for the unbound terms
+    """
+    aggregator = ReferenceGraphAggregator(has_statement_links=False)
+    for row in rows:
+        statement, ref, predicate, obj, obj_type = (
+            list(row) + [''] * 5)[:5]
+        if not ref:
+            aggregator.add_triple(statement, RDF_TYPE, WIKIBASE_STATEMENT)
+            continue
+        aggregator.add_triple(statement, PROV_WAS_DERIVED_FROM, ref)
+        if predicate:
+            aggregator.add_triple(ref, predicate, obj)
+        if obj_type:
+            aggregator.add_triple(obj, RDF_TYPE, obj_type)
+    return aggregator
+
+
+def _read_bgzf_block(file_handler, offset: int) -> Optional[Tuple[bytes, int]]:
+    """
+    the decompressed data of the BGZF block at the offset of the file and the
+    offset of the next block. None at the end of the file or for the gzip
+    members that are not BGZF blocks
+    """
+    file_handler.seek(offset)
+    header = file_handler.read(18)
+    # gzip member with extra fields, of which the first one is the BC (block size) field
+    if len(header) < 18 or header[:4] != b'\x1f\x8b\x08\x04' or header[12:16] != b'BC\x02\x00':
+        return None
+    extra_length = int.from_bytes(header[10:12], 'little')
+    block_size = int.from_bytes(header[16:18], 'little') + 1
+    block = header + file_handler.read(block_size - len(header))
+    return zlib.decompress(block[12 + extra_length:-8], -15), offset + block_size
+
+
+def get_bgzf_block_offsets(path: str) -> Optional[List[int]]:
+    """
+    the offsets of the independently decompressible blocks of a bgzip
+    compressed file, None if the file is not bgzip compressed
+    """
+    offsets = []
+    with open(path, 'rb') as file_handler:
+        offset = 0
+        while True:
+            file_handler.seek(offset)
+            header = file_handler.read(18)
+            if not header:
+                return offsets
+            if len(header) < 18 or header[:4] != b'\x1f\x8b\x08\x04' or header[12:16] != b'BC\x02\x00':
+                return None
+            offsets.append(offset)
+            offset += int.from_bytes(header[16:18], 'little') + 1
+
+
+def _iter_plain_chunk_lines(path: str, start: int, end: int) -> Iterator[str]:
+    """
+    the lines of the file that start in the [start, end) byte range
+    """
+    with open(path, 'rb') as file_handler:
+        if start > 0:
+            # the line that has started before the range belongs to the previous chunk
+            file_handler.seek(start - 1)
+            file_handler.readline()
+        while file_handler.tell() < end:
+            line = file_handler.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+
+def _iter_bgzf_chunk_lines(path: str, start: int, end: int, previous: Optional[int]) -> Iterator[str]:
+    """
+    the lines of the bgzip compressed file that start in the blocks of the
+    [start, end) range. previous is the offset of the block before the range
+    """
+    with open(path, 'rb') as file_handler:
+        # the line that continues from the previous block belongs to the previous chunk
+        skip = previous is not None and not _read_bgzf_block(
+            file_handler, previous)[0].endswith(b'\n')
+        pending = b''
+        offset = start
+        while True:
+            beyond = offset >= end
+            if beyond and (skip or not pending):
+                break
+            block = _read_bgzf_block(file_handler, offset)
+            if block is None:
+                break
+            data, offset = block
+            if skip:
+                newline = data.find(b'\n')
+                if newline < 0:
+                    continue
+                data, skip = data[newline + 1:], False
+            if beyond:
+                # completing the last line of the range
+                newline = data.find(b'\n')
+                if newline < 0:
+                    pending += data
+                    continue
+                pending += data[:newline + 1]
+                break
+            lines = (pending + data).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.decode('utf-8')
+        if pending and not skip:
+            yield pending.decode('utf-8')
+
+
+def _aggregate_tasks(tasks: Queue, results: Queue) -> None:
+    """
+    aggregate the chunks of the N-Triples dump of the tasks queue until
+    None, and put the partial aggregates (or the error) in the results queue
+    """
+    aggregator = ReferenceGraphAggregator()
+    error = None
+    for kind, args in iter(tasks.get, None):
+        if error is not None:
+            # draining the queue, so the producer is not blocked
+            continue
+        try:
+            if kind == 'plain':
+                lines = _iter_plain_chunk_lines(*args)
+            elif kind == 'bgzf':
+                lines = _iter_bgzf_chunk_lines(*args)
+            else:
+                lines = args.decode('utf-8').splitlines()
+            aggregator.add_triples(iter_ntriples(lines))
+        except Exception as e:
+            error = e
+    results.put(error if error is not None else aggregator)
+
+
+def _put_chunk_tasks(path: str, tasks: Queue, chunk_size: int) -> None:
+    """
+    put the chunks of the N-Triples dump in the tasks queue: byte ranges of
+    the plain files, block ranges of the bgzip files, and line batches that
+    are decompressed here for the other compressed files
+    """
+    if path.endswith('.gz') or path.endswith('.bgz'):
+        offsets = get_bgzf_block_offsets(path)
+        if offsets is not None:
+            starts = []
+            for index, offset in enumerate(offsets):
+                if not starts or offset - offsets[starts[-1]] >= chunk_size:
+                    starts.append(index)
+            size = os.path.getsize(path)
+            for number, index in enumerate(starts):
+                end = offsets[starts[number + 1]] if number + 1 < len(starts) else size
+                tasks.put(('bgzf', (path, offsets[index], end,
+                           offsets[index - 1] if index > 0 else None)))
+            return
+    if path.endswith('.gz') or path.endswith('.bgz') or path.endswith('.bz2'):
+        with (bz2.open(path, 'rb') if path.endswith('.bz2') else gzip.open(path, 'rb')) as stream:
+            while True:
+                data = stream.read(chunk_size)
+                if not data:
+                    return
+                tasks.put(('lines', data + stream.readline()))
+    size = os.path.getsize(path)
+    for start in range(0, size, chunk_size):
+        tasks.put(('plain', (path, start, min(start + chunk_size, size))))
+
+
+def aggregate_dump_in_parallel(path: str, jobs: int, chunk_size: int = CHUNK_SIZE) -> ReferenceGraphAggregator:
+    """
+    aggregate the chunks of the N-Triples dump in jobs processes and merge
+    their partial aggregates. The reference nodes that are typed in another
+    chunk are recognized by '/reference/' in their IRIs, as in Wikibase dumps
+    """
+    tasks = Queue(maxsize=2 * jobs)
+    results = Queue()
+    workers = [Process(target=_aggregate_tasks, args=(tasks, results), daemon=True)
+               for i in range(jobs)]
+    for worker in workers:
+        worker.start()
+    try:
+        _put_chunk_tasks(path, tasks, chunk_size)
+    finally:
+        for worker in workers:
+            tasks.put(None)
+
+    aggregator = None
+    errors = []
+    for received in range(jobs):
+        while True:
+            try:
+                partial = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if any(worker.exitcode not in (None, 0) for worker in workers):
+                    raise OSError('A dump parsing process has been terminated')
+        if isinstance(partial, Exception):
+            errors.append(partial)
+        elif aggregator is None:
+            aggregator = partial
+        else:
+            aggregator.merge(partial)
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+    return aggregator
+
+
+def aggregate_dump(path: str, rdf_format: str, jobs: int = 1, chunk_size: int = CHUNK_SIZE) -> ReferenceGraphAggregator:
+    """
+    aggregate the reference subgraph of the dump file in one pass. The
+    N-Triples dumps are parsed in parallel if jobs is more than one
+    """
+    if rdf_format == 'nt' and jobs > 1:
+        return aggregate_dump_in_parallel(path, jobs, chunk_size)
+    aggregator = ReferenceGraphAggregator()
+    for number, triple in enumerate(iter_dump_triples(path, rdf_format), 1):
+        aggregator.add_triple(*triple)
+        if number % 10000000 == 0:
+            print('{0} triples have been read'.format(number))
+    return aggregator
@@ -1,8 +1,7 @@
-import sys
 from typing import List, NamedTuple
 
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.sparql import WIKIDATA_ENDPOINT, get_batched_query_values
 
 
 class PropInterlinkingResult(NamedTuple):
@@ -16,25 +15,23 @@ class PropInterlinkingResult(NamedTuple):
 class RefPropertiesInterlinkingChecker:
     results: List[PropInterlinkingResult] = None
     _ref_properties: List[str]
+    _endpoint: str = WIKIDATA_ENDPOINT
 
-    def __init__(self, ref_properties: List[str]):
+    def __init__(self, ref_properties: List[str], endpoint: str = WIKIDATA_ENDPOINT):
         self._ref_properties = ref_properties
+        self._endpoint = endpoint
 
     def check_reference_interlinking_from_Wikdiata(self) -> List[PropInterlinkingResult]:
         self.results = []
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
+        print('\t Getting equivalents of {0} reference properties'.format(len(self._ref_properties)))
+        prop_values = get_batched_query_values(RQSS_QUERIES['get_property_equivalents_batch_Wikidata'],
+                                               RQSS_QUERIES['get_property_equivalents_Wikidata'], self._ref_properties, self._endpoint)
         for prop in self._ref_properties:
-            print('\t Getting equivalents of reference property: ', prop)
-            sparql.setQuery(
-                RQSS_QUERIES['get_property_equivalents_Wikidata'].format(prop))
-            sparql.setReturnFormat(JSON)
+            values = prop_values[str(prop)]
+            if values is None:
+                continue
             try:
-                results = sparql.query().convert()
-                for result in results["results"]["bindings"]:
-                    value = result["to_ret"]["value"]
+                for value in values:
                     if value.isdigit():
                         self.results.append(
                             PropInterlinkingResult(prop, int(value)))
@@ -1,3 +1,4 @@
+import csv
 from typing import NamedTuple
 
 from Queries import RQSS_QUERIES
@@ -56,6 +57,16 @@ class BlankNodeChecker:
             num_ref_value_bn)
         return self.result
 
+    def check_blank_nodes_from_file(self, data_file: str) -> BlankNodeResults:
+        """
+        read the numbers of the blank_nodes.data file of the extractor (-bn)
+        """
+        with open(data_file, encoding='utf8', newline='') as file_handler:
+            reader = csv.reader(file_handler)
+            next(reader)
+            self.result = BlankNodeResults(*[int(i) for i in next(reader)])
+        return self.result
+
     @property
     def score(self):
         if self.result is not None:
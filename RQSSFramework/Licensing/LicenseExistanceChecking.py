@@ -1,8 +1,10 @@
-from typing import Iterator, List, NamedTuple
-from urllib.parse import urlparse
+import codecs
+from typing import Iterator, List, Mapping, NamedTuple, Optional
 
-import requests
 from rdflib import URIRef
+from utils.fetch import (BodyScanner, FetchEngine, FetchOptions, FetchResult,
+                         get_charset)
+from utils.probes import ProbeStore, get_domain_roots
 
 
 class LicExistOfDom(NamedTuple):
@@ -71,38 +73,76 @@ licensing_keywords=[
     'mozilla public license',
 ]
 
+# the home pages are scanned up to this number of bytes
+LICENSE_MAX_BODY = 2 << 20
+
+def get_matching_keywords(keywords: List[str]) -> List[str]:
+    """
+    the lowercased keywords without the ones which contain another keyword,
+    since a page which contains them contains the shorter one too
+    """
+    keywords = list(dict.fromkeys(k.lower() for k in keywords))
+    return [k for k in keywords if not any(j != k and j in k for j in keywords)]
+
+_matching_keywords = get_matching_keywords(licensing_keywords)
+_longest_keyword = max(len(k) for k in _matching_keywords)
+
+class LicenseScanner(BodyScanner):
+    """
+    search the licensing keywords in a page chunk by chunk. The end of each
+    chunk is kept with the next one, so the keywords across two chunks are
+    found too. The scan stops at the first keyword
+    """
+    result: bool = False
+    _tail: str = ''
+
+    def __init__(self, headers: Mapping[str, str]):
+        self._decoder = codecs.getincrementaldecoder(
+            get_charset(headers))(errors='replace')
+
+    def feed(self, chunk: bytes) -> bool:
+        text = self._tail + self._decoder.decode(chunk).lower()
+        self.result = any(k in text for k in _matching_keywords)
+        self._tail = text[-(_longest_keyword - 1):]
+        return self.result
+
 class LicenseChecker:
     _domains=[]
+    _fetch_options: FetchOptions = None
+    _probes: ProbeStore = None
+    _max_body: int = LICENSE_MAX_BODY
     results:List[LicExistOfDom]=None
-    def __init__(self, uris: Iterator[URIRef]):
+    def __init__(self, uris: Iterator[URIRef], fetch_options: Optional[FetchOptions] = None, probes: Optional[ProbeStore] = None,
+                 max_body: int = LICENSE_MAX_BODY):
+        self._fetch_options = fetch_options
+        self._max_body = max_body # the home pages are scanned up to this number of bytes
+        self._probes = probes # if given, the results are derived from the probed home pages
         _uris = list(dict.fromkeys(uris)) # remove duplicated URIs
         self._domains = dict.fromkeys(self.domain_extractor(_uris)) # compute and remove duplicated domains
     
     def domain_extractor(self,uris: Iterator[URIRef]) -> List[URIRef]:
-        ret_list=[]
-        for u in uris:
-            ret_list.append('https://'+urlparse(u).netloc)
-        return ret_list
+        return get_domain_roots(uris)
 
     def check_license_existance(self) -> List[LicExistOfDom]:
         """
         check the accssessibility of each URI in the class
         """
-        self.results=[]
-        for u in self._domains:
-            try:
-                r = requests.get(u, verify=False)
-                if (r.status_code == 200 and self.html_contains_license(r.text.lower())):   # main human readable license existance checking
-                    self.results.append(LicExistOfDom(u,True))
-                else:
-                    self.results.append(LicExistOfDom(u,False))
-            except Exception as e:
-                self.results.append(LicExistOfDom(u,False))
-                print(e)
+        fetcher = self._probes if self._probes is not None else FetchEngine(
+            self._fetch_options)
+        self.results = fetcher.fetch_all(
+            self._domains, verify_ssl=False, process=self._get_license_existance,
+            max_body=self._max_body, scan=LicenseScanner)
         return self.results
+
+    def _get_license_existance(self, response: FetchResult) -> LicExistOfDom:
+        if response.error is not None:
+            print(response.error)
+        # main human readable license existance checking
+        return LicExistOfDom(response.url, response.ok and bool(response.scanned))
     
     def html_contains_license(self, html: str):
-        return any(licensing_keyword in html for licensing_keyword in licensing_keywords)
+        html = html.lower()
+        return any(licensing_keyword in html for licensing_keyword in _matching_keywords)
 
     @property
     def score(self):
@@ -309,6 +309,14 @@ SELECT DISTINCT (?class AS ?ret1)
   }
 }
 ''',
+"get_class_hierarchy_wikimedia":
+'''
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+SELECT ?item ?property ?class WHERE{
+  VALUES ?property {wdt:P31 wdt:P279}
+  ?item ?property ?class.
+}
+''',
 "get_item_refed_facts_wikimedia":
 '''
 PREFIX wikibase: <http://wikiba.se/ontology#>
@@ -357,7 +365,7 @@ SELECT (REPLACE(STR(?refProperty),".*P","P") AS ?ret1)
 SELECT DISTINCT (REPLACE(STR(?item),".*Q","Q") AS ?to_ret) WHERE{{
   {{wd:{0} wdt:P279+ ?item.}}
   UNION{{
-    wd:{0} wdt:P31/wdt:279* ?item.
+    wd:{0} wdt:P31/wdt:P279* ?item.
   }}
 }}
 '''
@@ -466,4 +474,98 @@ SELECT DISTINCT ?to_ret WHERE {
           !CONTAINS(lcase(str(?to_ret)), "wikiba.se"))
 }
 '''
-}
\ No newline at end of file
+,
+"get_reference_subgraph_wikimedia":
+'''
+PREFIX wikibase: <http://wikiba.se/ontology#>
+PREFIX prov: <http://www.w3.org/ns/prov#>
+SELECT ?statementNode ?refNode ?refProperty ?refValue ?refValueType WHERE {
+  {
+    ?statementNode a wikibase:Statement .
+  }
+  UNION
+  {
+    ?statementNode prov:wasDerivedFrom ?refNode .
+    OPTIONAL {
+      ?refNode ?refProperty ?refValue .
+      OPTIONAL {
+        ?refValue a ?refValueType .
+        FILTER (?refValueType IN (wikibase:TimeValue, wikibase:QuantityValue))
+      }
+    }
+  }
+}
+''',
+# the batched forms of the property queries above: {0} is the list of the
+# properties of the VALUES clause, and the results are grouped by ?entity.
+# The VALUES clauses of the counts are in subqueries, so they are joined
+# before the OPTIONAL patterns by all engines and the unmatched properties
+# are counted as 0
+"get_property_equivalents_batch_Wikidata":
+'''
+SELECT ?entity (COUNT (?propEq) AS ?to_ret)
+WHERE {{
+  {{ SELECT ?entity WHERE {{ VALUES ?entity {{ {0} }} }} }}
+  OPTIONAL {{ ?entity wdt:P1628 ?propEq. }}
+}}
+GROUP BY ?entity
+''',
+"get_property_comments_batch_wikidata":
+'''
+SELECT ?entity (COUNT (?itemDescs) AS ?to_ret)
+WHERE {{
+  {{ SELECT ?entity WHERE {{ VALUES ?entity {{ {0} }} }} }}
+  OPTIONAL {{ ?entity schema:description ?itemDescs. }}
+}}
+GROUP BY ?entity
+''',
+"get_property_labels_batch_wikidata":
+'''
+SELECT ?entity (COUNT (?itemLabel) AS ?to_ret)
+WHERE {{
+  {{ SELECT ?entity WHERE {{ VALUES ?entity {{ {0} }} }} }}
+  OPTIONAL {{ ?entity rdfs:label ?itemLabel. }}
+}}
+GROUP BY ?entity
+''',
+"get_property_non_en_labels_batch_wikidata":
+'''
+SELECT ?entity (COUNT(?language) AS ?to_ret) WHERE{{
+  {{ SELECT ?entity WHERE {{ VALUES ?entity {{ {0} }} }} }}
+  OPTIONAL {{
+    ?entity rdfs:label ?label ;
+            rdfs:label ?enLabel .
+    FILTER(lang(?enLabel) = "en")
+    BIND (lang(?label) AS ?language)
+  }}
+}}
+GROUP BY ?entity
+''',
+"get_property_non_en_comments_batch_wikidata":
+'''
+SELECT ?entity (COUNT(?language) AS ?to_ret) WHERE{{
+  {{ SELECT ?entity WHERE {{ VALUES ?entity {{ {0} }} }} }}
+  OPTIONAL {{
+    ?entity schema:description ?desc ;
+            schema:description ?enDesc .
+    FILTER(lang(?enDesc) = "en")
+    BIND (lang(?desc) AS ?language)
+  }}
+}}
+GROUP BY ?entity
+''',
+"get_property_constraints_specificity_batch":
+'''
+SELECT ?entity ?to_ret WHERE{{
+  VALUES ?entity {{ {0} }}
+  BIND (EXISTS{{?entity p:P2302 [pq:P5314 wd:Q54828450]}} AS ?to_ret)
+}}
+''',
+"get_property_constraints_regex_batch":
+'''
+SELECT ?entity ?to_ret WHERE{{
+  VALUES ?entity {{ {0} }}
+  ?entity p:P2302 [pq:P1793 ?to_ret]
+}}
+'''
+}
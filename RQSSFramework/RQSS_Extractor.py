@@ -1,16 +1,23 @@
 import csv
+import hashlib
+import json
 import os
+import re
 import sys
+import time
 from argparse import ArgumentParser
 from datetime import datetime
-from multiprocessing.context import Process
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 
 from SPARQLWrapper import JSON, SPARQLWrapper
 
+from DumpExtractor import (DUMP_FORMATS, aggregate_dump,
+                           aggregate_reference_subgraph)
 from EntitySchemaExtractor import EntitySchemaExtractor
 from Queries import RQSS_QUERIES
+from utils.scheduler import JobResult, JobScheduler
+from utils.sparql import RESULT_FORMATS, iter_query_rows, iter_query_terms
 
 
 def genargs(prog: Optional[str] = None) -> ArgumentParser:
@@ -20,9 +27,19 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
     group.add_argument(
         "--endpoint", help="The local/public endpoint of the dataset")
     parser.add_argument(
-        "-f", "--format", help="Input file RDF format (nt, ttl)", default='nt')
+        "-f", "--format", help="Input file RDF format (nt, ttl). The file can be plain, gzip (.gz) or bzip2 (.bz2) compressed", choices=DUMP_FORMATS, default='nt')
     parser.add_argument(
         "-o", "--output-dir", help="Output destination directory to store extarcted components from the RDF input file", default=os.getcwd()+os.sep+'rqss_extractor_output')
+    parser.add_argument(
+        "-j", "--jobs", help="Maximum number of extractions performed in parallel, or of the processes that parse an N-Triples input file. The default is the number of CPUs", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--result-format", help="The SPARQL results format requested from the endpoint. CSV and TSV results are written to the output files while they are received. The default is json", choices=RESULT_FORMATS.keys(), default='json')
+    parser.add_argument(
+        "--page-size", help="Extract the query results in pages of PAGE_SIZE rows (LIMIT/OFFSET) and write each page to the output file. An interrupted extraction resumes from the last written page", type=int, required=False)
+    parser.add_argument(
+        "--endpoint-jobs", help="Maximum number of queries performed on the endpoint at the same time. The default is 4", type=int, default=4)
+    parser.add_argument(
+        "--single-pass", help="Extract the reference subgraph of the endpoint with one query (paged if --page-size is given) and compute the reference collections (-eu, -sn, -l, -rp, -rpvt, -ri, -sr, -aof, -pu, -es, -ss, -bn) from it instead of performing a query per collection. The CSV results format is not supported", action='store_true')
     parser.add_argument("-eu", "--external-uris",
                         help="Extract all external sources uris (Wikibase referencing model) and save them on output dir. Collects data for computing Dimensions: Availability, Licensing, Security", action='store_true')
     parser.add_argument("-sn", "--statement-nodes",
@@ -45,6 +62,8 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
                         help="Extract most up-to-date Wikidata EntitySchemas data from Wikidata directory and save them on output dir. Collects Wikidata E-ids data for computing COMPLETENESS metrics", action='store_true')
     parser.add_argument("-cf", "--classes-facts",
                         help="Extract all classes and their facts. Collects data for computing Metric: Class/Property Schema Completeness of References", action='store_true')
+    parser.add_argument("-ch", "--class-hierarchy",
+                        help="Extract all instance of (P31) and subclass of (P279) edges and save them on output dir. Collects data for computing Metric: Range Consistency of Reference Triples without querying Wikidata for the classes of each value", action='store_true')
     parser.add_argument("-sfr", "--statements-facts-refs",
                         help="Extract all statement id, fact of the statement and the reference properties and save them on output dir. Collects data for computing Metrics: Schema-based Property Completeness and Property Completeness of References", action='store_true')
     parser.add_argument("-aof", "--amount-of-data",
@@ -55,21 +74,26 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
                         help="Extract all external sources (including Wikidata items) and save them on output dir. Collects data for computing Mtric: Handy External Sources", action='store_true')
     parser.add_argument("-ss", "--statement-source",
                         help="Extract all statement ids and their sources (only IRIs, not literals) and save them on output dir. Collects data for computing Mtrics: Verifiable Type of references, Multilingual Sources and Multilingual Referenced Facts", action='store_true')
+    parser.add_argument("-bn", "--blank-nodes",
+                        help="Extract number of reference nodes, reference properties and reference values, and number of the blank ones and save them on output dir. Collects data for computing Metric: Usage of Blank Nodes", action='store_true')
+    # the aggregates of the dump file or of the reference subgraph of the endpoint
+    parser.set_defaults(dump=None)
     return parser
 
 
-def perform_query(endpoint: str, query: str) -> List[List[str]]:
+def get_query_rows(endpoint: str, query: str, result_format: str = 'json') -> Iterable[List[str]]:
+    """
+    perform the query and return the values of each result binding.
+    The CSV/TSV results are parsed incrementally while they are received.
+    Raise the exceptions of the request
+    """
+    if result_format != 'json':
+        return iter_query_rows(endpoint, query, result_format)
     ret_val = []
     sparql = SPARQLWrapper(endpoint)
     sparql.setQuery(query)
     sparql.setReturnFormat(JSON)
-    try:
-        print('Performing Query ...')
-        results = sparql.query().convert()
-    except Exception as e:
-        print('ERROR in performing query: {0}'.format(e))
-        return ret_val
-
+    results = sparql.query().convert()
     for result in results["results"]["bindings"]:
         row = []
         for value in result:
@@ -78,202 +102,305 @@ def perform_query(endpoint: str, query: str) -> List[List[str]]:
     return ret_val
 
 
+def perform_query(endpoint: str, query: str, result_format: str = 'json') -> List[List[str]]:
+    try:
+        print('Performing Query ...')
+        return list(get_query_rows(endpoint, query, result_format))
+    except Exception as e:
+        print('ERROR in performing query: {0}'.format(e))
+        return []
+
+
+def is_aggregated_query(opts: ArgumentParser, query: str) -> bool:
+    return opts.dump is not None and opts.dump.supports_query(query)
+
+
+def get_dataset_rows(opts: ArgumentParser, query: str) -> Iterable[List[str]]:
+    """
+    the result rows of the query over the aggregated --input dump file
+    (or --single-pass reference subgraph) if they support the query, or
+    over the --endpoint
+    """
+    if is_aggregated_query(opts, query):
+        return opts.dump.get_query_rows(query)
+    return get_query_rows(opts.endpoint, query, opts.result_format)
+
+
+def perform_dataset_query(opts: ArgumentParser, query: str) -> List[List[str]]:
+    try:
+        print('Performing Query ...')
+        return list(get_dataset_rows(opts, query))
+    except Exception as e:
+        print('ERROR in performing query: {0}'.format(e))
+        return []
+
+
+def get_projected_variables(projection: str) -> List[str]:
+    """
+    the variables of the SELECT clause, including the (expression AS ?var) ones
+    """
+    while True:
+        # removing the innermost parentheses of the expressions
+        stripped = re.sub(r'\((?![^()]*\bAS\b)[^()]*\)', '',
+                          projection, flags=re.IGNORECASE)
+        if stripped == projection:
+            break
+        projection = stripped
+    return re.findall(r'\?\w+', re.sub(r'\([^()]*\bAS\s+(\?\w+)\s*\)', r'\1', projection, flags=re.IGNORECASE))
+
+
+def get_paged_query(query: str, page_size: int, offset: int) -> str:
+    """
+    wrap the query in a sub-query ordered by its variables, so each page of
+    the results is the same over different requests
+    """
+    prefixes = []
+    body = []
+    for line in query.strip().splitlines():
+        if len(body) == 0 and line.strip().upper().startswith('PREFIX'):
+            prefixes.append(line)
+        else:
+            body.append(line)
+    body = '\n'.join(body)
+    projection = re.search(r'SELECT(.*?)WHERE', body,
+                           re.IGNORECASE | re.DOTALL)
+    projection = projection.group(1) if projection is not None else ''
+    variables = re.findall(r'\?\w+', projection)
+    order_by = 'ORDER BY {0}'.format(
+        ' '.join(dict.fromkeys(variables))) if len(variables) > 0 else ''
+    # projecting the variables in the order of the query, as the order of SELECT * is not defined
+    projected = get_projected_variables(projection)
+    return '{0}\nSELECT {1} WHERE {{\n{{\n{2}\n}}\n}}\n{3}\nLIMIT {4}\nOFFSET {5}\n'.format('\n'.join(prefixes), ' '.join(dict.fromkeys(projected)) or '*', body, order_by, page_size, offset)
+
+
+def perform_paged_query(endpoint: str, query: str, output_file: str, page_size: int, clean_row: Optional[Callable[[List[str]], List[str]]] = None, result_format: str = 'json', get_rows: Callable[[str, str, str], Iterable[List[str]]] = get_query_rows) -> int:
+    """
+    perform the query page by page and append each page (the rows of
+    get_rows) to the CSV output file. The number of written pages and the size of the output file are
+    kept in output_file + '.progress', so an interrupted extraction resumes
+    from the last written page
+    """
+    progress_file = output_file + '.progress'
+    query_hash = hashlib.sha1(query.encode('utf-8')).hexdigest()
+    pages = 0
+    position = 0
+    if os.path.isfile(progress_file) and os.path.isfile(output_file):
+        with open(progress_file, encoding='utf8') as file_handler:
+            progress = json.load(file_handler)
+        if progress.get('query') == query_hash and progress.get('page_size') == page_size:
+            pages = progress['pages']
+            position = progress['position']
+            print('Resuming from page {0} of the query'.format(pages + 1))
+
+    with open(output_file, 'r+' if position > 0 else 'w', newline='') as file_handler:
+        # dropping the rows of an incomplete page
+        file_handler.seek(position)
+        file_handler.truncate()
+        csv_writer = csv.writer(
+            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        while True:
+            num_rows = 0
+            try:
+                print('Performing Query, page {0} ...'.format(pages + 1))
+                for row in get_rows(endpoint, get_paged_query(query, page_size, pages * page_size), result_format):
+                    csv_writer.writerow(
+                        clean_row(row) if clean_row is not None else row)
+                    num_rows += 1
+            except Exception as e:
+                print('ERROR in performing query: {0}'.format(e))
+                return 1
+            file_handler.flush()
+            os.fsync(file_handler.fileno())
+            pages += 1
+            with open(progress_file + '.tmp', 'w', encoding='utf8') as progress_handler:
+                json.dump({'query': query_hash, 'page_size': page_size,
+                           'pages': pages, 'position': file_handler.tell()}, progress_handler)
+            os.replace(progress_file + '.tmp', progress_file)
+            if num_rows < page_size:
+                break
+
+    os.remove(progress_file)
+    return 0
+
+
+def write_query_results(opts: ArgumentParser, query: str, output_file: str, clean_row: Optional[Callable[[List[str]], List[str]]] = None) -> int:
+    """
+    write the results of the query in the CSV output file, page by page
+    if --page-size is given. The CSV/TSV results are written while they are
+    received
+    """
+    if opts.page_size and not is_aggregated_query(opts, query):
+        return perform_paged_query(opts.endpoint, query, output_file, opts.page_size, clean_row, opts.result_format)
+
+    with open(output_file, 'w', newline='') as file_handler:
+        csv_writer = csv.writer(
+            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        try:
+            print('Performing Query ...')
+            for row in get_dataset_rows(opts, query):
+                csv_writer.writerow(
+                    clean_row(row) if clean_row is not None else row)
+        except Exception as e:
+            print('ERROR in performing query: {0}'.format(e))
+            return 1
+    return 0
+
+
 def extract_external_uris(opts: ArgumentParser) -> int:
     print('Started extracting External Sources’ URIs')
     start_time = datetime.now()
 
-    external_uris = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_all_external_sources_filter_wikimedia_distinct"])
     output_file = os.path.join(opts.output_dir + os.sep + 'external_uris.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for uri in external_uris:
-            csv_writer.writerow(uri)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_all_external_sources_filter_wikimedia_distinct"], output_file)
 
     end_time = datetime.now()
     print('External URIs have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting External URIs, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_statement_nodes_uris(opts: ArgumentParser) -> int:
     print('Started extracting Statement Nodes URIs')
     start_time = datetime.now()
 
-    statement_uris = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_all_statement_nodes_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'statement_nodes_uris.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for uri in statement_uris:
-            csv_writer.writerow(uri)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_all_statement_nodes_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('Statement Nodes URIs have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting Statement Nodes URIs, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_refrence_literals(opts: ArgumentParser) -> int:
     print('Started extracting literal values in reference triples')
     start_time = datetime.now()
 
-    ref_literals = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_reference_literals_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'reference_literals.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for lit in ref_literals:
-            csv_writer.writerow(lit)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_reference_literals_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('References’ literal values have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting literal values in reference triples, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_fact_ref_triples(opts: ArgumentParser) -> int:
     print('Started extracting fact subjects, predicate, and reference triples')
     start_time = datetime.now()
 
-    fact_ref_triples = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_fact_ref_triples_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'fact_ref_triples.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in fact_ref_triples:
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_fact_ref_triples_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('Facts and their referece triples have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting facts and their reference triples, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_reference_properties(opts: ArgumentParser) -> int:
     print('Started extracting properties that are used in references')
     start_time = datetime.now()
 
-    ref_props = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_ref_properties_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'ref_properties.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in ref_props:
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_ref_properties_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('Reference properties have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting reference properties, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_reference_properties_value_types(opts: ArgumentParser) -> int:
     print('Started extracting reference properties and their object values types')
     start_time = datetime.now()
 
-    ref_props = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_ref_properties_object_value_types_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'ref_properties_object_value.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in ref_props:
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_ref_properties_object_value_types_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('Reference properties and object value types have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting reference properties and object value types, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_reference_node_incomings(opts: ArgumentParser) -> int:
     print('Started extracting reference nodes and the numebr of their incoming edges (prov:wasDerivedFrom)')
     start_time = datetime.now()
 
-    ref_props = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_ref_nodes_incomings_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'ref_nodes_incomings.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in ref_props:
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_ref_nodes_incomings_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('Reference nodes and the numebr of their incoming edges (prov:wasDerivedFrom) have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting reference nodes and the numebr of their incoming edges (prov:wasDerivedFrom), Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_statement_node_references(opts: ArgumentParser) -> int:
     print('Started extracting statement nodes and the numebr of their references')
     start_time = datetime.now()
 
-    ref_props = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_sattement_nodes_ref_num_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'statement_node_ref_num.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in ref_props:
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_sattement_nodes_ref_num_wikimedia"], output_file)
 
     end_time = datetime.now()
     print('Statement nodes and the numebr of their references have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting statement nodes and the numebr of their references, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_item_referenced_facts(opts: ArgumentParser) -> int:
     print('Started extracting items and their referenced facts')
     start_time = datetime.now()
 
-    item_refed_facts = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_item_refed_facts_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'item_refed_facts.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in item_refed_facts:
-            csv_writer.writerow([cell.replace('http://www.wikidata.org/entity/',
-                                              '').replace('http://www.wikidata.org/prop/', '') for cell in row])
+
+    def clean_row(row: List[str]) -> List[str]:
+        return [cell.replace('http://www.wikidata.org/entity/',
+                             '').replace('http://www.wikidata.org/prop/', '') for cell in row]
+
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_item_refed_facts_wikimedia"], output_file, clean_row)
 
     end_time = datetime.now()
     print('Items and their referenced facts have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting items and their referenced facts, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_wikidata_entityschemas_data(opts: ArgumentParser) -> int:
@@ -305,63 +432,85 @@ def extract_wikidata_entityschemas_data(opts: ArgumentParser) -> int:
                 for ref_predicate in refed_facts_ref.ref_predicates:
                     csv_writer.writerow(
                         [eid.e_id, refed_facts_ref.refed_fact, ref_predicate])
+    return 0
 
 
 def extract_classes_facts(opts: ArgumentParser) -> int:
     print('Started extracting classes and their facts')
     start_time = datetime.now()
 
-    item_refed_facts = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_classes_and_facts"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'classes_facts.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in item_refed_facts:
-            row = [
-                row[0].replace('http://www.wikidata.org/entity/', ''),
-                row[1].replace('http://www.wikidata.org/prop/', '')] if len(row) == 2 else [
-                'no_class_found',
-                row[0].replace('http://www.wikidata.org/prop/', '')]
-            csv_writer.writerow(row)
+
+    def clean_row(row: List[str]) -> List[str]:
+        row = [
+            row[0].replace('http://www.wikidata.org/entity/', ''),
+            row[1].replace('http://www.wikidata.org/prop/', '')] if len(row) == 2 else [
+            'no_class_found',
+            row[0].replace('http://www.wikidata.org/prop/', '')]
+        return row
+
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_classes_and_facts"], output_file, clean_row)
 
     end_time = datetime.now()
     print('Classes and their facts have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting classes and their facts, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
+
+
+def extract_class_hierarchy(opts: ArgumentParser) -> int:
+    print('Started extracting the instance of and subclass of edges')
+    start_time = datetime.now()
+
+    output_file = os.path.join(
+        opts.output_dir + os.sep + 'class_hierarchy.data')
+
+    def clean_row(row: List[str]) -> List[str]:
+        return [row[0].replace('http://www.wikidata.org/entity/', ''),
+                row[1].replace('http://www.wikidata.org/prop/direct/', ''),
+                row[2].replace('http://www.wikidata.org/entity/', '')]
+
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_class_hierarchy_wikimedia"], output_file, clean_row)
+
+    end_time = datetime.now()
+    print('The instance of and subclass of edges have been written in the file: {0}'.format(
+        output_file))
+    print('DONE. Extracting the instance of and subclass of edges, Duration: {0}'.format(
+        end_time - start_time))
+    return ret_val
 
 
 def extract_statement_fact_refed_props_wikimedia(opts: ArgumentParser) -> int:
     print('Started extracting statement id, fact of the statement and the reference properties')
     start_time = datetime.now()
 
-    item_refed_facts = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_statement_fact_refed_props_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'statement_fact_refed_props.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in item_refed_facts:
-            row = [
-                row[0].replace(
-                    'http://www.wikidata.org/entity/statement/', ''),
-                row[1].replace('http://www.wikidata.org/prop/', ''),
-                row[2].replace('http://www.wikidata.org/prop/reference/', '')] if len(row) == 3 else [
-                row[0].replace(
-                    'http://www.wikidata.org/entity/statement/', ''),
-                row[1].replace('http://www.wikidata.org/prop/', '')]
-            csv_writer.writerow(row)
+
+    def clean_row(row: List[str]) -> List[str]:
+        row = [
+            row[0].replace(
+                'http://www.wikidata.org/entity/statement/', ''),
+            row[1].replace('http://www.wikidata.org/prop/', ''),
+            row[2].replace('http://www.wikidata.org/prop/reference/', '')] if len(row) == 3 else [
+            row[0].replace(
+                'http://www.wikidata.org/entity/statement/', ''),
+            row[1].replace('http://www.wikidata.org/prop/', '')]
+        return row
+
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_statement_fact_refed_props_wikimedia"], output_file, clean_row)
 
     end_time = datetime.now()
     print('Statement id, fact of the statement and the reference properties have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting statement id, fact of the statement and the reference properties, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_amount_of_data_wikimedia(opts: ArgumentParser) -> int:
@@ -376,11 +525,11 @@ def extract_amount_of_data_wikimedia(opts: ArgumentParser) -> int:
         opts.output_dir + os.sep + 'literal_per_ref_node_distribution.data')
 
     print('Get number of statement nodes')
-    num_statement_nodes = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_num_of_statement_nodes_wikimedia"])
+    num_statement_nodes = perform_dataset_query(
+        opts, RQSS_QUERIES["get_num_of_statement_nodes_wikimedia"])
     print('Get number of reference nodes')
-    num_ref_nodes = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_num_of_ref_nodes_wikimedia"])
+    num_ref_nodes = perform_dataset_query(
+        opts, RQSS_QUERIES["get_num_of_ref_nodes_wikimedia"])
 
     with open(output_file_num, 'w', newline='') as file_handler:
         csv_writer = csv.writer(
@@ -389,36 +538,26 @@ def extract_amount_of_data_wikimedia(opts: ArgumentParser) -> int:
             ['num of statement nodes', 'num of reference nodes'])
         csv_writer.writerow([num_statement_nodes[0][0], num_ref_nodes[0][0]])
 
+    def clean_row(row: List[str]) -> List[str]:
+        row = [
+            row[0].replace('http://www.wikidata.org/reference/', ''),
+            row[1]]
+        return row
+
     print('Get triple per reference node distribution')
-    triple_dist = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_triple_per_ref_node_distribution_wikimedia"])
-    with open(output_file_triple_dist, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in triple_dist:
-            row = [
-                row[0].replace('http://www.wikidata.org/reference/', ''),
-                row[1]]
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_triple_per_ref_node_distribution_wikimedia"], output_file_triple_dist, clean_row)
 
     print('Get literal values per reference node distribution')
-    literal_dist = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_literal_per_ref_node_distribution_wikimedia"])
-    with open(output_file_literal_dist, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in literal_dist:
-            row = [
-                row[0].replace('http://www.wikidata.org/reference/', ''),
-                row[1]]
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_literal_per_ref_node_distribution_wikimedia"], output_file_literal_dist, clean_row) or ret_val
 
     end_time = datetime.now()
     print('Number of statement nodes, reference nodes, and distribution of triple and literals amongst reference nodes have been written in the files: {0}, {1}, {2}'.format(
         output_file_num, output_file_triple_dist, output_file_literal_dist))
     print('DONE. Extracting number of statement nodes, reference nodes, and distribution of triple and literals amongst reference nodes, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_refـpropـusage_wikimedia(opts: ArgumentParser) -> int:
@@ -431,11 +570,11 @@ def extract_refـpropـusage_wikimedia(opts: ArgumentParser) -> int:
         opts.output_dir + os.sep + 'reference_property_usage_distribution.data')
 
     print('Get number of reference properties')
-    num_ref_prop = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_num_of_reference_properties_wikimedia"])
+    num_ref_prop = perform_dataset_query(
+        opts, RQSS_QUERIES["get_num_of_reference_properties_wikimedia"])
     print('Get number of reference triples')
-    num_ref_triple = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_num_of_reference_triples_wikimedia"])
+    num_ref_triple = perform_dataset_query(
+        opts, RQSS_QUERIES["get_num_of_reference_triples_wikimedia"])
 
     with open(output_file_num, 'w', newline='') as file_handler:
         csv_writer = csv.writer(
@@ -444,47 +583,43 @@ def extract_refـpropـusage_wikimedia(opts: ArgumentParser) -> int:
             ['num of ref properties', 'num of ref triples'])
         csv_writer.writerow([num_ref_prop[0][0], num_ref_triple[0][0]])
 
+    def clean_row(row: List[str]) -> List[str]:
+        row = [
+            row[0].replace('http://www.wikidata.org/prop/reference/', ''),
+            row[1]]
+        return row
+
     print('Get reference properties usage distribution')
-    usage_dist = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_reference_properties_usage_distribution_wikimedia"])
-    with open(output_file_usage_dist, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in usage_dist:
-            row = [
-                row[0].replace('http://www.wikidata.org/prop/reference/', ''),
-                row[1]]
-            csv_writer.writerow(row)
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_reference_properties_usage_distribution_wikimedia"], output_file_usage_dist, clean_row)
 
     end_time = datetime.now()
     print('number of reference properties, reference triples and reference properties usage distribution have been written in the files: {0}, {1}'.format(
         output_file_num, output_file_usage_dist))
     print('DONE. Extracting number of reference properties, reference triples and reference properties usage distribution, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 def extract_external_sources_wikimedia(opts: ArgumentParser) -> int:
     print('Started extracting External Sources')
     start_time = datetime.now()
 
-    external_uris = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_all_external_sources_distinct"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'external_sources.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for uri in external_uris:
-            csv_writer.writerow(
-                [cell.replace('http://www.wikidata.org/entity/', '') for cell in uri])
+
+    def clean_row(uri: List[str]) -> List[str]:
+        return [cell.replace('http://www.wikidata.org/entity/', '') for cell in uri]
+
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_all_external_sources_distinct"], output_file, clean_row)
 
     end_time = datetime.now()
     print('External Sources have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting External Sources, Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
 
@@ -492,105 +627,256 @@ def extract_statements_sources_wikimedia(opts: ArgumentParser) -> int:
     print('Started extracting statement ids and their sources (only IRIs, not literals)')
     start_time = datetime.now()
 
-    statement_source = perform_query(
-        opts.endpoint, RQSS_QUERIES["get_statement_sources_wikimedia"])
     output_file = os.path.join(
         opts.output_dir + os.sep + 'statement_source.data')
-    with open(output_file, 'w', newline='') as file_handler:
-        csv_writer = csv.writer(
-            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        for row in statement_source:
-            row = [
-                row[0].replace('http://www.wikidata.org/entity/statement/', ''),
-                row[1].replace('http://www.wikidata.org/entity/', '')]
-            csv_writer.writerow(row)
+
+    def clean_row(row: List[str]) -> List[str]:
+        row = [
+            row[0].replace('http://www.wikidata.org/entity/statement/', ''),
+            row[1].replace('http://www.wikidata.org/entity/', '')]
+        return row
+
+    ret_val = write_query_results(
+        opts, RQSS_QUERIES["get_statement_sources_wikimedia"], output_file, clean_row)
 
     end_time = datetime.now()
     print('Statement ids and their sources (only IRIs, not literals) have been written in the file: {0}'.format(
         output_file))
     print('DONE. Extracting statement ids and their sources (only IRIs, not literals), Duration: {0}'.format(
         end_time - start_time))
-    return 0
+    return ret_val
 
 
-def extract_from_file(opts: ArgumentParser) -> int:
-    print('Local file extraction is not supported yet. Please use local/public endpoint.')
-    return 1
+# the counts of the reference nodes, properties and values, and of the blank ones
+BLANK_NODES_QUERIES = ('get_num_of_provWasDerivedFrom_wikimedia', 'get_num_of_ref_predicate_wikimedia', 'get_num_of_ref_value_wikimedia',
+                       'get_num_of_BN_provWasDerivedFrom_wikimedia', 'get_num_of_BN_ref_predicate_wikimedia', 'get_num_of_BN_ref_value_wikimedia')
 
 
-def extract_from_endpoint(opts: ArgumentParser) -> int:
-    # list of parallel processes
-    extractor_procs = []
+def extract_blank_nodes(opts: ArgumentParser) -> int:
+    print('Started extracting number of reference nodes, reference properties and reference values, and number of the blank ones')
+    start_time = datetime.now()
+
+    output_file = os.path.join(
+        opts.output_dir + os.sep + 'blank_nodes.data')
 
-    if(opts.external_uris):
-        p = Process(target=extract_external_uris(opts))
-        extractor_procs.append(p)
+    counts = []
+    for query in BLANK_NODES_QUERIES:
+        rows = perform_dataset_query(opts, RQSS_QUERIES[query])
+        if len(rows) == 0:
+            return 1
+        counts.append(rows[0][0])
 
-    if(opts.statement_nodes):
-        p = Process(target=extract_statement_nodes_uris(opts))
-        extractor_procs.append(p)
+    with open(output_file, 'w', newline='') as file_handler:
+        csv_writer = csv.writer(
+            file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(['num of ref nodes', 'num of ref predicates', 'num of ref values',
+                             'num of BLANK ref nodes', 'num of BLANK ref predicates', 'num of BLANK ref values'])
+        csv_writer.writerow(counts)
 
-    if(opts.literals):
-        p = Process(target=extract_refrence_literals(opts))
-        extractor_procs.append(p)
+    end_time = datetime.now()
+    print('Number of reference nodes, reference properties and reference values, and number of the blank ones have been written in the file: {0}'.format(
+        output_file))
+    print('DONE. Extracting number of reference nodes, reference properties and reference values, and number of the blank ones, Duration: {0}'.format(
+        end_time - start_time))
+    return 0
 
-    if(opts.fact_ref_triples):
-        p = Process(target=extract_fact_ref_triples(opts))
-        extractor_procs.append(p)
 
-    if(opts.ref_properties):
-        p = Process(target=extract_reference_properties(opts))
-        extractor_procs.append(p)
+def get_query_terms(endpoint: str, query: str, result_format: str = 'json') -> Iterable[List[str]]:
+    """
+    the terms of the result rows (see utils.sparql.iter_query_terms), ''
+    for the unbound variables
+    """
+    for row in iter_query_terms(endpoint, query, result_format):
+        yield ['' if term is None else term for term in row]
 
-    if(opts.ref_prop_value_type):
-        p = Process(target=extract_reference_properties_value_types(opts))
-        extractor_procs.append(p)
 
-    if(opts.ref_incomings):
-        p = Process(target=extract_reference_node_incomings(opts))
-        extractor_procs.append(p)
+def extract_reference_subgraph(opts: ArgumentParser) -> int:
+    print('Started extracting the reference subgraph')
+    start_time = datetime.now()
 
-    if(opts.statement_refs):
-        p = Process(target=extract_statement_node_references(opts))
-        extractor_procs.append(p)
+    output_file = os.path.join(
+        opts.output_dir + os.sep + 'reference_subgraph.data')
+    query = RQSS_QUERIES["get_reference_subgraph_wikimedia"]
+    if opts.page_size:
+        ret_val = perform_paged_query(opts.endpoint, query, output_file,
+                                      opts.page_size, result_format=opts.result_format, get_rows=get_query_terms)
+    else:
+        ret_val = 0
+        with open(output_file, 'w', newline='') as file_handler:
+            csv_writer = csv.writer(
+                file_handler, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            try:
+                print('Performing Query ...')
+                csv_writer.writerows(get_query_terms(
+                    opts.endpoint, query, opts.result_format))
+            except Exception as e:
+                print('ERROR in performing query: {0}'.format(e))
+                ret_val = 1
+    if ret_val != 0:
+        return ret_val
 
-    if(opts.item_refed_facts):
-        p = Process(target=extract_item_referenced_facts(opts))
-        extractor_procs.append(p)
+    with open(output_file, encoding='utf8', newline='') as file_handler:
+        opts.dump = aggregate_reference_subgraph(csv.reader(file_handler))
 
-    if(opts.wikidata_eschema_data):
-        p = Process(target=extract_wikidata_entityschemas_data(opts))
-        extractor_procs.append(p)
+    end_time = datetime.now()
+    print('The reference subgraph has been written in the file: {0}'.format(
+        output_file))
+    print('DONE. Extracting the reference subgraph, Duration: {0}'.format(
+        end_time - start_time))
+    return 0
 
-    if(opts.classes_facts):
-        p = Process(target=extract_classes_facts(opts))
-        extractor_procs.append(p)
 
-    if(opts.statements_facts_refs):
-        p = Process(target=extract_statement_fact_refed_props_wikimedia(opts))
-        extractor_procs.append(p)
+class Extraction(NamedTuple):
+    option: str
+    extract: Callable[[ArgumentParser], int]
+    outputs: Tuple[str, ...] = ()   # files of the --output-dir the extraction writes
+    resource: str = None            # the server that is queried, None for the --endpoint
+    queries: Tuple[str, ...] = ()   # the RQSS_QUERIES of the --endpoint or of the aggregated dump
+
+
+# the option of each extraction, the function that extracts it, its files and its queries
+EXTRACTIONS = [
+    Extraction('external_uris', extract_external_uris,
+               outputs=('external_uris.data',),
+               queries=('get_all_external_sources_filter_wikimedia_distinct',)),
+    Extraction('statement_nodes', extract_statement_nodes_uris,
+               outputs=('statement_nodes_uris.data',),
+               queries=('get_all_statement_nodes_wikimedia',)),
+    Extraction('literals', extract_refrence_literals,
+               outputs=('reference_literals.data',),
+               queries=('get_reference_literals_wikimedia',)),
+    Extraction('fact_ref_triples', extract_fact_ref_triples,
+               outputs=('fact_ref_triples.data',),
+               queries=('get_fact_ref_triples_wikimedia',)),
+    Extraction('ref_properties', extract_reference_properties,
+               outputs=('ref_properties.data',),
+               queries=('get_ref_properties_wikimedia',)),
+    Extraction('ref_prop_value_type', extract_reference_properties_value_types,
+               outputs=('ref_properties_object_value.data',),
+               queries=('get_ref_properties_object_value_types_wikimedia',)),
+    Extraction('ref_incomings', extract_reference_node_incomings,
+               outputs=('ref_nodes_incomings.data',),
+               queries=('get_ref_nodes_incomings_wikimedia',)),
+    Extraction('statement_refs', extract_statement_node_references,
+               outputs=('statement_node_ref_num.data',),
+               queries=('get_sattement_nodes_ref_num_wikimedia',)),
+    Extraction('item_refed_facts', extract_item_referenced_facts,
+               outputs=('item_refed_facts.data',),
+               queries=('get_item_refed_facts_wikimedia',)),
+    Extraction('wikidata_eschema_data', extract_wikidata_entityschemas_data,
+               outputs=('eschemas_summarization_related_classes.data', 'eschemas_summarization_related_refed_fact_refs.data'), resource='https://www.wikidata.org'),
+    Extraction('classes_facts', extract_classes_facts,
+               outputs=('classes_facts.data',),
+               queries=('get_classes_and_facts',)),
+    Extraction('class_hierarchy', extract_class_hierarchy,
+               outputs=('class_hierarchy.data',),
+               queries=('get_class_hierarchy_wikimedia',)),
+    Extraction('statements_facts_refs', extract_statement_fact_refed_props_wikimedia,
+               outputs=('statement_fact_refed_props.data',),
+               queries=('get_statement_fact_refed_props_wikimedia',)),
+    Extraction('amount_of_data', extract_amount_of_data_wikimedia,
+               outputs=('num_of_statement_and_ref_nodes.data', 'triple_per_ref_node_distribution.data', 'literal_per_ref_node_distribution.data'),
+               queries=('get_num_of_statement_nodes_wikimedia', 'get_num_of_ref_nodes_wikimedia',
+                        'get_triple_per_ref_node_distribution_wikimedia', 'get_literal_per_ref_node_distribution_wikimedia')),
+    Extraction('ref_prop_usage', extract_refـpropـusage_wikimedia,
+               outputs=('num_of_ref_props_and_ref_triples.data', 'reference_property_usage_distribution.data'),
+               queries=('get_num_of_reference_properties_wikimedia', 'get_num_of_reference_triples_wikimedia',
+                        'get_reference_properties_usage_distribution_wikimedia')),
+    Extraction('external_sources', extract_external_sources_wikimedia,
+               outputs=('external_sources.data',),
+               queries=('get_all_external_sources_distinct',)),
+    Extraction('statement_source', extract_statements_sources_wikimedia,
+               outputs=('statement_source.data',),
+               queries=('get_statement_sources_wikimedia',)),
+    Extraction('blank_nodes', extract_blank_nodes,
+               outputs=('blank_nodes.data',), queries=BLANK_NODES_QUERIES),
+]
+
+
+def get_extraction_resource(opts: ArgumentParser, extraction: Extraction) -> Optional[str]:
+    """
+    the server that the extraction queries, or None if all of its queries
+    are answered from the aggregated dump or reference subgraph
+    """
+    if extraction.resource is not None:
+        return extraction.resource
+    if extraction.queries and all(is_aggregated_query(opts, RQSS_QUERIES[i]) for i in extraction.queries):
+        return None
+    return opts.endpoint
+
+
+def count_rows(files: List[str]) -> int:
+    """
+    total number of the CSV rows (including headers) of the existing files
+    """
+    rows = 0
+    for file in files:
+        if not os.path.isfile(file):
+            continue
+        with open(file, encoding='utf8', newline='') as file_handler:
+            rows += sum(1 for _ in csv.reader(file_handler))
+    return rows
+
+
+def print_summary(results: List[JobResult], outputs: Dict[str, List[str]]) -> None:
+    print('Summary of the extractions:')
+    for result in results:
+        print('{0}, Rows:{1}'.format(
+            result, count_rows(outputs[result.name])))
 
-    if(opts.amount_of_data):
-        p = Process(target=extract_amount_of_data_wikimedia(opts))
-        extractor_procs.append(p)
 
-    if(opts.ref_prop_usage):
-        p = Process(target=extract_refـpropـusage_wikimedia(opts))
-        extractor_procs.append(p)
+def extract_from_file(opts: ArgumentParser) -> int:
+    if not os.path.isfile(opts.input):
+        print('ERROR: the input file does not exist: {0}'.format(opts.input))
+        return 1
+
+    # reading the dump once, the selected extractions are then answered
+    # from the aggregated reference subgraph
+    print('Started reading the reference subgraph of the dump: {0}'.format(
+        opts.input))
+    start_time = datetime.now()
+    try:
+        opts.dump = aggregate_dump(opts.input, opts.format, opts.jobs)
+    except (OSError, ValueError) as e:
+        print('ERROR in reading the dump: {0}'.format(e))
+        return 1
+    end_time = datetime.now()
+    print('DONE. Reading the reference subgraph of the dump, Duration: {0}'.format(
+        end_time - start_time))
 
-    if(opts.external_sources):
-        p = Process(target=extract_external_sources_wikimedia(opts))
-        extractor_procs.append(p)
+    results = []
+    outputs = {}
+    for extraction in [i for i in EXTRACTIONS if getattr(opts, i.option)]:
+        outputs[extraction.option] = [os.path.join(
+            opts.output_dir, i) for i in extraction.outputs]
+        extraction_start = time.perf_counter()
+        exit_code = extraction.extract(opts)
+        results.append(JobResult(extraction.option, exit_code,
+                       time.perf_counter() - extraction_start))
 
-    if(opts.statement_source):
-        p = Process(target=extract_statements_sources_wikimedia(opts))
-        extractor_procs.append(p)
+    print_summary(results, outputs)
+    return 0 if all(result.exit_code == 0 for result in results) else 1
 
-    for proc in extractor_procs:
-        proc.start()
 
-    for proc in extractor_procs:
-        proc.join()
+def extract_from_endpoint(opts: ArgumentParser) -> int:
+    if opts.single_pass and extract_reference_subgraph(opts) != 0:
+        return 1
+
+    # running the selected extractions in parallel processes, at most
+    # --endpoint-jobs of them on the same endpoint at the same time. The
+    # extractions answered from the --single-pass aggregates do not count
+    scheduler = JobScheduler(opts.jobs, resource_limits={
+        opts.endpoint: opts.endpoint_jobs, 'https://www.wikidata.org': opts.endpoint_jobs})
+    extractions = [i for i in EXTRACTIONS if getattr(opts, i.option)]
+    outputs = {}
+    for extraction in extractions:
+        outputs[extraction.option] = [os.path.join(
+            opts.output_dir, i) for i in extraction.outputs]
+        scheduler.add_job(extraction.option, extraction.extract, opts,
+                          outputs=outputs[extraction.option], resource=get_extraction_resource(opts, extraction))
+
+    print_summary(scheduler.run(), outputs)
+    return 0 if len(scheduler.failed) == 0 else 1
 
 
 def RQSS_Extractor(argv: Optional[Union[str, List[str]]] = None, prog: Optional[str] = None) -> int:
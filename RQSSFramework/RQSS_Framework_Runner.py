@@ -3,9 +3,8 @@ import os
 import sys
 from argparse import ArgumentParser
 from datetime import datetime
-from multiprocessing.context import Process
 from pathlib import Path
-from typing import List, NamedTuple, Optional, Union
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import pandas as pd
 
@@ -29,17 +28,29 @@ from Currency.ReferenceFreshnessChecking import *
 from EntitySchemaExtractor import EidRefSummary, RefedFactRef
 from Interlinking.RefPropertiesInterlinkingChecking import *
 from Interpretability.BlankNodeChecking import *
-from Licensing.LicenseExistanceChecking import LicenseChecker
+from Licensing.LicenseExistanceChecking import LICENSE_MAX_BODY, LicenseChecker
 from Objectivity.MultipleReferenceChecking import *
 from Queries import RQSS_QUERIES
 from Representational_Conciseness.ExternalSourcesURILengthChecking import *
 from Representational_Consistency.RefPropertiesDiversityComputing import *
-from Reputation.DNSBLBlacklistedChecking import DNSBLBlacklistedChecker
+from Reputation.DNSBLBlacklistedChecking import (DEFAULT_DNSBL_CONCURRENCY,
+                                               DNSBLBlacklistedChecker)
 from Security.TLSExistanceChecking import TLSChecker
 from Timeliness.ExternalURIsTimelinessChecking import *
 from Understandability.HandyExternalSourcesChecking import *
 from Understandability.HumanReadableMetadataChecking import *
+from utils.class_hierarchy import ClassHierarchyIndex
+from utils.fetch import FetchOptions
 from utils.lists import known_datasets
+from utils.probes import (DEFAULT_MAX_BODY, ProbeRequest, ProbeStore,
+                          add_probe_requests, get_domain_roots,
+                          get_https_uris, probe_uris)
+from utils.scheduler import JobScheduler
+from utils.query_cache import QueryCache
+from utils.sparql import (DEFAULT_CONCURRENCY, RESULT_FORMATS,
+                          WIKIDATA_CONCURRENCY, WIKIDATA_ENDPOINT, RateLimiter,
+                          SPARQLClient, get_client, get_default_concurrency,
+                          set_client)
 from Verifiability.TypeofSourcesChecking import *
 from Versatility.MultilingualMetadataChecking import *
 from Versatility.MultilingualSourcesAndFactsChecking import *
@@ -56,10 +67,54 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
         "--upper-date", help="The upper date (Format DD-MM-YYYY) limit for reivision history checker metrics. The deafult is now()", required=False, type=lambda d: datetime.datetime.strptime(d, "%d-%m-%Y"), default=datetime.datetime.now())
     parser.add_argument(
         "-o", "--output-dir", help="Output destination directory to store computed metrics details", default=os.getcwd()+os.sep+'rqss_framework_output')
+    parser.add_argument(
+        "-j", "--jobs", help="Maximum number of metrics computed in parallel. The default is the number of CPUs", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--sparql-result-format", help="The SPARQL results format requested from Wikidata by the metrics Verifiable Type of References, Handy External Sources and Multilingual Sources. The default is json", choices=RESULT_FORMATS.keys(), default='json')
+    sparql_group = parser.add_argument_group(
+        title='options for querying Wikidata', description='used by all of the metrics that query Wikidata. The numbers of the queries, retried queries and failed queries are printed at the end of each metric')
+    sparql_group.add_argument(
+        "--wikidata-endpoint", help="The SPARQL endpoint queried instead of WDQS, e.g., a local mirror of Wikidata. The default is {0}".format(WIKIDATA_ENDPOINT), default=WIKIDATA_ENDPOINT)
+    sparql_group.add_argument(
+        "--sparql-rate", help="Maximum number of queries per second of all of the metrics together. No limit by default", type=float)
+    sparql_group.add_argument(
+        "--sparql-concurrency", help="Maximum number of queries in flight of all of the metrics together. The metrics Verifiable Type of References and Handy External Sources send their queries in as many threads. The default is {0} for WDQS and {1} for the other --wikidata-endpoint".format(WIKIDATA_CONCURRENCY, DEFAULT_CONCURRENCY), type=int)
+    sparql_group.add_argument(
+        "--sparql-retries", help="Number of times a throttled or failed query is retried, waiting exponentially longer or for the Retry-After of the endpoint. The default is 5", type=int, default=5)
+    sparql_group.add_argument(
+        "--sparql-cache", help="The SQLite file of a persistent cache of the query results, shared by the metrics and the later runs, so a repeated query is not sent again. No cache by default", required=False)
+    sparql_group.add_argument(
+        "--sparql-cache-ttl", help="Days a cached query result is used. The default is 30", type=float, default=30)
+    sparql_group.add_argument(
+        "--sparql-cache-invalidate", help="Remove the cached results of the queries that contain the text, e.g., an item ID, before computing the metrics. All of the cached results without a text", nargs='?', const='', metavar='TEXT')
+    fetch_group = parser.add_argument_group(
+        title='options for fetching the external URIs', description='used by the metrics Dereference Possibility, Licensing, Link Security, Freshness of External Sources and Multilingual Sources')
+    fetch_group.add_argument(
+        "--http-connections", help="Maximum number of open HTTP connections of all hosts. The default is 100", type=int, default=100)
+    fetch_group.add_argument(
+        "--http-connections-per-host", help="Maximum number of open HTTP connections of each host. The default is 4", type=int, default=4)
+    fetch_group.add_argument(
+        "--http-connect-timeout", help="Seconds to wait for connecting to a host. The default is 10", type=float, default=10)
+    fetch_group.add_argument(
+        "--http-read-timeout", help="Seconds to wait between two reads of a response. The default is 60", type=float, default=60)
+    fetch_group.add_argument(
+        "--http-cache", help="The SQLite file of a persistent cache of the HTTP responses, shared by the metrics and the later runs. No cache by default", required=False)
+    fetch_group.add_argument(
+        "--http-cache-ttl", help="Days a cached response is used without any request. The default is 30", type=float, default=30)
+    fetch_group.add_argument(
+        "--http-cache-revalidate", help="Request the expired responses of the cache conditionally with their ETag/Last-Modified, so the unchanged pages are not downloaded again", action='store_true')
+    fetch_group.add_argument(
+        "--probe", help="Request each external URI and domain home page once for all of the selected metrics -dp, -sec, -l, -ef and -mfs, before computing them. The responses are kept in probes.db of the --output-dir", action='store_true')
+    fetch_group.add_argument(
+        "--probe-max-body", help="Maximum number of bytes of each probed page kept for the metrics. The default is {0}".format(DEFAULT_MAX_BODY), type=int, default=DEFAULT_MAX_BODY)
     parser.add_argument("-dp", "--dereferencing",
                         help="Compute the metric: Dereference Possibility of the External URIs", action='store_true')
     parser.add_argument("-l", "--licensing",
                         help="Compute the metric: External Sources’ Datasets Licensing", action='store_true')
+    licensing_group = parser.add_argument_group(
+        title='options for computing licensing of external sources')
+    licensing_group.add_argument(
+        "--license-max-body", help="Maximum number of bytes of each domain home page scanned for the licensing keywords. With --probe, the pages are also limited by --probe-max-body. The default is {0}".format(LICENSE_MAX_BODY), type=int, default=LICENSE_MAX_BODY)
     parser.add_argument("-sec", "--security",
                         help="Compute the metric: Link Security of the External URIs", action='store_true')
     parser.add_argument("-i", "--interlinking",
@@ -68,16 +123,28 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
                         help="Compute the metric: Syntactic Validity of Reference Triples", action='store_true')
     parser.add_argument("-rls", "--ref-literal-syntax",
                         help="Compute the metric: Syntactic Validity of Reference Literals", action='store_true')
+    literal_syntax_group = parser.add_argument_group(
+        title='options for computing syntactic validity of reference literals')
+    literal_syntax_group.add_argument(
+        "--literal-syntax-jobs", help="Number of processes matching the literals with the regexes of their properties. The default is the number of CPUs", type=int, default=os.cpu_count())
     parser.add_argument("-rtm", "--ref-triple-semantic",
                         help="Compute the metric: Semantic Validity of Reference Triples", action='store_true')
     parser.add_argument("-rpc", "--ref-property-consistency",
                         help="Compute the metric: Consistency of Reference Properties", action='store_true')
     parser.add_argument("-rc", "--range-consistency",
-                        help="Compute the metric: Range Consistency of Reference Triples", action='store_true')
+                        help="Compute the metric: Range Consistency of Reference Triples. Uses the class_hierarchy.data of the extractor if it exists, otherwise Wikidata is queried for the classes of each value", action='store_true')
     parser.add_argument("-rs", "--ref-sharing",
                         help="Compute the metric: Ratio of Reference Sharing", action='store_true')
     parser.add_argument("-rdns", "--reputation",
                         help="Compute the metric: External Sources’ Domain Reputation", action='store_true')
+    reputation_group = parser.add_argument_group(
+        title='options for computing reputation of external sources')
+    reputation_group.add_argument(
+        "--dnsbl-concurrency", help="Maximum number of concurrent DNSBL queries. The default is {0}".format(DEFAULT_DNSBL_CONCURRENCY), type=int, default=DEFAULT_DNSBL_CONCURRENCY)
+    reputation_group.add_argument(
+        "--dnsbl-cache", help="SQLite file of the cached DNSBL answers, reused by the later runs. The answers are kept for their TTL, and the unlisted domains for --dnsbl-cache-negative-ttl")
+    reputation_group.add_argument(
+        "--dnsbl-cache-negative-ttl", help="Hours an unlisted domain is kept in the DNSBL cache. The default is 24", type=float, default=24)
     parser.add_argument("-mr", "--multiple-ref",
                         help="Compute the metric: Multiple References for Facts", action='store_true')
     parser.add_argument("-ha", "--human-added",
@@ -94,8 +161,12 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
         "--extract-google-cache", help="Set to extract google cache info for freshness of external sources", action='store_true')
     parser.add_argument("-ev", "--ext-uris-volatility",
                         help="Compute the metric: Volatility of External Sources", action='store_true')
+    volatility_group = parser.add_argument_group(
+        title='options for computing volatility of external sources')
+    volatility_group.add_argument(
+        "--sitemap-index", help="SQLite file of the harvested sitemaps of the external sources' domains, reused by the later runs, which download only the sitemaps whose <lastmod> is changed. The default is sitemaps.db in --output-dir")
     parser.add_argument("-et", "--ext-uris-timeliness",
-                        help="Compute the metric: Timeliness of External Sources. The metric will use the results of the metrics Freshness of external sources and Volatility of external sources. Make sure the results of the two metric is in the --output-dir argument", action='store_true')
+                        help="Compute the metric: Timeliness of External Sources. The metric will use the results of the metrics Freshness of external sources and Volatility of external sources. If -ef and -ev are also given, the metric starts after both of them are finished, otherwise make sure the results of the two metric is in the --output-dir argument", action='store_true')
     parser.add_argument("-cpsc", "--class-property-schema-completeness",
                         help="Compute the metric: Schema Completeness of References", action='store_true')
     parser.add_argument("-sbpc", "--schema-based-property-completeness",
@@ -113,7 +184,7 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
     parser.add_argument("-he", "--handy-external-sources",
                         help="Compute the metrics: Handy External Sources", action='store_true')
     parser.add_argument("-bn", "--blank-node",
-                        help="Compute the metrics: Usage of Blank Nodes", action='store_true')
+                        help="Compute the metrics: Usage of Blank Nodes. Uses the blank_nodes.data of the extractor if it exists, otherwise the --endpoint", action='store_true')
     parser.add_argument("-mm", "--multilingual-metadata",
                         help="Compute the metrics: Multilingual Labeling and Multilingual Commenting of Reference Properties", action='store_true')
     parser.add_argument("-mfs", "--multilingual-sources-facts",
@@ -122,22 +193,86 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
 
 
 def write_results_to_CSV(results: List[NamedTuple], output_file: str) -> None:
-    with open(output_file, 'w', newline='') as f:
+    # writing in a temporary file and then renaming it, so the metrics that
+    # read the output file never see a half-written file
+    temp_file = output_file + '.tmp'
+    with open(temp_file, 'w', newline='') as f:
         if isinstance(results, str):
             f.write(results)
-            return
-
-        w = csv.writer(
-            f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        # write header from NamedTuple fields
-        w.writerow([field for field in results[0]._fields])
-        for result in results:
-            row = ['<None>' if result._asdict()[field] == None else result._asdict()[
-                field] for field in result._fields]
-            w.writerow(row)
+        else:
+            w = csv.writer(
+                f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            # write header from NamedTuple fields
+            w.writerow([field for field in results[0]._fields])
+            for result in results:
+                row = ['<None>' if result._asdict()[field] == None else result._asdict()[
+                    field] for field in result._fields]
+                w.writerow(row)
+    os.replace(temp_file, output_file)
     return
 
 
+def get_fetch_options(opts: ArgumentParser) -> FetchOptions:
+    return FetchOptions(opts.http_connections, opts.http_connections_per_host, opts.http_connect_timeout, opts.http_read_timeout,
+                        os.path.abspath(opts.http_cache) if opts.http_cache else None, opts.http_cache_ttl * 24 * 60 * 60, opts.http_cache_revalidate)
+
+
+def get_probe_store(opts: ArgumentParser) -> Optional[ProbeStore]:
+    return ProbeStore(os.path.join(opts.output_dir + os.sep + 'probes.db')) if opts.probe else None
+
+
+def compute_probes(opts: ArgumentParser) -> int:
+    print('Started probing the external URIs')
+    output_file = os.path.join(opts.output_dir + os.sep + 'probes.db')
+
+    # collecting the URLs of the selected metrics
+    print('Reading data ...')
+    probe_requests: Dict[Tuple[str, bool], ProbeRequest] = {}
+    if opts.dereferencing or opts.security or opts.licensing or opts.ext_uris_freshness:
+        input_data_file = os.path.join(
+            opts.data_dir + os.sep + 'external_uris.data')
+        uris = []
+        try:
+            with open(input_data_file, encoding="utf8") as file:
+                for line in file:
+                    uris.append(line.rstrip())
+        except FileNotFoundError:
+            print("Error: Input data file not found. Provide data file with name: {0} in data_dir".format(
+                '"external_uris.data"'))
+            exit(1)
+        uris = list(dict.fromkeys(uris))
+        if opts.dereferencing or opts.ext_uris_freshness:
+            add_probe_requests(probe_requests, uris)
+        if opts.security:
+            add_probe_requests(probe_requests, get_https_uris(uris))
+        if opts.licensing:
+            add_probe_requests(probe_requests, get_domain_roots(
+                uris), verify_ssl=False, read_body=True)
+    if opts.multilingual_sources_facts:
+        input_data_file = os.path.join(
+            opts.data_dir + os.sep + 'statement_source.data')
+        try:
+            with open(input_data_file, encoding="utf8") as file:
+                add_probe_requests(probe_requests, [row[1] for row in csv.reader(
+                    file) if not row[1].startswith('Q')], read_body=True)
+        except FileNotFoundError:
+            print("Error: Input data file not found. Provide data file with name: {0} in data_dir".format(
+                '"statement_source.data"'))
+            exit(1)
+
+    print('Probing {0} URLs ...'.format(len(probe_requests)))
+    start_time = datetime.datetime.now()
+    store = ProbeStore(output_file, new=True)
+    probe_uris(probe_requests, store, get_fetch_options(opts), opts.probe_max_body)
+    store.close()
+    end_time = datetime.datetime.now()
+
+    print('The probed URLs have been written in the file: {0}'.format(output_file))
+    print('DONE. Probing the external URIs, Duration: {0}'.format(
+        end_time - start_time))
+    return 0
+
+
 def compute_dereferencing(opts: ArgumentParser) -> int:
     print('Started computing Metric: Dereference Possibility of the External URIs')
     input_data_file = os.path.join(
@@ -162,7 +297,7 @@ def compute_dereferencing(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    deref_checker = DerefrenceExplorer(uris)
+    deref_checker = DerefrenceExplorer(uris, get_fetch_options(opts), get_probe_store(opts))
     results = deref_checker.check_dereferencies()
     end_time = datetime.datetime.now()
 
@@ -200,7 +335,7 @@ def compute_licensing(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    lic_checker = LicenseChecker(uris)
+    lic_checker = LicenseChecker(uris, get_fetch_options(opts), get_probe_store(opts), opts.license_max_body)
     results = lic_checker.check_license_existance()
     end_time = datetime.datetime.now()
 
@@ -238,7 +373,7 @@ def compute_security(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    sec_checker = TLSChecker(uris)
+    sec_checker = TLSChecker(uris, get_fetch_options(opts), get_probe_store(opts))
     results = sec_checker.check_support_tls()
     end_time = datetime.datetime.now()
 
@@ -359,7 +494,8 @@ def compute_ref_literal_syntax(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    lit_checker = WikibaseRefLiteralSyntaxChecker(prop_values)
+    lit_checker = WikibaseRefLiteralSyntaxChecker(
+        prop_values, jobs=opts.literal_syntax_jobs)
     results = lit_checker.check_literals_regex()
     end_time = datetime.datetime.now()
 
@@ -384,19 +520,6 @@ def compute_ref_triple_semantic(opts: ArgumentParser) -> int:
     output_file = os.path.join(
         opts.output_dir + os.sep + 'semantic_validity.csv')
 
-    # reading the fact/reference triples
-    print('Reading data ...')
-    fact_refs = []
-    try:
-        with open(input_data_file, encoding="utf8") as file:
-            reader = csv.reader(file)
-            for row in reader:
-                fact_refs.append(FactReference(row[0], row[1], row[2], row[3]))
-    except FileNotFoundError:
-        print("Error: Input data file not found. Provide data file with name: {0} in data_dir".format(
-            '"fact_ref_triples.data"'))
-        exit(1)
-
     # reading the gold standard set
     print('Reading gold standard set ...')
     gs_fact_refs = []
@@ -411,11 +534,22 @@ def compute_ref_triple_semantic(opts: ArgumentParser) -> int:
             '"semantic_validity_gs.data"'))
         exit(1)
 
+    # the fact/reference triples are read while they are checked
+    if not os.path.isfile(input_data_file):
+        print("Error: Input data file not found. Provide data file with name: {0} in data_dir".format(
+            '"fact_ref_triples.data"'))
+        exit(1)
+
+    def read_fact_refs() -> Iterator[FactReference]:
+        with open(input_data_file, encoding="utf8") as file:
+            for row in csv.reader(file):
+                yield FactReference(row[0], row[1], row[2], row[3])
+
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
     results = RefTripleSemanticChecker(
-        gs_fact_refs, fact_refs).check_semantic_to_gold_standard()
+        gs_fact_refs, read_fact_refs()).check_semantic_to_gold_standard()
     end_time = datetime.datetime.now()
 
     # saving the results for presentation layer
@@ -492,10 +626,20 @@ def compute_range_consistency(opts: ArgumentParser) -> int:
             '"ref_properties_object_value.data"'))
         exit(1)
 
+    # the classes of the values in the class hierarchy of the extractor (-ch), or in Wikidata
+    class_hierarchy = None
+    class_hierarchy_file = os.path.join(
+        opts.data_dir + os.sep + 'class_hierarchy.data')
+    if os.path.isfile(class_hierarchy_file):
+        print('Reading class hierarchy ...')
+        class_hierarchy = ClassHierarchyIndex.from_file(class_hierarchy_file, set().union(
+            *prop_values.values()))
+
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    range_checker = TriplesRangeConsistencyChecker(prop_values)
+    range_checker = TriplesRangeConsistencyChecker(
+        prop_values, class_hierarchy=class_hierarchy)
     results = range_checker.check_all_value_ranges()
     end_time = datetime.datetime.now()
 
@@ -574,7 +718,8 @@ def compute_dnsbl_reputation(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    dnsbl_checker = DNSBLBlacklistedChecker(uris)
+    dnsbl_checker = DNSBLBlacklistedChecker(uris, opts.dnsbl_concurrency, os.path.abspath(
+        opts.dnsbl_cache) if opts.dnsbl_cache else None, opts.dnsbl_cache_negative_ttl * 60 * 60)
     results = dnsbl_checker.check_domain_blacklisted()
     end_time = datetime.datetime.now()
 
@@ -704,7 +849,8 @@ def compute_verifiable_type_of_sources(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    type_checker = TypeOfSourcesChecker(distinct_sources, known_datasets)
+    type_checker = TypeOfSourcesChecker(
+        distinct_sources, known_datasets, opts.sparql_result_format)
     results = type_checker.check_type_of_sources_wikidata()
     end_time = datetime.datetime.now()
 
@@ -789,7 +935,7 @@ def compute_external_uris_freshness(opts: ArgumentParser) -> int:
     print('Running metric ...')
     start_time = datetime.datetime.now()
     freshness_checker = ExternalURIsFreshnessChecker(
-        uris, extract_google_cache=opts.extract_google_cache)
+        uris, extract_google_cache=opts.extract_google_cache, fetch_options=get_fetch_options(opts), probes=get_probe_store(opts))
     results = freshness_checker.check_external_uris_freshness()
     end_time = datetime.datetime.now()
 
@@ -829,7 +975,10 @@ def compute_external_uris_volatility(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    volatility_checker = ExternalURIsVolatilityChecker(uris)
+    sitemap_index = os.path.abspath(opts.sitemap_index) if opts.sitemap_index else os.path.join(
+        opts.output_dir + os.sep + 'sitemaps.db')
+    volatility_checker = ExternalURIsVolatilityChecker(
+        uris, get_fetch_options(opts), sitemap_index)
     results = volatility_checker.check_external_uris_volatility()
     end_time = datetime.datetime.now()
 
@@ -1336,7 +1485,8 @@ def compute_handy_external_sources(opts: ArgumentParser) -> int:
     # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
-    handy_checker = HandyExternalSourcesChecker(srcs)
+    handy_checker = HandyExternalSourcesChecker(
+        srcs, opts.sparql_result_format)
     results = handy_checker.check_handy_external_sources_wikidata()
     end_time = datetime.datetime.now()
 
@@ -1357,15 +1507,21 @@ def compute_blank_node_usage(opts: ArgumentParser) -> int:
     output_file = os.path.join(
         opts.output_dir + os.sep + 'blank_node_result.csv')
 
-    # running the framework metric function
-    if not opts.endpoint:
-        print('ERROR: Usage of Blank Nodes needs endpoint. Specify an SPARQL endpoint with --endpoint arg.')
+    # the numbers of the extractor (-bn), or the numbers of the endpoint
+    input_data_file = os.path.join(opts.data_dir + os.sep + 'blank_nodes.data')
+    if not os.path.isfile(input_data_file) and not opts.endpoint:
+        print('ERROR: Usage of Blank Nodes needs endpoint or blank_nodes.data. Specify an SPARQL endpoint with --endpoint arg.')
         return -1
+
+    # running the framework metric function
     print('Running metric ...')
     start_time = datetime.datetime.now()
     bn_checker = None
     bn_checker = BlankNodeChecker(opts.endpoint)
-    results = bn_checker.check_blank_nodes_over_endpoint()
+    if os.path.isfile(input_data_file):
+        results = bn_checker.check_blank_nodes_from_file(input_data_file)
+    else:
+        results = bn_checker.check_blank_nodes_over_endpoint()
     end_time = datetime.datetime.now()
 
     # saving the results for presentation layer
@@ -1448,7 +1604,7 @@ def compute_multilingual_sources_facts(opts: ArgumentParser) -> int:
     print('Running metric ...')
     start_time = datetime.datetime.now()
     fact_source_ml_checker = MultilingualFactsAndSourcesChecker(
-        statements_ref_vals)
+        statements_ref_vals, opts.sparql_result_format, get_fetch_options(opts), get_probe_store(opts))
     source_dist, facts_dist = fact_source_ml_checker.check_fact_sources_multilingualism()
     end_time = datetime.datetime.now()
 
@@ -1466,6 +1622,71 @@ def compute_multilingual_sources_facts(opts: ArgumentParser) -> int:
     return 0
 
 
+def run_metric(compute: Callable[[ArgumentParser], int], opts: ArgumentParser, limiter: RateLimiter) -> int:
+    """
+    compute the metric with a SPARQL client of the options, sharing the
+    rate and concurrency limits of the other metrics, and print the numbers of its queries
+    """
+    cache = QueryCache(opts.sparql_cache, opts.sparql_cache_ttl *
+                       24 * 60 * 60) if opts.sparql_cache else None
+    set_client(SPARQLClient(opts.wikidata_endpoint, opts.sparql_retries,
+               limiter=limiter, cache=cache, concurrency=opts.sparql_concurrency))
+    try:
+        return compute(opts)
+    finally:
+        if get_client().queries > 0 or (cache is not None and cache.hits > 0):
+            print(get_client())
+            if cache is not None:
+                print(cache)
+        get_client().close()
+
+
+class Metric(NamedTuple):
+    option: str
+    compute: Callable[[ArgumentParser], int]
+    inputs: Tuple[str, ...] = ()    # files of the --output-dir the metric reads
+    outputs: Tuple[str, ...] = ()   # files of the --output-dir the metric writes
+
+
+# the option of each metric, the function that computes it and its files.
+# A metric starts after the metrics that write its inputs are finished
+METRICS = [
+    Metric('dereferencing', compute_dereferencing, outputs=('dereferencing.csv', 'dereferencing_ratio.csv')),
+    Metric('licensing', compute_licensing, outputs=('licensing.csv', 'licensing_ratio.csv')),
+    Metric('security', compute_security, outputs=('security.csv', 'security_ratio.csv')),
+    Metric('interlinking', compute_interlinking, outputs=('interlinking.csv', 'interlinking_ratio.csv')),
+    Metric('ref_triple_syntax', compute_ref_triple_syntax, outputs=('ref_triple_syntax_result.csv',)),
+    Metric('ref_literal_syntax', compute_ref_literal_syntax, outputs=('ref_literal_syntax.csv', 'ref_literal_syntax_ratio.csv')),
+    Metric('ref_triple_semantic', compute_ref_triple_semantic, outputs=('semantic_validity.csv',)),
+    Metric('ref_property_consistency', compute_ref_properties_consistency, outputs=('ref_properties_consistency.csv', 'ref_properties_consistency_ratio.csv')),
+    Metric('range_consistency', compute_range_consistency, outputs=('range_consistency.csv', 'range_consistency_ratio.csv')),
+    Metric('ref_sharing', compute_ref_sharing_ratio, outputs=('ref_sharing.csv', 'ref_sharing_ratio.csv')),
+    Metric('reputation', compute_dnsbl_reputation, outputs=('dnsbl_reputation.csv', 'dnsbl_reputation_ratio.csv')),
+    Metric('multiple_ref', compute_multiple_referenced, outputs=('multiple_refs.csv', 'multiple_refs_ratio.csv')),
+    Metric('human_added', compute_human_added_references_per_item, outputs=('human_added.csv', 'human_added_ratio.csv')),
+    Metric('type_of_sources', compute_verifiable_type_of_sources, outputs=('type_of_sources.csv', 'type_of_sources_ratio.csv')),
+    Metric('ref_freshness', compute_referenced_facts_reference_freshness_per_item, outputs=('fact_freshness.csv', 'fact_freshness_ratio.csv')),
+    Metric('ext_uris_freshness', compute_external_uris_freshness, outputs=('external_uris_freshness.csv', 'external_uris_freshness_ratio.csv')),
+    Metric('ext_uris_volatility', compute_external_uris_volatility, outputs=('external_uris_volatility.csv', 'external_uris_volatility_ratio.csv')),
+    Metric('ext_uris_timeliness', compute_external_uris_timeliness, inputs=('external_uris_freshness.csv', 'external_uris_volatility.csv'), outputs=('external_uris_timeliness.csv', 'external_uris_timeliness_ratio.csv')),
+    Metric('class_property_schema_completeness', compute_class_property_schema_completeness, outputs=('class_property_schema_completeness.csv', 'class_property_schema_completeness_ratio.csv')),
+    Metric('schema_based_property_completeness', compute_schema_based_property_completeness, outputs=('schema_based_property_completeness.csv', 'schema_based_property_completeness_ratio.csv')),
+    Metric('property_completeness', compute_property_completeness, outputs=('property_completeness.csv', 'property_completeness_ratio.csv')),
+    Metric('amount_of_data', compute_amount_of_data, outputs=('amount_of_data_ratios.csv',)),
+    Metric('ext_uri_length', compute_external_uris_length, outputs=('url_length.csv', 'url_length_ratio.csv')),
+    Metric('ref_property_diversity', compute_ref_property_diversity, outputs=('ref_properties_diversity_ratios.csv',)),
+    Metric('human_readable_metadata', compute_human_readable_metadata, outputs=('human_readable_metadata.csv', 'human_readable_metadata_ratio.csv')),
+    Metric('handy_external_sources', compute_handy_external_sources, outputs=('handy_external_sources.csv', 'handy_external_sources_ratio.csv')),
+    Metric('blank_node', compute_blank_node_usage, outputs=('blank_node_result.csv',)),
+    Metric('multilingual_metadata', compute_multilingual_metadata, outputs=('multilingual_metadata.csv', 'multilingual_metadata_ratio.csv')),
+    Metric('multilingual_sources_facts', compute_multilingual_sources_facts, outputs=('sources_multilingualism.csv', 'facts_multilingualism.csv', 'sources_facts_multilingualism_ratio.csv')),
+]
+
+# the metrics that use the probed URIs of the --probe option
+PROBED_METRICS = ('dereferencing', 'security', 'licensing',
+                  'ext_uris_freshness', 'multilingual_sources_facts')
+
+
 def RQSS_Framework_Runner(argv: Optional[Union[str, List[str]]] = None, prog: Optional[str] = None) -> int:
     if isinstance(argv, str):
         argv = argv.split()
@@ -1482,103 +1703,31 @@ def RQSS_Framework_Runner(argv: Optional[Union[str, List[str]]] = None, prog: Op
     print('Creating output directory: {0}'.format(opts.output_dir))
     Path(opts.output_dir).mkdir(parents=True, exist_ok=True)
 
-    # list of parallel processes
-    framework_procs = []
-
-    if opts.dereferencing:
-        p = Process(target=compute_dereferencing(opts))
-        framework_procs.append(p)
-    if opts.licensing:
-        p = Process(target=compute_licensing(opts))
-        framework_procs.append(p)
-    if opts.security:
-        p = Process(target=compute_security(opts))
-        framework_procs.append(p)
-    if opts.interlinking:
-        p = Process(target=compute_interlinking(opts))
-        framework_procs.append(p)
-    if opts.ref_triple_syntax:
-        p = Process(target=compute_ref_triple_syntax(opts))
-        framework_procs.append(p)
-    if opts.ref_literal_syntax:
-        p = Process(target=compute_ref_literal_syntax(opts))
-        framework_procs.append(p)
-    if opts.ref_triple_semantic:
-        p = Process(target=compute_ref_triple_semantic(opts))
-        framework_procs.append(p)
-    if opts.ref_property_consistency:
-        p = Process(target=compute_ref_properties_consistency(opts))
-        framework_procs.append(p)
-    if opts.range_consistency:
-        p = Process(target=compute_range_consistency(opts))
-        framework_procs.append(p)
-    if opts.ref_sharing:
-        p = Process(target=compute_ref_sharing_ratio(opts))
-        framework_procs.append(p)
-    if opts.reputation:
-        p = Process(target=compute_dnsbl_reputation(opts))
-        framework_procs.append(p)
-    if opts.multiple_ref:
-        p = Process(target=compute_multiple_referenced(opts))
-        framework_procs.append(p)
-    if opts.human_added:
-        p = Process(target=compute_human_added_references_per_item(opts))
-        framework_procs.append(p)
-    if opts.type_of_sources:
-        p = Process(target=compute_verifiable_type_of_sources(opts))
-        framework_procs.append(p)
-    if opts.ref_freshness:
-        p = Process(
-            target=compute_referenced_facts_reference_freshness_per_item(opts))
-        framework_procs.append(p)
-    if opts.ext_uris_freshness:
-        p = Process(target=compute_external_uris_freshness(opts))
-        framework_procs.append(p)
-    if opts.ext_uris_volatility:
-        p = Process(target=compute_external_uris_volatility(opts))
-        framework_procs.append(p)
-    if opts.ext_uris_timeliness:
-        p = Process(target=compute_external_uris_timeliness(opts))
-        framework_procs.append(p)
-    if opts.class_property_schema_completeness:
-        p = Process(target=compute_class_property_schema_completeness(opts))
-        framework_procs.append(p)
-    if opts.schema_based_property_completeness:
-        p = Process(target=compute_schema_based_property_completeness(opts))
-        framework_procs.append(p)
-    if opts.property_completeness:
-        p = Process(target=compute_property_completeness(opts))
-        framework_procs.append(p)
-    if opts.amount_of_data:
-        p = Process(target=compute_amount_of_data(opts))
-        framework_procs.append(p)
-    if opts.ext_uri_length:
-        p = Process(target=compute_external_uris_length(opts))
-        framework_procs.append(p)
-    if opts.ref_property_diversity:
-        p = Process(target=compute_ref_property_diversity(opts))
-        framework_procs.append(p)
-    if opts.human_readable_metadata:
-        p = Process(target=compute_human_readable_metadata(opts))
-        framework_procs.append(p)
-    if opts.handy_external_sources:
-        p = Process(target=compute_handy_external_sources(opts))
-        framework_procs.append(p)
-    if opts.blank_node:
-        p = Process(target=compute_blank_node_usage(opts))
-        framework_procs.append(p)
-    if opts.multilingual_metadata:
-        p = Process(target=compute_multilingual_metadata(opts))
-        framework_procs.append(p)
-    if opts.multilingual_sources_facts:
-        p = Process(target=compute_multilingual_sources_facts(opts))
-        framework_procs.append(p)
-
-    for proc in framework_procs:
-        proc.start()
-
-    for proc in framework_procs:
-        proc.join()
+    if opts.sparql_cache and opts.sparql_cache_invalidate is not None:
+        cache = QueryCache(opts.sparql_cache)
+        print('Removed {0} cached query results'.format(
+            cache.invalidate(opts.sparql_cache_invalidate)))
+        cache.close()
+
+    # running the selected metrics in parallel processes, in the order of their inputs
+    scheduler = JobScheduler(opts.jobs)
+    limiter = RateLimiter(opts.sparql_rate, opts.sparql_concurrency or get_default_concurrency(opts.wikidata_endpoint))
+    probes_file = os.path.join(opts.output_dir, 'probes.db')
+    opts.probe = opts.probe and any(getattr(opts, i) for i in PROBED_METRICS)
+    if opts.probe:
+        scheduler.add_job('probe', compute_probes, opts, outputs=[probes_file])
+    for metric in METRICS:
+        if getattr(opts, metric.option):
+            inputs = [os.path.join(opts.output_dir, i) for i in metric.inputs]
+            if opts.probe and metric.option in PROBED_METRICS:
+                inputs.append(probes_file)
+            scheduler.add_job(metric.option, run_metric, metric.compute, opts, limiter, inputs=inputs,
+                              outputs=[os.path.join(opts.output_dir, i) for i in metric.outputs])
+
+    scheduler.run()
+    print('Summary of the computed metrics:')
+    scheduler.print_results()
+    return 0 if len(scheduler.failed) == 0 else 1
 
 
 if __name__ == '__main__':
@@ -1,8 +1,16 @@
-from typing import Iterator, List, NamedTuple
+import asyncio
+import sqlite3
+from typing import Iterator, List, NamedTuple, Optional
 from urllib.parse import urlparse
 
+import aiodns
 import pydnsbl
+from pydnsbl.checker import DNSBLResponse
 from rdflib import URIRef
+from utils.dnsbl_cache import DEFAULT_NEGATIVE_TTL, DNSBLCache
+
+# the DNS queries in flight, over all domains and DNSBL providers
+DEFAULT_DNSBL_CONCURRENCY = 200
 
 
 class BlacklistedOfDom(NamedTuple):
@@ -13,11 +21,64 @@ class BlacklistedOfDom(NamedTuple):
         return "Domain:{0:40}, is in blacklist:{1}".format(self.domain, self.blacklisted)
 
 
+class CachedDNSBLDomainChecker(pydnsbl.DNSBLDomainChecker):
+    """
+    the DNSBL domain checker of pydnsbl, whose answers are looked up in the
+    cache before querying the DNSBL providers
+    """
+    _cache: Optional[DNSBLCache] = None
+
+    def __init__(self, cache: Optional[DNSBLCache] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._cache = cache
+
+    def _get_cached(self, dnsbl_query: str) -> Optional[List]:
+        # a cache error is a miss, not a failed query
+        try:
+            return self._cache.get(dnsbl_query)
+        except sqlite3.Error as e:
+            print('\t\t ERROR in reading the DNSBL cache: ', e)
+            return None
+
+    def _put_cached(self, dnsbl_query: str, answer: Optional[List]) -> None:
+        try:
+            self._cache.put(dnsbl_query, answer)
+        except sqlite3.Error as e:
+            print('\t\t ERROR in writing the DNSBL cache: ', e)
+
+    async def dnsbl_request(self, request, provider):
+        if self._cache is None:
+            return await super().dnsbl_request(request, provider)
+        dnsbl_query = "%s.%s" % (self.prepare_query(request), provider.host)
+        answer = self._get_cached(dnsbl_query)
+        if answer is not None:
+            self._cache.hits += 1
+            return DNSBLResponse(addr=request, provider=provider, response=answer or None)
+        try:
+            async with self._semaphore:
+                answer = await self._resolver.query(dnsbl_query, 'A')
+        except aiodns.error.DNSError as exc:
+            if exc.args[0] != aiodns.error.ARES_ENOTFOUND:
+                # the failed queries are not cached
+                return DNSBLResponse(addr=request, provider=provider, error=exc)
+            answer = None
+        self._cache.misses += 1
+        self._put_cached(dnsbl_query, answer)
+        return DNSBLResponse(addr=request, provider=provider, response=answer)
+
+
 class DNSBLBlacklistedChecker:
     _domains = []
+    _concurrency: int = DEFAULT_DNSBL_CONCURRENCY
+    _cache_file: Optional[str] = None
+    _cache_negative_ttl: float = DEFAULT_NEGATIVE_TTL
     results: List[BlacklistedOfDom] = None
 
-    def __init__(self, uris: Iterator[URIRef]):
+    def __init__(self, uris: Iterator[URIRef], concurrency: int = DEFAULT_DNSBL_CONCURRENCY,
+                 cache_file: Optional[str] = None, cache_negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self._concurrency = concurrency # the DNS queries in flight
+        self._cache_file = cache_file # the SQLite file of the DNSBL answers, no cache if None
+        self._cache_negative_ttl = cache_negative_ttl
         _uris = list(dict.fromkeys(uris))  # remove duplicated URIs
         # compute and remove duplicated domains
         self._domains = dict.fromkeys(self.domain_extractor(_uris))
@@ -29,16 +90,39 @@ class DNSBLBlacklistedChecker:
         return ret_list
 
     def check_domain_blacklisted(self) -> List[BlacklistedOfDom]:
-        self.results = []
-        domain_checker = pydnsbl.DNSBLDomainChecker()
-        for u in self._domains:
+        """
+        check the domains concurrently against the DNSBL providers
+        """
+        cache = DNSBLCache(self._cache_file, self._cache_negative_ttl) if self._cache_file is not None else None
+        try:
+            self.results = asyncio.run(self._check_all(cache))
+        finally:
+            if cache is not None:
+                cache.close()
+                print(cache)
+        return self.results
+
+    async def _check_all(self, cache: Optional[DNSBLCache]) -> List[BlacklistedOfDom]:
+        domain_checker = CachedDNSBLDomainChecker(
+            cache, concurrency=self._concurrency, loop=asyncio.get_running_loop())
+        # a bounded window of domains, so the domains are not all scheduled at once
+        window = asyncio.Semaphore(self._concurrency)
+
+        async def check_in_window(domain: str) -> BlacklistedOfDom:
             try:
-                r = domain_checker.check(u)
-                self.results.append(BlacklistedOfDom(u, r.blacklisted))
+                r = await domain_checker.check_async(domain)
+                return BlacklistedOfDom(domain, r.blacklisted)
             except Exception as e:
-                self.results.append(BlacklistedOfDom(u, False))
                 print(e)
-        return self.results
+                return BlacklistedOfDom(domain, False)
+            finally:
+                window.release()
+
+        tasks = []
+        for domain in self._domains:
+            await window.acquire()
+            tasks.append(asyncio.ensure_future(check_in_window(domain)))
+        return list(await asyncio.gather(*tasks))
 
     @property
     def score(self):
@@ -1,7 +1,8 @@
-from typing import Iterator, List, NamedTuple
+from typing import Iterator, List, NamedTuple, Optional
 
-import requests
 from rdflib import URIRef
+from utils.fetch import FetchEngine, FetchOptions, FetchResult
+from utils.probes import ProbeStore, get_https_uris
 
 
 class TLSExist(NamedTuple):
@@ -14,31 +15,32 @@ class TLSExist(NamedTuple):
 
 class TLSChecker:
     _uris = []
+    _fetch_options: FetchOptions = None
+    _probes: ProbeStore = None
     results: List[TLSExist] = None
 
-    def __init__(self, uris: Iterator[URIRef]):
+    def __init__(self, uris: Iterator[URIRef], fetch_options: Optional[FetchOptions] = None, probes: Optional[ProbeStore] = None):
+        self._fetch_options = fetch_options
+        self._probes = probes  # if given, the results are derived from the probed URIs
         _tmp_uri = list(dict.fromkeys(uris))  # remove duplicated URIs
-        for u in _tmp_uri:
-            # deliberately change all URIs to HTTPS to check support for TLS.
-            self._uris.append(u.replace('http://', 'https://'))
+        # deliberately change all URIs to HTTPS to check support for TLS.
+        self._uris = get_https_uris(_tmp_uri)
 
     def check_support_tls(self) -> List[TLSExist]:
         """
         check the accssessibility of https:// for each URI in the class
         """
-        self.results = []
-        for u in self._uris:
-            try:
-                r = requests.get(u, verify=True, timeout=(10, 60))
-                if (r.status_code == 200):
-                    self.results.append(TLSExist(u, True))
-                else:
-                    self.results.append(TLSExist(u, False))
-            except Exception as e:
-                self.results.append(TLSExist(u, False))
-                print(e)
+        fetcher = self._probes if self._probes is not None else FetchEngine(
+            self._fetch_options)
+        self.results = fetcher.fetch_all(
+            self._uris, verify_ssl=True, process=self._get_tls_support)
         return self.results
 
+    def _get_tls_support(self, response: FetchResult) -> TLSExist:
+        if response.error is not None:
+            print(response.error)
+        return TLSExist(response.url, response.ok)
+
     @property
     def score(self):
         if self.results is not None:
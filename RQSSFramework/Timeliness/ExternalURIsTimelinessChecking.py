@@ -1,4 +1,4 @@
-from typing import Iterator, List, NamedTuple
+from typing import Dict, Iterator, List, NamedTuple, Optional
 
 from Currency.ExternalURIsFreshnessChecking import FreshnessOfURI
 from rdflib import URIRef
@@ -25,18 +25,20 @@ class ExternalURIsTimelinessChecker:
 
     def check_external_uris_timeliness(self) -> List[TimelinessOfURI]:
         self.results = []
+        # the volatilities of each URI, in their order
+        volatilities_of_uri: Dict[URIRef, List[Optional[float]]] = {}
+        for uv in self._volatilities:
+            volatilities_of_uri.setdefault(uv.uri, []).append(uv.volatility)
         for uf in self._freshnesses:
-            #not_found = True
             if uf.freshness_last_modif == None:
                 self.results.append(TimelinessOfURI(uf.uri, None))
                 continue
-            for uv in self._volatilities:
-                if uf.uri == uv.uri:
-                    if uv.volatility == None:
-                        self.results.append(TimelinessOfURI(uf.uri, None))
-                        break
-                    self.results.append(TimelinessOfURI(
-                        uf.uri, uf.freshness_last_modif/uv.volatility if uv.volatility > 0 and uv.volatility > uf.freshness_last_modif else 1.0))
+            for volatility in volatilities_of_uri.get(uf.uri, []):
+                if volatility == None:
+                    self.results.append(TimelinessOfURI(uf.uri, None))
+                    break
+                self.results.append(TimelinessOfURI(
+                    uf.uri, uf.freshness_last_modif/volatility if volatility > 0 and volatility > uf.freshness_last_modif else 1.0))
         return self.results
 
     def get_volatility_from_change_freq(self, change_freq: SitemapPageChangeFrequency) -> float:
@@ -1,9 +1,8 @@
 import re
-import sys
-from typing import Iterator, List, NamedTuple
+from typing import Iterator, List, NamedTuple, Optional
 
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.sparql import WIKIDATA_ENDPOINT, get_query_values, map_queries
 
 
 class ExternalSourceHandyScore(NamedTuple):
@@ -16,43 +15,45 @@ class ExternalSourceHandyScore(NamedTuple):
 
 class HandyExternalSourcesChecker:
     _sources = []
+    _result_format: str
     results: List[ExternalSourceHandyScore] = None
 
-    def __init__(self, sources: Iterator[str]):
+    def __init__(self, sources: Iterator[str], result_format: str = 'json'):
         self._sources = list(sources)
+        self._result_format = result_format
 
     def check_handy_external_sources_wikidata(self) -> List[ExternalSourceHandyScore]:
-        self.results = []
-        for src in self._sources:
-            score = 0
-            if re.match(r"http(.*)#(.+)", src):
-                score = 1
-            elif re.match(r"http(.*)", src):
-                score = 0.75
-            elif src.startswith('Q'):
-                print('\tGetting metadata of item: ', src)
-                if self._ask_wikidata(RQSS_QUERIES['is_item_internal_source_wikidata'].format(src)) == 'true':
-                    continue
-                elif self._ask_wikidata(RQSS_QUERIES['is_item_online_available_dataset_wikidata'].format(src)) == 'true':
-                    score = 0.5
-                else:
-                    score = 0.25
-            self.results.append(ExternalSourceHandyScore(src, score))
-
+        # the items are queried concurrently, and their results are in the order of the sources
+        self.results = [i for i in map_queries(
+            self._get_score, self._sources) if i is not None]
         return self.results
 
+    def _get_score(self, src: str) -> Optional[ExternalSourceHandyScore]:
+        """
+        the score of the source, None for the internal sources of Wikidata
+        """
+        score = 0
+        if re.match(r"http(.*)#(.+)", src):
+            score = 1
+        elif re.match(r"http(.*)", src):
+            score = 0.75
+        elif src.startswith('Q'):
+            print('\tGetting metadata of item: ', src)
+            if self._ask_wikidata(RQSS_QUERIES['is_item_internal_source_wikidata'].format(src)) == 'true':
+                return None
+            elif self._ask_wikidata(RQSS_QUERIES['is_item_online_available_dataset_wikidata'].format(src)) == 'true':
+                score = 0.5
+            else:
+                score = 0.25
+        return ExternalSourceHandyScore(src, score)
+
     def _ask_wikidata(self, query: str):
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
         value = None
         try:
-            results = sparql.query().convert()
-            for result in results["results"]["bindings"]:
-                value = result["to_ret"]["value"]
+            values = get_query_values(
+                WIKIDATA_ENDPOINT, query, 'to_ret', self._result_format)
+            if len(values) > 0:
+                value = values[-1]
         except Exception as e:
             print('\t\t ERROR: ', e)
         finally:
@@ -1,8 +1,7 @@
-import sys
 from typing import Iterator, List, NamedTuple
 
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.sparql import WIKIDATA_ENDPOINT, get_query_values, map_queries
 
 
 class SourceVerifiabilityScore(NamedTuple):
@@ -16,50 +15,45 @@ class SourceVerifiabilityScore(NamedTuple):
 class TypeOfSourcesChecker:
     _sources = List[str]
     _known_datasets_keywords = List[str]
+    _result_format: str
     results: List[SourceVerifiabilityScore] = None
 
-    def __init__(self, sources: Iterator[str], known_datasets_keywords: List[str] = []):
+    def __init__(self, sources: Iterator[str], known_datasets_keywords: List[str] = [], result_format: str = 'json'):
         self._sources = list(sources)
         self._known_datasets_keywords = known_datasets_keywords
+        self._result_format = result_format
 
     def check_type_of_sources_wikidata(self) -> List[SourceVerifiabilityScore]:
-        self.results = []
-        for src in self._sources:
-            score = 0
-            if src.startswith('http'):
-                for key in self._known_datasets_keywords:
-                    if key in src:
-                        score = 0.75
-                        break
-            elif src.startswith('Q'):
-                print('\tGetting type of item: ', src)
-                instances = self._ask_wikidata(
-                    RQSS_QUERIES['get_instances_wikidata'].format(src))
-                if 'Q13442814' in instances:
-                    score = 1
-                elif 'Q8513' in instances:
-                    score = 0.75
-                elif any(i in ['Q571', 'Q5292', 'Q13433827'] for i in instances):
-                    score = 0.5
-                elif any(i in ['Q41298', 'Q30849', 'Q17928402'] for i in instances):
-                    score = 0.25
-            self.results.append(SourceVerifiabilityScore(src, score))
-
+        # the items are queried concurrently, and their results are in the order of the sources
+        self.results = map_queries(self._get_score, self._sources)
         return self.results
 
+    def _get_score(self, src: str) -> SourceVerifiabilityScore:
+        score = 0
+        if src.startswith('http'):
+            for key in self._known_datasets_keywords:
+                if key in src:
+                    score = 0.75
+                    break
+        elif src.startswith('Q'):
+            print('\tGetting type of item: ', src)
+            instances = self._ask_wikidata(
+                RQSS_QUERIES['get_instances_wikidata'].format(src))
+            if 'Q13442814' in instances:
+                score = 1
+            elif 'Q8513' in instances:
+                score = 0.75
+            elif any(i in ['Q571', 'Q5292', 'Q13433827'] for i in instances):
+                score = 0.5
+            elif any(i in ['Q41298', 'Q30849', 'Q17928402'] for i in instances):
+                score = 0.25
+        return SourceVerifiabilityScore(src, score)
+
     def _ask_wikidata(self, query: str):
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
         values = []
         try:
-            results = sparql.query().convert()
-            for result in results["results"]["bindings"]:
-                value = result["to_ret"]["value"]
-                values.append(value)
+            values = get_query_values(
+                WIKIDATA_ENDPOINT, query, 'to_ret', self._result_format)
         except Exception as e:
             print('\t\t ERROR: ', e)
         finally:
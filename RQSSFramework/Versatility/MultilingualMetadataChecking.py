@@ -1,8 +1,8 @@
-import sys
 from typing import List, NamedTuple
 
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.sparql import (WIKIDATA_ENDPOINT, get_batched_query_values,
+                          get_count_value)
 
 
 class MultilingualMetadataResult(NamedTuple):
@@ -20,49 +20,26 @@ class MultilingualMetadataResult(NamedTuple):
 class MultilingualMetadataChecker:
     results: List[MultilingualMetadataResult] = None
     _ref_properties: List[str]
+    _endpoint: str = WIKIDATA_ENDPOINT
 
-    def __init__(self, ref_properties: List[str]):
+    def __init__(self, ref_properties: List[str], endpoint: str = WIKIDATA_ENDPOINT):
         self._ref_properties = ref_properties
+        self._endpoint = endpoint
 
     def check_multilingual_existance_from_Wikdiata(self) -> List[MultilingualMetadataResult]:
         self.results = []
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
+        print('\t Getting number of non-English labels of {0} reference properties'.format(len(self._ref_properties)))
+        prop_labels = get_batched_query_values(RQSS_QUERIES['get_property_non_en_labels_batch_wikidata'],
+                                               RQSS_QUERIES['get_property_non_en_labels_wikidata'], self._ref_properties, self._endpoint)
+        print('\t Getting number of non-English comments of {0} reference properties'.format(len(self._ref_properties)))
+        prop_comments = get_batched_query_values(RQSS_QUERIES['get_property_non_en_comments_batch_wikidata'],
+                                                 RQSS_QUERIES['get_property_non_en_comments_wikidata'], self._ref_properties, self._endpoint)
         for prop in self._ref_properties:
-            print('\t Getting number of non-English labels of reference property: ', prop)
-            sparql.setQuery(
-                RQSS_QUERIES['get_property_non_en_labels_wikidata'].format(prop))
-            sparql.setReturnFormat(JSON)
-            try:
-                results = sparql.query().convert()
-                for result in results["results"]["bindings"]:
-                    value = result["to_ret"]["value"]
-                    if value.isdigit():
-                        num_non_en_labels = int(value)
-                    else:
-                        num_non_en_labels = 0
-            except Exception as e:
-                print('\t\t ERROR: ', e)
-                continue
-            print('\t Getting number of non-English comments of reference property: ', prop)
-            sparql.setQuery(
-                RQSS_QUERIES['get_property_non_en_comments_wikidata'].format(prop))
-            sparql.setReturnFormat(JSON)
-            try:
-                results = sparql.query().convert()
-                for result in results["results"]["bindings"]:
-                    value = result["to_ret"]["value"]
-                    if value.isdigit():
-                        num_non_en_comments = int(value)
-                    else:
-                        num_non_en_comments = 0
-            except Exception as e:
-                print('\t\t ERROR: ', e)
+            # the properties whose labels or comments are not received are skipped
+            if prop_labels[str(prop)] is None or prop_comments[str(prop)] is None:
                 continue
             self.results.append(MultilingualMetadataResult(
-                prop, num_non_en_labels, num_non_en_comments))
+                prop, get_count_value(prop_labels[str(prop)]), get_count_value(prop_comments[str(prop)])))
         return self.results
 
     @property
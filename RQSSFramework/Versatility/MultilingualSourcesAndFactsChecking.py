@@ -1,10 +1,10 @@
-import sys
-from typing import Dict, List, NamedTuple, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-import requests
 from lxml import html
 from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from utils.fetch import FetchEngine, FetchOptions, FetchResult
+from utils.probes import ProbeStore
+from utils.sparql import WIKIDATA_ENDPOINT, get_query_values
 
 
 class MultilingualSourceResult(NamedTuple):
@@ -27,9 +27,15 @@ class MultilingualFactsAndSourcesChecker:
     results_sources: List[MultilingualSourceResult] = None
     results_facts: List[MultilingualFactResult] = None
     _statements_sources: Dict
+    _result_format: str
+    _fetch_options: FetchOptions = None
+    _probes: ProbeStore = None
 
-    def __init__(self, statements_sources: Dict):
+    def __init__(self, statements_sources: Dict, result_format: str = 'json', fetch_options: Optional[FetchOptions] = None, probes: Optional[ProbeStore] = None):
         self._statements_sources = statements_sources
+        self._result_format = result_format
+        self._fetch_options = fetch_options
+        self._probes = probes  # if given, the html lang attributes are derived from the probed pages
 
     def _get_distinct_sources_empty_dict(self) -> Dict:
         distinct_sources = set.union(
@@ -46,30 +52,34 @@ class MultilingualFactsAndSourcesChecker:
 
     def _ask_wikidata(self, query: str) -> List[str]:
         ret_val = []
-        user_agent = "RQSSFramework Python/%s.%s" % (
-            sys.version_info[0], sys.version_info[1])
-        sparql = SPARQLWrapper(
-            "https://query.wikidata.org/sparql", agent=user_agent)
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        value = None
         try:
-            results = sparql.query().convert()
-            for result in results["results"]["bindings"]:
-                value = result["to_ret"]["value"]
-                ret_val.append(value)
+            ret_val = get_query_values(
+                WIKIDATA_ENDPOINT, query, 'to_ret', self._result_format)
         except Exception as e:
             print('\t\t ERROR: ', e)
         finally:
             return ret_val
 
     def _extract_html_lang_attribute(self, url: str) -> List[str]:
+        return self._extract_html_lang_attributes([url])[0]
+
+    def _extract_html_lang_attributes(self, urls: List[str]) -> List[List[str]]:
+        """
+        get the pages of the external sources concurrently and return their
+        html lang attributes in the order of the urls
+        """
+        fetcher = self._probes if self._probes is not None else FetchEngine(
+            self._fetch_options)
+        return fetcher.fetch_all(urls, read_body=True, process=self._get_html_lang_attribute)
+
+    def _get_html_lang_attribute(self, page: FetchResult) -> List[str]:
         try:
-            page = requests.get(url, timeout=(10, 60))
-            tree = html.fromstring(page.content)
+            if page.status is None:
+                raise ValueError(page.error)
+            tree = html.fromstring(page.body)
             return tree.xpath('/html/@lang')
         except:
-            print('FAILED: getting HTML content of: {0}'.format(url))
+            print('FAILED: getting HTML content of: {0}'.format(page.url))
             return []
 
     def check_fact_sources_multilingualism(self) -> Tuple[List[MultilingualSourceResult], List[MultilingualFactResult]]:
@@ -81,9 +91,15 @@ class MultilingualFactsAndSourcesChecker:
         all = len(distinct_sources.keys())
         print(
             'Starts extracting language of {0} external/internal sources:'.format(all))
+        external_sources = [
+            key for key in distinct_sources.keys() if not key.startswith('Q')]
+        external_langs = dict(zip(external_sources, self._extract_html_lang_attributes(
+            external_sources))) if external_sources else {}
         for key, value in distinct_sources.items():
+            langs = external_langs[key] if key in external_langs else self._extract_lang(
+                key)
             [value.append(i)
-             for i in self._extract_lang(key) if i not in value]
+             for i in langs if i not in value]
             ctr += 1
             if ctr % 5000 == 0:
                 print('\t{0} of {1} extracted'.format(ctr, all))
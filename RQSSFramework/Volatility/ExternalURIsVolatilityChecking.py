@@ -1,9 +1,12 @@
-from typing import Iterator, List, NamedTuple
+import os
+import tempfile
+from typing import Dict, Iterator, List, NamedTuple, Optional
 from urllib.parse import urlparse
 
 from rdflib import URIRef
 from usp.objects.page import SitemapPageChangeFrequency
-from usp.tree import sitemap_tree_for_homepage
+from utils.fetch import FetchOptions
+from utils.sitemaps import SitemapIndex, harvest_sitemaps
 
 
 class VolatilityOfURI(NamedTuple):
@@ -16,58 +19,81 @@ class VolatilityOfURI(NamedTuple):
 
 class ExternalURIsVolatilityChecker:
     _uris: List[URIRef] = []
+    _fetch_options: FetchOptions = None
+    _sitemap_index: Optional[str] = None
     results: List[VolatilityOfURI] = None
 
-    def __init__(self, uris: Iterator[URIRef]):
+    def __init__(self, uris: Iterator[URIRef], fetch_options: Optional[FetchOptions] = None, sitemap_index: Optional[str] = None):
         self._uris = list(dict.fromkeys(uris))  # remove duplications
+        self._fetch_options = fetch_options
+        # the SQLite file of the harvested sitemaps, reused by the later runs. A temporary file if None
+        self._sitemap_index = sitemap_index
 
     def check_external_uris_volatility(self) -> List[VolatilityOfURI]:
-        self.results = []
+        if self._sitemap_index is not None:
+            return self._check_with_index(self._sitemap_index)
+        with tempfile.TemporaryDirectory() as directory:
+            return self._check_with_index(os.path.join(directory, 'sitemaps.db'))
+
+    def _check_with_index(self, index_file: str) -> List[VolatilityOfURI]:
         print('\tGetting uri domains ...')
-        uri_and_domains = [(uri, self.domain_extractor(uri))
-                           for uri in self._uris]
-        domains_pages = dict.fromkeys(j for i, j in uri_and_domains)
-        for key in domains_pages:
-            domains_pages[key] = []
+        domains_uris: Dict[str, List[URIRef]] = {}
+        for uri in self._uris:
+            domains_uris.setdefault(self.domain_extractor(uri), []).append(uri)
         print('\tGetting uri domains sitemaps ...')
-        for domain in domains_pages.keys():
-            try:
-                print('\t\tGetting sitemap of domain: ', domain)
-                tree = sitemap_tree_for_homepage(str(domain))
-                for page in tree.all_pages():
-                    domains_pages[domain].append(
-                        (str(page), page.change_frequency))
-            except:
-                print('\t\t ERROR in getting sitemap of domain: ', domain)
-                continue
-
-        for uri, domain in uri_and_domains:
-            not_found = True
-            # tree = sitemap_tree_for_homepage(str(uri))
-            # for page in tree.all_pages():
-            for page, change_frequency in domains_pages[domain]:
-                if str(uri) in page:
-                    not_found = False
-                    self.results.append(VolatilityOfURI(uri, self.get_volatility_from_change_freq(
-                        change_frequency) if change_frequency is not None else None))
-                    break
-            if not_found:
-                self.results.append(VolatilityOfURI(uri, None))
-
+        index = SitemapIndex(index_file)
+        try:
+            harvest_sitemaps(domains_uris.keys(), index, self._fetch_options)
+            volatilities = {}
+            for domain, uris in domains_uris.items():
+                volatilities.update(self._get_domain_volatilities(index, domain, uris))
+        finally:
+            index.close()
+        self.results = [VolatilityOfURI(uri, volatilities.get(uri)) for uri in self._uris]
         return self.results
 
+    def _get_domain_volatilities(self, index: SitemapIndex, domain: str, uris: List[URIRef]) -> Dict[URIRef, float]:
+        """
+        the volatility of the first page of the domain which contains each URI.
+        The pages are looked up in the index, or for the URIs which are not
+        http(s) URLs, read from the index one by one
+        """
+        ret_val = {}
+        pending = {}
+        for uri in uris:
+            if index.can_find_page(str(uri)):
+                page = index.find_page(domain, str(uri))
+                if page is not None:
+                    ret_val[uri] = self._get_page_volatility(page[1])
+            else:
+                pending[uri] = str(uri)
+        if not pending:
+            return ret_val
+        for page, change_frequency in index.get_pages(domain):
+            found = [uri for uri, uri_str in pending.items() if uri_str in page]
+            for uri in found:
+                del pending[uri]
+                ret_val[uri] = self._get_page_volatility(change_frequency)
+            if not pending:
+                break
+        return ret_val
+
+    def _get_page_volatility(self, change_frequency: Optional[str]) -> Optional[float]:
+        return self.get_volatility_from_change_freq(SitemapPageChangeFrequency(
+            change_frequency)) if SitemapPageChangeFrequency.has_value(change_frequency) else None
+
     def get_volatility_from_change_freq(self, change_freq: SitemapPageChangeFrequency) -> float:
-        if change_freq.has_value('always'):
+        if change_freq == SitemapPageChangeFrequency.ALWAYS:
             return 1.0
-        if change_freq.has_value('hourly'):
+        if change_freq == SitemapPageChangeFrequency.HOURLY:
             return 0.9
-        if change_freq.has_value('daily'):
+        if change_freq == SitemapPageChangeFrequency.DAILY:
             return 0.8
-        if change_freq.has_value('weekly'):
+        if change_freq == SitemapPageChangeFrequency.WEEKLY:
             return 0.6
-        if change_freq.has_value('monthly'):
+        if change_freq == SitemapPageChangeFrequency.MONTHLY:
             return 0.4
-        if change_freq.has_value('yearly'):
+        if change_freq == SitemapPageChangeFrequency.YEARLY:
             return 0.1
         return 0
 
@@ -0,0 +1,631 @@
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pipe, Process
+from typing import Iterator, List, Optional, Tuple, Union
+
+# run from the RQSSFramework directory: python -m utils.benchmarks <benchmark>
+
+SPARQL_RESULTS_QUERY = '''
+PREFIX prov: <http://www.w3.org/ns/prov#>
+SELECT DISTINCT (REPLACE(STR(?refProp),".*P","P") AS ?to_ret1) ?to_ret2 WHERE {
+  ?statement prov:wasDerivedFrom ?ref .
+  ?ref ?refProp ?to_ret2 .
+  FILTER (isLiteral(?to_ret2))
+}
+'''
+
+
+def genargs(prog: Optional[str] = None) -> ArgumentParser:
+    parser = ArgumentParser(prog)
+    subparsers = parser.add_subparsers(
+        title='benchmarks', dest='benchmark', required=True)
+    sparql_results = subparsers.add_parser(
+        'sparql-results', help='Compare peak RSS and throughput of extracting SPARQL results in JSON, CSV and TSV formats')
+    sparql_results.add_argument(
+        "--rows", help="Number of the result rows. The default is 1000000", type=int, default=1000000)
+    sparql_results.set_defaults(func=benchmark_sparql_results)
+    dump_parsing = subparsers.add_parser(
+        'dump-parsing', help='Compare the throughput of aggregating an N-Triples dump with different numbers of processes')
+    dump_parsing.add_argument(
+        "--statements", help="Number of the statement nodes of the dump. The default is 500000", type=int, default=500000)
+    dump_parsing.add_argument(
+        "--max-jobs", help="Maximum number of processes. The default is the number of CPUs", type=int, default=os.cpu_count())
+    dump_parsing.set_defaults(func=benchmark_dump_parsing)
+    fetch = subparsers.add_parser(
+        'fetch', help='Compare the throughput of fetching external URIs one by one and with the concurrent fetch engine, from a local HTTP server with a response delay')
+    fetch.add_argument(
+        "--uris", help="Number of the URIs. The default is 2000", type=int, default=2000)
+    fetch.add_argument(
+        "--hosts", help="Number of the hosts of the URIs. The default is 50", type=int, default=50)
+    fetch.add_argument(
+        "--delay", help="Response delay of the server in milliseconds. The default is 50", type=float, default=50)
+    fetch.add_argument(
+        "--sequential-uris", help="Number of the URIs fetched one by one, as it is slow. The default is 200", type=int, default=200)
+    fetch.set_defaults(func=benchmark_fetch)
+    sitemap_matching = subparsers.add_parser(
+        'sitemap-matching', help='Compare the duration of finding the sitemap pages of the external URIs by scanning the pages and by the sitemap index')
+    sitemap_matching.add_argument(
+        "--uris", help="Number of the URIs. The default is 100000", type=int, default=100000)
+    sitemap_matching.add_argument(
+        "--pages", help="Number of the pages of the sitemap. The default is 1000000", type=int, default=1000000)
+    sitemap_matching.add_argument(
+        "--scanned-uris", help="Number of the URIs found by scanning the pages, as it is slow. The default is 100", type=int, default=100)
+    sitemap_matching.set_defaults(func=benchmark_sitemap_matching)
+    timeliness = subparsers.add_parser(
+        'timeliness', help='Compare the duration of joining the freshness and volatility of the external URIs with nested loops and with the hash join of the timeliness metric')
+    timeliness.add_argument(
+        "--uris", help="Maximum number of the URIs, the join is measured for 1000, 10 times more, ... up to this number. The default is 1000000", type=int, default=1000000)
+    timeliness.add_argument(
+        "--nested-uris", help="Maximum number of the URIs joined with nested loops, as it is slow. The default is 10000", type=int, default=10000)
+    timeliness.set_defaults(func=benchmark_timeliness)
+    literal_syntax = subparsers.add_parser(
+        'literal-syntax', help='Compare the throughput of matching the reference literals with the regexes of their properties value by value and with the literal syntax checker')
+    literal_syntax.add_argument(
+        "--literals", help="Number of the literals of reference_literals.data. The default is 10000000", type=int, default=10000000)
+    literal_syntax.add_argument(
+        "--naive-literals", help="Number of the literals matched value by value, as it is slow. The default is 200000", type=int, default=200000)
+    literal_syntax.add_argument(
+        "--max-jobs", help="Maximum number of processes of the checker. The default is the number of CPUs", type=int, default=os.cpu_count())
+    literal_syntax.set_defaults(func=benchmark_literal_syntax)
+    property_completeness = subparsers.add_parser(
+        'property-completeness', help='Compare the duration of counting the statements of each fact and reference property by filtering the rows of each pair and by grouping the rows once')
+    property_completeness.add_argument(
+        "--rows", help="Number of the rows of statement_fact_refed_props.data. The default is 1000000", type=int, default=1000000)
+    property_completeness.add_argument(
+        "--filtered-rows", help="Number of the rows counted by filtering the rows of each pair, as it is slow. The default is 20000", type=int, default=20000)
+    property_completeness.set_defaults(func=benchmark_property_completeness)
+    return parser
+
+
+def get_peak_rss() -> int:
+    """
+    peak resident set size of the current process in KB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _write_sparql_results(directory: str, rows: int) -> None:
+    """
+    write the same synthetic literal results of the reference literals
+    extraction in the JSON, CSV and TSV formats
+    """
+    with open(os.path.join(directory, 'results.json'), 'w', encoding='utf-8') as json_file, \
+            open(os.path.join(directory, 'results.csv'), 'w', encoding='utf-8', newline='') as csv_file, \
+            open(os.path.join(directory, 'results.tsv'), 'w', encoding='utf-8') as tsv_file:
+        json_file.write(
+            '{"head":{"vars":["to_ret1","to_ret2"]},"results":{"bindings":[')
+        csv_file.write('to_ret1,to_ret2\r\n')
+        tsv_file.write('?to_ret1\t?to_ret2\n')
+        for i in range(rows):
+            prop = 'P{0}'.format(i % 9000)
+            literal = 'Reference literal value number {0}, "quoted"'.format(i)
+            json_file.write('{0}{1}'.format(',' if i > 0 else '', json.dumps({
+                'to_ret1': {'type': 'literal', 'value': prop},
+                'to_ret2': {'type': 'literal', 'xml:lang': 'en', 'value': literal}})))
+            csv_file.write('{0},"{1}"\r\n'.format(
+                prop, literal.replace('"', '""')))
+            tsv_file.write('"{0}"\t"{1}"@en\n'.format(
+                prop, literal.replace('"', '\\"')))
+        json_file.write(']}}')
+
+
+class _ResultsFileHandler(BaseHTTPRequestHandler):
+    """
+    answer every query with the results file of the requested format
+    """
+
+    def _send_results(self):
+        accept = self.headers.get('Accept', '')
+        if 'tab-separated-values' in accept:
+            file, content_type = 'results.tsv', 'text/tab-separated-values'
+        elif 'text/csv' in accept:
+            file, content_type = 'results.csv', 'text/csv'
+        else:
+            file, content_type = 'results.json', 'application/sparql-results+json'
+        if 'Content-Length' in self.headers:
+            self.rfile.read(int(self.headers['Content-Length']))
+        path = os.path.join(self.server.results_dir, file)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, 'rb') as results:
+            shutil.copyfileobj(results, self.wfile)
+
+    do_GET = _send_results
+    do_POST = _send_results
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _run_extraction(endpoint: str, result_format: str, output_file: str, connection) -> None:
+    from RQSS_Extractor import write_query_results
+    base_rss = get_peak_rss()
+    start_time = time.perf_counter()
+    write_query_results(Namespace(endpoint=endpoint, dump=None, page_size=None,
+                        result_format=result_format), SPARQL_RESULTS_QUERY, output_file)
+    duration = time.perf_counter() - start_time
+    connection.send((base_rss, get_peak_rss(), duration))
+    connection.close()
+
+
+def benchmark_sparql_results(opts: Namespace) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        print('Writing {0} result rows in JSON, CSV and TSV formats ...'.format(
+            opts.rows))
+        _write_sparql_results(directory, opts.rows)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _ResultsFileHandler)
+        server.results_dir = directory
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = 'http://127.0.0.1:{0}/sparql'.format(
+            server.server_address[1])
+
+        print('format,rows,duration (s),rows per second,peak RSS (MB),peak RSS increase (MB)')
+        outputs = {}
+        for result_format in ['json', 'csv', 'tsv']:
+            outputs[result_format] = os.path.join(
+                directory, 'output_{0}.data'.format(result_format))
+            # a new process per format, so the peak RSS of each one is separate
+            receiver, sender = Pipe(duplex=False)
+            proc = Process(target=_run_extraction, args=(
+                endpoint, result_format, outputs[result_format], sender))
+            proc.start()
+            base_rss, peak_rss, duration = receiver.recv()
+            proc.join()
+            with open(outputs[result_format], encoding='utf-8') as output:
+                rows = sum(1 for _ in output)
+            print('{0},{1},{2:.2f},{3:.0f},{4:.1f},{5:.1f}'.format(result_format, rows, duration,
+                  rows / duration if duration > 0 else 0, peak_rss / 1024, (peak_rss - base_rss) / 1024))
+        server.shutdown()
+        server.server_close()
+
+        with open(outputs['json'], 'rb') as json_output:
+            expected = json_output.read()
+        for result_format in ['csv', 'tsv']:
+            with open(outputs[result_format], 'rb') as output:
+                if output.read() != expected:
+                    print('ERROR: the extracted {0} results differ from the JSON results'.format(
+                        result_format))
+                    return 1
+    return 0
+
+
+def _write_ntriples_dump(path: str, statements: int) -> int:
+    """
+    write a synthetic N-Triples dump of referenced statements, some of
+    which share their reference nodes, and return its number of triples
+    """
+    triples = 0
+    with open(path, 'w', encoding='utf-8') as dump:
+        for i in range(statements):
+            item = '<http://www.wikidata.org/entity/Q{0}>'.format(i // 10)
+            statement = '<http://www.wikidata.org/entity/statement/Q{0}-{1}>'.format(
+                i // 10, i)
+            ref = '<http://www.wikidata.org/reference/{0:040x}>'.format(i // 3)
+            dump.write('{0} <http://www.wikidata.org/prop/P{1}> {2} .\n'.format(item, i % 500, statement))
+            dump.write('{0} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://wikiba.se/ontology#Statement> .\n'.format(statement))
+            dump.write('{0} <http://www.w3.org/ns/prov#wasDerivedFrom> {1} .\n'.format(statement, ref))
+            dump.write('{0} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://wikiba.se/ontology#Reference> .\n'.format(ref))
+            dump.write('{0} <http://www.wikidata.org/prop/reference/P854> <http://example.org/source/{1}> .\n'.format(ref, i // 3))
+            dump.write('{0} <http://www.wikidata.org/prop/reference/P813> "2020-01-01T00:00:00Z"^^<http://www.w3.org/2001/XMLSchema#dateTime> .\n'.format(ref))
+            triples += 6
+    return triples
+
+
+def benchmark_dump_parsing(opts: Namespace) -> int:
+    from DumpExtractor import aggregate_dump
+    from Queries import RQSS_QUERIES
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dump.nt')
+        print('Writing an N-Triples dump of {0} statement nodes ...'.format(
+            opts.statements))
+        triples = _write_ntriples_dump(path, opts.statements)
+        # a few chunks per process, as the chunks of a large dump
+        chunk_size = max(1, os.path.getsize(path) // (4 * max(1, opts.max_jobs)))
+
+        print('jobs,triples,duration (s),triples per second,speedup')
+        jobs, base_duration, expected = 1, None, None
+        while True:
+            start_time = time.perf_counter()
+            dump = aggregate_dump(path, 'nt', jobs, chunk_size)
+            duration = time.perf_counter() - start_time
+            base_duration = base_duration or duration
+            print('{0},{1},{2:.2f},{3:.0f},{4:.2f}'.format(jobs, triples, duration,
+                  triples / duration if duration > 0 else 0, base_duration / duration if duration > 0 else 0))
+            counts = [list(dump.get_query_rows(RQSS_QUERIES[i])) for i in [
+                'get_num_of_statement_nodes_wikimedia', 'get_num_of_ref_nodes_wikimedia', 'get_num_of_reference_triples_wikimedia']]
+            if expected is None:
+                expected = counts
+            elif counts != expected:
+                print('ERROR: the aggregates of {0} processes differ from the aggregates of one process'.format(
+                    jobs))
+                return 1
+            if jobs >= opts.max_jobs:
+                break
+            jobs = min(jobs * 2, opts.max_jobs)
+    return 0
+
+
+class _DelayedPageHandler(BaseHTTPRequestHandler):
+    """
+    answer every request with a small page after the delay of the server
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # the keep-alive connections are reset when the client is closed
+            pass
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = b'<html lang="en"><body>page</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def benchmark_fetch(opts: Namespace) -> int:
+    import requests
+    from utils.fetch import FetchEngine, FetchOptions
+    # a server per host, as the hosts are told apart by their ports
+    servers = []
+    for _ in range(opts.hosts):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _DelayedPageHandler)
+        server.daemon_threads = True
+        server.delay = opts.delay / 1000
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    uris = ['http://127.0.0.1:{0}/page/{1}'.format(servers[i % opts.hosts].server_address[1], i)
+            for i in range(opts.uris)]
+
+    print('client,uris,duration (s),uris per second,failed')
+    sequential = uris[:opts.sequential_uris]
+    start_time = time.perf_counter()
+    failed = 0
+    for uri in sequential:
+        try:
+            failed += requests.get(uri, timeout=(10, 60)).status_code != 200
+        except Exception:
+            failed += 1
+    duration = time.perf_counter() - start_time
+    print('requests one by one,{0},{1:.2f},{2:.0f},{3}'.format(
+        len(sequential), duration, len(sequential) / duration if duration > 0 else 0, failed))
+
+    start_time = time.perf_counter()
+    results = FetchEngine(FetchOptions()).fetch_all(uris)
+    duration = time.perf_counter() - start_time
+    failed = sum(1 for i in results if not i.ok)
+    print('fetch engine,{0},{1:.2f},{2:.0f},{3}'.format(
+        len(uris), duration, len(uris) / duration if duration > 0 else 0, failed))
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    if failed > 0:
+        print('ERROR: {0} URIs are not fetched by the fetch engine'.format(failed))
+        return 1
+    return 0
+
+
+def _get_sitemap_pages(domain: str, pages: int) -> Iterator[Tuple[str, str]]:
+    """
+    the pages of a synthetic sitemap, with a few archived pages which embed a URL
+    """
+    frequencies = ['always', 'hourly', 'daily', 'weekly', 'monthly', 'yearly']
+    for i in range(pages):
+        page = '{0}/item/{1}/page.html'.format(domain, i)
+        if i % 20 == 0:
+            page = 'https://web.archive.org/web/2020/' + page
+        yield page, frequencies[i % len(frequencies)]
+
+
+def benchmark_sitemap_matching(opts: Namespace) -> int:
+    import random
+    from utils.sitemaps import SitemapIndex, SitemapRequest
+    from Volatility.ExternalURIsVolatilityChecking import \
+        ExternalURIsVolatilityChecker
+    domain = 'https://example.org'
+    rnd = random.Random(0)
+    # a tenth of the URIs are not in the sitemap
+    uris = ['{0}/item/{1}/page.html'.format(domain, rnd.randrange(opts.pages * 10 // 9))
+            for _ in range(opts.uris)]
+    with tempfile.TemporaryDirectory() as directory:
+        print('Writing a sitemap index of {0} pages ...'.format(opts.pages))
+        start_time = time.perf_counter()
+        index = SitemapIndex(os.path.join(directory, 'sitemaps.db'))
+        index.put_sitemap(SitemapRequest(domain + '/sitemap.xml', domain),
+                          _get_sitemap_pages(domain, opts.pages))
+        index.commit()
+        print('Written in {0:.2f} s'.format(time.perf_counter() - start_time))
+        checker = ExternalURIsVolatilityChecker([])
+
+        print('method,uris,duration (s),uris per second,estimated duration of all uris (s)')
+        scanned = list(dict.fromkeys(uris[:opts.scanned_uris]))
+        start_time = time.perf_counter()
+        expected = {}
+        for uri in scanned:
+            for page, change_frequency in index.get_pages(domain):
+                if uri in page:
+                    expected[uri] = checker._get_page_volatility(change_frequency)
+                    break
+        duration = time.perf_counter() - start_time
+        print('scanning the pages,{0},{1:.2f},{2:.1f},{3:.0f}'.format(len(scanned), duration,
+              len(scanned) / duration if duration > 0 else 0, duration * len(uris) / max(1, len(scanned))))
+
+        start_time = time.perf_counter()
+        results = checker._get_domain_volatilities(index, domain, list(dict.fromkeys(uris)))
+        duration = time.perf_counter() - start_time
+        print('sitemap index,{0},{1:.2f},{2:.0f},{1:.2f}'.format(len(uris), duration,
+              len(uris) / duration if duration > 0 else 0))
+        index.close()
+    if any(results.get(uri) != expected.get(uri) for uri in scanned):
+        print('ERROR: the sitemap index finds other pages than scanning the pages')
+        return 1
+    return 0
+
+
+def _join_with_nested_loops(freshnesses: List, volatilities: List) -> List:
+    """
+    the join of the timeliness metric before the hash join
+    """
+    from Timeliness.ExternalURIsTimelinessChecking import TimelinessOfURI
+    results = []
+    for uf in freshnesses:
+        if uf.freshness_last_modif == None:
+            results.append(TimelinessOfURI(uf.uri, None))
+            continue
+        for uv in volatilities:
+            if uf.uri == uv.uri:
+                if uv.volatility == None:
+                    results.append(TimelinessOfURI(uf.uri, None))
+                    break
+                results.append(TimelinessOfURI(
+                    uf.uri, uf.freshness_last_modif/uv.volatility if uv.volatility > 0 and uv.volatility > uf.freshness_last_modif else 1.0))
+    return results
+
+
+def benchmark_timeliness(opts: Namespace) -> int:
+    import random
+    from Currency.ExternalURIsFreshnessChecking import FreshnessOfURI
+    from rdflib import URIRef
+    from Timeliness.ExternalURIsTimelinessChecking import \
+        ExternalURIsTimelinessChecker
+    from Volatility.ExternalURIsVolatilityChecking import VolatilityOfURI
+    rnd = random.Random(0)
+    print('join,uris,duration (s),uris per second')
+    uris = 1000
+    while uris <= opts.uris:
+        uri_list = [URIRef('https://example{0}.org/page/{1}'.format(i % 1000, i)) for i in range(uris)]
+        freshnesses = [FreshnessOfURI(u, rnd.choice([None, rnd.random()])) for u in uri_list]
+        rnd.shuffle(uri_list)
+        volatilities = [VolatilityOfURI(u, rnd.choice([None, 0, 0.1, 0.4, 0.6, 0.8, 0.9, 1.0])) for u in uri_list]
+        start_time = time.perf_counter()
+        results = ExternalURIsTimelinessChecker(freshnesses, volatilities).check_external_uris_timeliness()
+        duration = time.perf_counter() - start_time
+        print('hash join,{0},{1:.2f},{2:.0f}'.format(uris, duration, uris / duration if duration > 0 else 0))
+        if uris <= opts.nested_uris:
+            start_time = time.perf_counter()
+            expected = _join_with_nested_loops(freshnesses, volatilities)
+            duration = time.perf_counter() - start_time
+            print('nested loops,{0},{1:.2f},{2:.0f}'.format(uris, duration, uris / duration if duration > 0 else 0))
+            if results != expected:
+                print('ERROR: the hash join differs from the nested loops')
+                return 1
+        uris *= 10
+    return 0
+
+
+# regexes of some reference properties in Wikidata, with a regex which is not compiled
+LITERAL_SYNTAX_REGEXES = {
+    'P356': [r'10\.\d{4,9}/[^\s]+'],
+    'P698': [r'[1-9]\d{0,8}'],
+    'P1476': [],
+    'P2093': [r'[^\s].*[^\s]', '(', r'\S'],
+}
+
+
+def _write_reference_literals(path: str, literals: int) -> None:
+    """
+    a reference_literals.data file of the literals, with many repeated values like the real literals
+    """
+    import csv
+    import random
+    rnd = random.Random(0)
+    values = {
+        'P356': ['10.{0}/journal.{1}'.format(rnd.randint(1000, 99999), i) for i in range(50000)] + ['doi:10.1/x', ''],
+        'P698': [str(rnd.randint(1, 40000000)) for _ in range(50000)] + ['PMC123', '0123'],
+        'P1476': ['Title {0}'.format(i) for i in range(50000)],
+        'P2093': ['Author {0}'.format(i) for i in range(50000)] + [' ', ' Author'],
+    }
+    properties = list(values.keys())
+    with open(path, 'w', encoding='utf8', newline='') as file:
+        writer = csv.writer(file)
+        for _ in range(literals):
+            prop = rnd.choice(properties)
+            writer.writerow([prop, rnd.choice(values[prop])])
+
+
+def _read_reference_literals(path: str, literals: int) -> dict:
+    """
+    the first literals of each property, read like the runner does
+    """
+    import csv
+    prop_values = {}
+    with open(path, encoding='utf8') as file:
+        for i, row in enumerate(csv.reader(file)):
+            if i >= literals:
+                break
+            prop_values.setdefault(str(row[0]), []).append(row[1])
+    return prop_values
+
+
+def _check_literals_value_by_value(prop_values: dict, regexes: dict) -> List:
+    """
+    the literal syntax checker before the regexes were compiled once, with
+    its failed flag set for each value
+    """
+    import re
+
+    import numpy as np
+    from Accuracy.LiteralSyntaxChecking import LiteralSyntaxResult
+    results = []
+    for prop, values in prop_values.items():
+        if len(regexes[prop]) == 0:
+            results.append(LiteralSyntaxResult(prop, len(values), np.nan, np.nan, 0))
+            continue
+        num_fails = 0
+        errors = []
+        for value in values:
+            failed = True
+            for regex in regexes[prop]:
+                if regex in errors:
+                    continue
+                try:
+                    pattern = re.compile(regex)
+                    if bool(re.match(pattern, value)):
+                        failed = False
+                        break
+                except re.error:
+                    errors.append(regex)
+                    continue
+            if failed:
+                num_fails += 1
+        results.append(LiteralSyntaxResult(prop, len(values), num_fails, len(errors), len(regexes[prop])))
+    return results
+
+
+def _get_literal_fails(results: List) -> str:
+    return str([(i.ref_property, i.total, i.fails) for i in results])
+
+
+def benchmark_literal_syntax(opts: Namespace) -> int:
+    from Accuracy.LiteralSyntaxChecking import WikibaseRefLiteralSyntaxChecker
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'reference_literals.data')
+        _write_reference_literals(path, opts.literals)
+        print('matching,jobs,literals,duration (s),literals per second')
+        naive_values = _read_reference_literals(path, opts.naive_literals)
+        start_time = time.perf_counter()
+        expected = _check_literals_value_by_value(naive_values, LITERAL_SYNTAX_REGEXES)
+        duration = time.perf_counter() - start_time
+        print('value by value,1,{0},{1:.2f},{2:.0f}'.format(
+            opts.naive_literals, duration, opts.naive_literals / duration if duration > 0 else 0))
+        results = WikibaseRefLiteralSyntaxChecker(naive_values, LITERAL_SYNTAX_REGEXES).check_literals_regex()
+        # the regex errors are not compared, as matching value by value skips the
+        # regexes after the first match and misses the errors of some of them
+        if _get_literal_fails(results) != _get_literal_fails(expected):
+            print('ERROR: the checker counts other fails than matching value by value')
+            return 1
+        prop_values = _read_reference_literals(path, opts.literals)
+        jobs, expected = 1, None
+        while True:
+            start_time = time.perf_counter()
+            results = WikibaseRefLiteralSyntaxChecker(
+                prop_values, LITERAL_SYNTAX_REGEXES, jobs=jobs).check_literals_regex()
+            duration = time.perf_counter() - start_time
+            print('checker,{0},{1},{2:.2f},{3:.0f}'.format(
+                jobs, opts.literals, duration, opts.literals / duration if duration > 0 else 0))
+            if expected is not None and str(results) != str(expected):
+                print('ERROR: the checker counts other fails with {0} processes'.format(jobs))
+                return 1
+            expected = results
+            if jobs >= opts.max_jobs:
+                break
+            jobs = min(jobs * 2, opts.max_jobs)
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+
+def _get_fact_refs(rows: int) -> List:
+    """
+    the rows of statement_fact_refed_props.data: statements of some hundred
+    facts, with zero to three reference properties each
+    """
+    import random
+    from Completeness.SchemaBasedRefPropertiesCompletenessChecking import \
+        FactRef
+    rnd = random.Random(0)
+    fact_refs = []
+    statement = 0
+    while len(fact_refs) < rows:
+        statement += 1
+        fact = 'P{0}'.format(int(rnd.paretovariate(1)) % 300)
+        ref_predicates = rnd.sample(['P248', 'P854', 'P813', 'P143', 'P577', 'P1476', 'P4656', 'P887'], rnd.randint(0, 3))
+        for ref_predicate in ref_predicates or [None]:
+            fact_refs.append(FactRef('Q{0}-{1}'.format(statement, fact), fact, ref_predicate))
+    return fact_refs[:rows]
+
+
+def _check_property_completeness_per_pair(checker) -> List:
+    """
+    the property completeness metric before the rows were grouped once,
+    filtering all rows for each fact and reference property
+    """
+    from Completeness.PropertyCompletenessChecking import \
+        PropertyCompletenessResult
+    df = checker._df
+    results = []
+    for fact, refs in checker._get_distinct_fact_and_ref_predicates().items():
+        for ref in refs:
+            total_instances = len(df.loc[(df['fact'] == fact) & ~(
+                df['ref_predicate'].isna())].drop_duplicates('statement_id'))
+            total_instances_not_refed = len(df.loc[(
+                df['fact'] == fact)].drop_duplicates('statement_id'))
+            total_refed = len(df.loc[(df['fact'] == fact) & (
+                df['ref_predicate'] == ref)].drop_duplicates('statement_id'))
+            results.append(PropertyCompletenessResult(
+                fact, ref, total_instances, total_instances_not_refed, total_refed))
+    return results
+
+
+def benchmark_property_completeness(opts: Namespace) -> int:
+    from Completeness.PropertyCompletenessChecking import \
+        PropertyCompletenessChecker
+    print('counting,rows,pairs,duration (s),rows per second')
+    for rows, filtered in [(min(opts.filtered_rows, opts.rows), True), (opts.rows, False)]:
+        checker = PropertyCompletenessChecker(_get_fact_refs(rows))
+        start_time = time.perf_counter()
+        results = checker.check_property_completeness_Wikidata()
+        duration = time.perf_counter() - start_time
+        print('grouping,{0},{1},{2:.2f},{3:.0f}'.format(
+            rows, len(results), duration, rows / duration if duration > 0 else 0))
+        if filtered:
+            start_time = time.perf_counter()
+            expected = _check_property_completeness_per_pair(checker)
+            duration = time.perf_counter() - start_time
+            print('filtering each pair,{0},{1},{2:.2f},{3:.0f}'.format(
+                rows, len(expected), duration, rows / duration if duration > 0 else 0))
+            if results != expected:
+                print('ERROR: grouping the rows counts other statements than filtering the rows of each pair')
+                return 1
+    return 0
+
+
+def main(argv: Optional[Union[str, List[str]]] = None, prog: Optional[str] = None) -> int:
+    if isinstance(argv, str):
+        argv = argv.split()
+    opts = genargs(prog).parse_args(argv if argv is not None else sys.argv[1:])
+    return opts.func(opts)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
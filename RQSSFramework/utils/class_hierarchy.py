@@ -0,0 +1,105 @@
+import csv
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+INSTANCE_OF = 'P31'
+SUBCLASS_OF = 'P279'
+
+
+class ClassHierarchyIndex:
+    """
+    the instance of (P31) and subclass of (P279) edges of the items with
+    interned integer IDs. Like the get_instances_subclass_of_values_wikimedia
+    query, the classes of an item are its P279+ and P31/P279* classes. The
+    superclasses of each class are computed once, when they are first needed
+    """
+    _ids: Dict[str, int]
+    _names: List[str]
+    _instance_of: Dict[int, List[int]]
+    _subclass_of: Dict[int, List[int]]
+    _superclasses: Dict[int, FrozenSet[int]]    # class -> the class and its P279+ classes
+    _classes: Dict[int, FrozenSet[int]]         # item -> its P279+ and P31/P279* classes
+
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+        self._instance_of = {}
+        self._subclass_of = {}
+        self._superclasses = {}
+        self._classes = {}
+
+    def _intern(self, name: str) -> int:
+        node = self._ids.get(name)
+        if node is None:
+            node = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return node
+
+    def add_edge(self, item: str, prop: str, item_class: str) -> None:
+        edges = self._instance_of if prop == INSTANCE_OF else self._subclass_of
+        edges.setdefault(self._intern(item), []).append(
+            self._intern(item_class))
+        self._superclasses.clear()
+        self._classes.clear()
+
+    @classmethod
+    def from_file(cls, path: str, items: Optional[Iterable[str]] = None) -> 'ClassHierarchyIndex':
+        """
+        the index of the class_hierarchy.data of the extractor (item, P31 or
+        P279, class rows). If items is given, only the P31 edges of the items
+        are kept, as the P31 edges of all Wikidata items are too many
+        """
+        items = set(items) if items is not None else None
+        index = cls()
+        with open(path, encoding='utf8', newline='') as file_handler:
+            for row in csv.reader(file_handler):
+                if len(row) < 3 or row[1] not in (INSTANCE_OF, SUBCLASS_OF):
+                    continue
+                if row[1] == INSTANCE_OF and items is not None and row[0] not in items:
+                    continue
+                index.add_edge(*row[:3])
+        return index
+
+    def _get_superclasses(self, node: int) -> FrozenSet[int]:
+        superclasses = self._superclasses.get(node)
+        if superclasses is not None:
+            return superclasses
+        # the subclass of edges have cycles, so the classes are walked
+        # iteratively and the known superclasses are not walked again
+        reached: Set[int] = {node}
+        pending = [node]
+        while pending:
+            for parent in self._subclass_of.get(pending.pop(), ()):
+                if parent in reached:
+                    continue
+                known = self._superclasses.get(parent)
+                if known is not None:
+                    reached |= known
+                else:
+                    reached.add(parent)
+                    pending.append(parent)
+        superclasses = self._superclasses[node] = frozenset(reached)
+        return superclasses
+
+    def _get_classes(self, node: int) -> FrozenSet[int]:
+        classes = self._classes.get(node)
+        if classes is None:
+            classes = frozenset().union(*[self._get_superclasses(i) for i in
+                                          self._subclass_of.get(node, []) + self._instance_of.get(node, [])])
+            self._classes[node] = classes
+        return classes
+
+    def get_classes(self, item: str) -> List[str]:
+        """
+        the P279+ and P31/P279* classes of the item
+        """
+        node = self._ids.get(item)
+        return [] if node is None else [self._names[i] for i in self._get_classes(node)]
+
+    def is_instance_or_subclass(self, item: str, item_class: str) -> bool:
+        node, class_node = self._ids.get(item), self._ids.get(item_class)
+        if node is None or class_node is None:
+            return False
+        return class_node in self._get_classes(node)
+
+    def __len__(self):
+        return len(self._names)
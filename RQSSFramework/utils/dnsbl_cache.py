@@ -0,0 +1,64 @@
+import json
+import sqlite3
+import time
+from typing import List, NamedTuple, Optional
+
+# the names not listed by a DNSBL are kept for one day, since their
+# NXDOMAIN answers do not carry the TTL of the blacklist
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+
+
+class CachedAnswer(NamedTuple):
+    """
+    an A record of a DNSBL answer, with the host field of the c-ares
+    results, so the providers process it as a resolver answer
+    """
+    host: str
+    ttl: int
+
+
+class DNSBLCache:
+    """
+    a persistent cache of the DNSBL answers in an SQLite database, keyed by
+    the queried name (the domain and the DNSBL zone). The listed names are
+    kept for the TTL of their answer and the unlisted ones for negative_ttl
+    seconds. Several processes can share the cache, so each write is
+    committed at once and does not keep the database locked
+    """
+    _connection: sqlite3.Connection
+    _negative_ttl: float
+    hits: int = 0
+    misses: int = 0
+
+    def __init__(self, path: str, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS answers (query TEXT PRIMARY KEY, hosts TEXT, expires_at REAL)')
+        self._negative_ttl = negative_ttl
+
+    def get(self, query: str) -> Optional[List[CachedAnswer]]:
+        """
+        the unexpired answer of the query, an empty list if the name is not
+        listed and None if the answer is not cached
+        """
+        row = self._connection.execute(
+            'SELECT hosts, expires_at FROM answers WHERE query = ?', (query,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        expires_in = int(row[1] - time.time())
+        return [CachedAnswer(host, expires_in) for host in json.loads(row[0])]
+
+    def put(self, query: str, answer: Optional[List]) -> None:
+        """
+        keep the A records of the answer, None if the name is not listed
+        """
+        ttl = min(i.ttl for i in answer) if answer else self._negative_ttl
+        self._connection.execute('INSERT OR REPLACE INTO answers VALUES (?, ?, ?)', (
+            query, json.dumps([i.host for i in answer or []]), time.time() + ttl))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __repr__(self):
+        return 'DNSBL cache: {0} hits, {1} queried'.format(self.hits, self.misses)
@@ -0,0 +1,284 @@
+import asyncio
+import codecs
+import re
+import sqlite3
+from typing import (Any, Callable, Dict, Iterable, List, Mapping, NamedTuple,
+                    Optional, Tuple)
+from urllib.parse import urlparse
+
+import aiohttp
+from multidict import CIMultiDict
+
+from utils.http_cache import DEFAULT_TTL, CachedResponse, HTTPCache
+from utils.sparql import get_user_agent
+
+_CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+# the size of the chunks of the bodies fed to the scanners
+SCAN_CHUNK_SIZE = 1 << 16
+
+
+def get_charset(headers: Mapping[str, str]) -> str:
+    """
+    the charset of the Content-Type of the headers, UTF-8 by default
+    """
+    charset = _CHARSET_PATTERN.search(headers.get('Content-Type', ''))
+    if charset is not None:
+        try:
+            return codecs.lookup(charset.group(1)).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+class FetchOptions(NamedTuple):
+    max_connections: int = 100          # open connections of all hosts
+    max_connections_per_host: int = 4   # open connections of each host
+    connect_timeout: float = 10         # seconds to connect
+    read_timeout: float = 60            # seconds between two reads of the response
+    cache_file: Optional[str] = None    # the SQLite file of the HTTP cache, no cache if None
+    cache_ttl: float = DEFAULT_TTL      # seconds a cached response is used without any request
+    cache_revalidate: bool = False      # request the expired responses conditionally
+
+
+class FetchResult(NamedTuple):
+    url: str
+    status: Optional[int] = None        # None if the request failed
+    headers: Mapping[str, str] = {}
+    body: Optional[bytes] = None        # None if the body is not read
+    error: Optional[str] = None
+    scanned: Any = None                 # the result of the scanner of the body, if any
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+    def text(self) -> str:
+        """
+        the body decoded with the charset of its Content-Type, UTF-8 by default
+        """
+        if self.body is None:
+            return ''
+        return self.body.decode(get_charset(self.headers), errors='replace')
+
+    def __repr__(self):
+        return "URL:{0:40}, Status:{1}, Error:{2}".format(self.url, self.status, self.error)
+
+
+class BodyScanner:
+    """
+    consume a body chunk by chunk, so the body is neither read whole nor
+    kept in memory. feed returns True when the rest of the body is not
+    needed. The result is returned in the scanned field of the FetchResult
+    """
+    result: Any = None
+
+    def feed(self, chunk: bytes) -> bool:
+        raise NotImplementedError
+
+
+def scan_body(scanner: BodyScanner, body: bytes) -> bool:
+    """
+    feed a read body to the scanner, return True if the scanner stopped
+    """
+    for start in range(0, len(body), SCAN_CHUNK_SIZE):
+        if scanner.feed(body[start:start + SCAN_CHUNK_SIZE]):
+            return True
+    return False
+
+
+class FetchEngine:
+    """
+    fetch many URLs concurrently over a shared pool of keep-alive
+    connections, with a limit of open connections in total and per host.
+    The requests of a busy host wait for its own slots, so they do not
+    hold the slots of the other hosts
+    """
+    _options: FetchOptions
+    _cache: Optional[HTTPCache] = None
+    _global_slots: asyncio.Semaphore
+    _host_slots: Dict[str, asyncio.Semaphore]
+
+    def __init__(self, options: Optional[FetchOptions] = None):
+        self._options = options or FetchOptions()
+        if self._options.cache_file is not None:
+            self._cache = HTTPCache(
+                self._options.cache_file, self._options.cache_ttl, self._options.cache_revalidate)
+
+    def _get_host_slots(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(
+                self._options.max_connections_per_host)
+        return self._host_slots[host]
+
+    async def _read_body(self, response: aiohttp.ClientResponse, max_body: Optional[int]) -> Tuple[bytes, bool]:
+        """
+        the body up to max_body bytes, and whether it is the complete body
+        """
+        if max_body is None:
+            return await response.read(), True
+        body = bytearray()
+        while len(body) < max_body:
+            chunk = await response.content.read(max_body - len(body))
+            if not chunk:
+                return bytes(body), True
+            body += chunk
+        return bytes(body), response.content.at_eof()
+
+    async def _scan_body(self, response: aiohttp.ClientResponse, scanner: BodyScanner,
+                         max_body: Optional[int]) -> Tuple[Optional[bytes], bool]:
+        """
+        feed the body to the scanner until it stops or max_body bytes are
+        read. The read bytes are kept only for the cache
+        """
+        body = bytearray() if self._cache is not None else None
+        size = 0
+        async for chunk in response.content.iter_chunked(SCAN_CHUNK_SIZE):
+            if max_body is not None:
+                chunk = chunk[:max_body - size]
+            size += len(chunk)
+            if body is not None:
+                body += chunk
+            if scanner.feed(chunk):
+                return body, False
+            if max_body is not None and size >= max_body:
+                return body, response.content.at_eof()
+        return body, True
+
+    def _get_usable_cached(self, cached: Optional[CachedResponse], read_body: bool, max_body: Optional[int],
+                           scanner: Optional[BodyScanner]) -> Optional[CachedResponse]:
+        """
+        the cached response if it has enough of the body, fed to the scanner if any
+        """
+        if cached is None or not (read_body or scanner is not None):
+            return cached
+        if cached.body is None:
+            return None
+        if cached.complete or (max_body is not None and len(cached.body) >= max_body):
+            if scanner is not None:
+                scan_body(scanner, cached.body[:max_body])
+            return cached
+        # a truncated body is enough if the scanner stops in it
+        if scanner is not None and scan_body(scanner, cached.body):
+            return cached
+        return None
+
+    def _get_cached(self, method: str, url: str, verify_ssl: bool, read_body: bool) -> Optional[CachedResponse]:
+        """
+        the cached response of the request, None if the cache cannot be read,
+        so the URL is requested instead of failing
+        """
+        try:
+            return self._cache.get(method, url, verify_ssl, read_body)
+        except sqlite3.Error as e:
+            print('\t\t ERROR in reading the HTTP cache: ', e)
+            return None
+
+    def _write_cache(self, write: Callable[..., None], *args) -> None:
+        # a response which is not cached is still the result of the request
+        try:
+            write(*args)
+        except sqlite3.Error as e:
+            print('\t\t ERROR in writing the HTTP cache: ', e)
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, method: str, read_body: bool, verify_ssl: bool,
+                     process: Optional[Callable[[FetchResult], Any]], max_body: Optional[int] = None,
+                     scan: Optional[Callable[[Mapping[str, str]], BodyScanner]] = None) -> Any:
+        cached, scanner = None, None
+        if self._cache is not None:
+            cached = self._get_cached(
+                method, url, verify_ssl, read_body or scan is not None)
+            if cached is not None and scan is not None:
+                scanner = scan(CIMultiDict(cached.headers))
+            cached = self._get_usable_cached(
+                cached, read_body, max_body, scanner)
+        if cached is not None and self._cache.is_fresh(cached):
+            self._cache.hits += 1
+            result = self._get_cached_result(url, cached, read_body, scanner)
+            return process(result) if process is not None else result
+        try:
+            async with self._get_host_slots(url), self._global_slots:
+                # like requests, the redirects of GET are followed and the ones of HEAD are not
+                async with session.request(method, url, allow_redirects=(method != 'HEAD'), ssl=None if verify_ssl else False,
+                                           headers=self._cache.get_request_headers(cached) if self._cache is not None else None) as response:
+                    if response.status == 304 and cached is not None:
+                        self._cache.revalidated += 1
+                        self._write_cache(self._cache.touch,
+                                          method, url, verify_ssl)
+                        result = self._get_cached_result(
+                            url, cached, read_body, scanner)
+                    else:
+                        body, complete, scanner = None, True, None
+                        if scan is not None:
+                            scanner = scan(response.headers)
+                            body, complete = await self._scan_body(response, scanner, max_body)
+                        elif read_body:
+                            body, complete = await self._read_body(response, max_body)
+                        result = FetchResult(url, response.status, response.headers, body if read_body else None,
+                                             scanned=scanner.result if scanner is not None else None)
+                        if self._cache is not None:
+                            self._cache.misses += 1
+                            self._write_cache(self._cache.put, method, url, verify_ssl, response.status,
+                                              list(response.headers.items()), body, complete)
+        except Exception as e:
+            result = FetchResult(url, error='{0}: {1}'.format(
+                type(e).__name__, e) if str(e) else type(e).__name__)
+        return process(result) if process is not None else result
+
+    def _get_cached_result(self, url: str, cached: CachedResponse, read_body: bool,
+                           scanner: Optional[BodyScanner]) -> FetchResult:
+        return FetchResult(url, cached.status, CIMultiDict(cached.headers), cached.body if read_body else None,
+                           scanned=scanner.result if scanner is not None else None)
+
+    async def fetch_all_async(self, urls: Iterable[str], method: str = 'GET', read_body: bool = False, verify_ssl: bool = True,
+                              process: Optional[Callable[[FetchResult], Any]] = None, max_body: Optional[int] = None,
+                              scan: Optional[Callable[[Mapping[str, str]], BodyScanner]] = None) -> List[Any]:
+        self._global_slots = asyncio.Semaphore(self._options.max_connections)
+        self._host_slots = {}
+        connector = aiohttp.TCPConnector(limit=self._options.max_connections,
+                                         limit_per_host=self._options.max_connections_per_host)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self._options.connect_timeout,
+                                        sock_read=self._options.read_timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={'User-Agent': get_user_agent()}) as session:
+            # a bounded window of pending requests, so the URLs are not all scheduled at once
+            window = asyncio.Semaphore(self._options.max_connections * 8)
+
+            async def fetch_in_window(url: str) -> Any:
+                try:
+                    return await self._fetch(session, url, method, read_body, verify_ssl, process, max_body, scan)
+                finally:
+                    window.release()
+
+            tasks = []
+            for url in urls:
+                await window.acquire()
+                tasks.append(asyncio.ensure_future(fetch_in_window(url)))
+            results = await asyncio.gather(*tasks)
+        if self._cache is not None:
+            print(self._cache)
+        return results
+
+    def fetch_all(self, urls: Iterable[str], method: str = 'GET', read_body: bool = False, verify_ssl: bool = True,
+                  process: Optional[Callable[[FetchResult], Any]] = None, max_body: Optional[int] = None,
+                  scan: Optional[Callable[[Mapping[str, str]], BodyScanner]] = None) -> List[Any]:
+        """
+        request each URL and return their results in the order of the URLs.
+        If process is given, the result of each URL is process(FetchResult),
+        which is called as soon as the response is received, so the bodies
+        are not kept in memory. If max_body is given, only the first max_body
+        bytes of the bodies are read. If scan is given, the body of each
+        response is fed to the scanner scan(headers) as it is received, until
+        the scanner stops, and the result of the scanner is the scanned field
+        """
+        return asyncio.run(self.fetch_all_async(urls, method, read_body, verify_ssl, process, max_body, scan))
+
+
+def fetch_all(urls: Iterable[str], method: str = 'GET', read_body: bool = False, verify_ssl: bool = True,
+              process: Optional[Callable[[FetchResult], Any]] = None, options: Optional[FetchOptions] = None,
+              max_body: Optional[int] = None, scan: Optional[Callable[[Mapping[str, str]], BodyScanner]] = None) -> List[Any]:
+    """
+    request each URL with a new FetchEngine (see FetchEngine.fetch_all)
+    """
+    return FetchEngine(options).fetch_all(urls, method, read_body, verify_ssl, process, max_body, scan)
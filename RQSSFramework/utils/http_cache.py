@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# the cached responses are used without any request for 30 days
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[str, str]]
+    body: Optional[bytes]   # None if the body is not cached or not asked
+    complete: bool          # the body is not truncated
+    fetched_at: float       # the time of the response or of its last revalidation
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """
+        the headers of a conditional request of the response
+        """
+        ret_val = {}
+        for key, value in self.headers:
+            if key.lower() == 'etag':
+                ret_val['If-None-Match'] = value
+            elif key.lower() == 'last-modified':
+                ret_val['If-Modified-Since'] = value
+        return ret_val
+
+
+class HTTPCache:
+    """
+    a persistent cache of the HTTP responses in an SQLite database, keyed by
+    the method, URL and certificate verification of the requests. A response
+    is fresh for ttl seconds. The expired responses are requested again, or
+    with revalidate, conditionally with their ETag/Last-Modified validators,
+    so the unchanged pages are answered with 304 Not Modified and no body.
+    Several processes can share the cache, so each write is committed at
+    once and does not keep the database locked for the other processes
+    """
+    _connection: sqlite3.Connection
+    _ttl: float
+    _revalidate: bool
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, revalidate: bool = False):
+        self._connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS responses (method TEXT, url TEXT, verify INTEGER, status INTEGER, headers TEXT, '
+                                 'body BLOB, complete INTEGER, fetched_at REAL, PRIMARY KEY (method, url, verify))')
+        self._ttl = ttl
+        self._revalidate = revalidate
+
+    def get(self, method: str, url: str, verify_ssl: bool, read_body: bool) -> Optional[CachedResponse]:
+        """
+        the cached response of the request, None if it is not cached. The
+        body is returned only if read_body
+        """
+        row = self._connection.execute('SELECT status, headers, body, complete, fetched_at FROM responses WHERE method = ? AND url = ? AND verify = ?',
+                                       (method, url, int(verify_ssl))).fetchone()
+        if row is None:
+            return None
+        status, headers, body, complete, fetched_at = row
+        return CachedResponse(status, [tuple(i) for i in json.loads(headers)],
+                              zlib.decompress(body) if body is not None and read_body else None, bool(complete), fetched_at)
+
+    def is_fresh(self, response: CachedResponse) -> bool:
+        return time.time() - response.fetched_at < self._ttl
+
+    def get_request_headers(self, response: Optional[CachedResponse]) -> Dict[str, str]:
+        """
+        the conditional request headers of the expired response, if revalidation is set
+        """
+        return response.validators if response is not None and self._revalidate else {}
+
+    def put(self, method: str, url: str, verify_ssl: bool, status: int, headers: List[Tuple[str, str]],
+            body: Optional[bytes], complete: bool = True) -> None:
+        """
+        cache the response. A response without body keeps the cached body of
+        the same URL and status, as the body-less GETs of some metrics are
+        for the pages whose body is read by others
+        """
+        self._connection.execute('INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (method, url, verify) DO UPDATE SET '
+                                 'body = CASE WHEN excluded.body IS NULL AND status = excluded.status THEN body ELSE excluded.body END, '
+                                 'complete = CASE WHEN excluded.body IS NULL AND status = excluded.status THEN complete ELSE excluded.complete END, '
+                                 'status = excluded.status, headers = excluded.headers, fetched_at = excluded.fetched_at', (
+            method, url, int(verify_ssl), status, json.dumps(headers), zlib.compress(body) if body is not None else None,
+            int(body is not None and complete), time.time()))
+
+    def touch(self, method: str, url: str, verify_ssl: bool) -> None:
+        """
+        renew the cached response after a 304 Not Modified response
+        """
+        self._connection.execute('UPDATE responses SET fetched_at = ? WHERE method = ? AND url = ? AND verify = ?',
+                                 (time.time(), method, url, int(verify_ssl)))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __repr__(self):
+        return 'HTTP cache: {0} hits, {1} revalidated, {2} requested'.format(self.hits, self.revalidated, self.misses)
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import zlib
+from functools import partial
+from typing import (Any, Callable, Dict, Iterable, List, Mapping, NamedTuple,
+                    Optional, Tuple)
+from urllib.parse import urlparse
+
+from multidict import CIMultiDict
+
+from utils.fetch import (BodyScanner, FetchEngine, FetchOptions, FetchResult,
+                         scan_body)
+
+# the bodies are kept up to this number of bytes, enough for the <html lang>
+# attribute of the pages and the license notes of most home pages
+DEFAULT_MAX_BODY = 1 << 20
+
+NOT_PROBED = 'URL not probed'
+
+
+class ProbeRequest(NamedTuple):
+    verify_ssl: bool = True
+    read_body: bool = False
+
+
+def get_https_uris(uris: Iterable[str]) -> List[str]:
+    """
+    the URIs with https:// scheme, to check their support for TLS
+    """
+    return [u.replace('http://', 'https://') for u in uris]
+
+
+def get_domain_roots(uris: Iterable[str]) -> List[str]:
+    """
+    the https:// home page of the domain of each URI
+    """
+    return ['https://' + urlparse(u).netloc for u in uris]
+
+
+def add_probe_requests(requests: Dict[Tuple[str, bool], ProbeRequest], urls: Iterable[str], verify_ssl: bool = True, read_body: bool = False) -> None:
+    """
+    add the URLs to the requests of the probe, keyed by the URL and whether
+    its certificate is verified. A URL needed by several metrics with the
+    same verification is requested once, reading its body if any of the
+    metrics needs it
+    """
+    for url in urls:
+        request = requests.get((url, verify_ssl))
+        requests[(url, verify_ssl)] = ProbeRequest(
+            verify_ssl, read_body or (request is not None and request.read_body))
+
+
+class ProbeStore:
+    """
+    the probe results of the external URIs in an SQLite database: status,
+    headers and a bounded prefix of the body of each URL, with and without
+    verifying its certificate. Like FetchEngine,
+    it returns the FetchResults of URLs, but without any network I/O
+    """
+    _connection: sqlite3.Connection
+    _pending: int = 0
+
+    def __init__(self, path: str, new: bool = False):
+        if new and os.path.exists(path):
+            os.remove(path)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS probes (url TEXT, verify_ssl INTEGER, status INTEGER, headers TEXT, body BLOB, error TEXT, '
+            'PRIMARY KEY (url, verify_ssl))')
+
+    def add(self, result: FetchResult, verify_ssl: bool = True) -> None:
+        self._connection.execute('INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)', (
+            result.url, verify_ssl, result.status, json.dumps(list(result.headers.items())),
+            zlib.compress(result.body) if result.body is not None else None, result.error))
+        self._pending += 1
+        if self._pending >= 1000:
+            self.commit()
+
+    def commit(self) -> None:
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM probes').fetchone()[0]
+
+    def get(self, url: str, verify_ssl: bool = True) -> FetchResult:
+        row = self._connection.execute(
+            'SELECT status, headers, body, error FROM probes WHERE url = ? AND verify_ssl = ?', (url, verify_ssl)).fetchone()
+        if row is None:
+            return FetchResult(url, error=NOT_PROBED)
+        status, headers, body, error = row
+        return FetchResult(url, status, CIMultiDict(json.loads(headers)),
+                           zlib.decompress(body) if body is not None else None, error)
+
+    def fetch_all(self, urls: Iterable[str], method: str = 'GET', read_body: bool = False, verify_ssl: bool = True,
+                  process: Optional[Callable[[FetchResult], Any]] = None, max_body: Optional[int] = None,
+                  scan: Optional[Callable[[Mapping[str, str]], BodyScanner]] = None) -> List[Any]:
+        """
+        the stored results of the URLs, in the same way of FetchEngine.fetch_all.
+        All URLs are probed with GET, so the results of HEAD requests are the
+        ones of GET requests
+        """
+        results = [self.get(url, verify_ssl) for url in urls]
+        if scan is not None:
+            results = [self._scan_result(i, scan, max_body) for i in results]
+        return [process(i) for i in results] if process is not None else results
+
+    def _scan_result(self, result: FetchResult, scan: Callable[[Mapping[str, str]], BodyScanner],
+                     max_body: Optional[int]) -> FetchResult:
+        if result.body is None:
+            return result
+        scanner = scan(result.headers)
+        scan_body(scanner, result.body[:max_body])
+        return result._replace(body=None, scanned=scanner.result)
+
+
+def probe_uris(requests: Dict[Tuple[str, bool], ProbeRequest], store: ProbeStore, options: Optional[FetchOptions] = None,
+               max_body: int = DEFAULT_MAX_BODY) -> None:
+    """
+    request each URL once and add its results to the store
+    """
+    engine = FetchEngine(options)
+    for verify_ssl in [True, False]:
+        for read_body in [True, False]:
+            urls = [url for (url, _), request in requests.items() if request ==
+                    (verify_ssl, read_body)]
+            if urls:
+                engine.fetch_all(urls, read_body=read_body, verify_ssl=verify_ssl,
+                                 process=partial(store.add, verify_ssl=verify_ssl), max_body=max_body)
+    store.commit()
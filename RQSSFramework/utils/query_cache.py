@@ -0,0 +1,97 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+
+# the cached results are used without any query for 30 days
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+# the string literals of a query, whose whitespaces are kept
+_STRING_PATTERN = re.compile(
+    r'"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^\'\\]|\\.|\'(?!\'\'))*\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """
+    the query with its whitespaces out of the string literals collapsed to
+    single spaces, so the queries formatted differently by the checkers are
+    cached once
+    """
+    parts = []
+    end = 0
+    for literal in _STRING_PATTERN.finditer(query):
+        parts.append(_WHITESPACE_PATTERN.sub(
+            ' ', query[end:literal.start()]))
+        parts.append(literal.group(0))
+        end = literal.end()
+    parts.append(_WHITESPACE_PATTERN.sub(' ', query[end:]))
+    return ''.join(parts).strip()
+
+
+def get_query_key(endpoint: str, query: str, result_format: str) -> str:
+    return hashlib.sha256('\n'.join([endpoint, result_format, normalize_query(query)]).encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    """
+    a persistent cache of the SPARQL results in an SQLite database, keyed by
+    the endpoint, the results format and the normalized query. The results
+    are used for ttl seconds. Several processes and threads can share the
+    cache, so each write is committed at once and does not keep the
+    database locked for the other processes
+    """
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+    _ttl: float
+    hits: int = 0
+    misses: int = 0
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL):
+        self._connection = sqlite3.connect(
+            path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, endpoint TEXT, query TEXT, body BLOB, fetched_at REAL)')
+        self._ttl = ttl
+
+    def get(self, endpoint: str, query: str, result_format: str) -> Optional[bytes]:
+        """
+        the body of the unexpired results of the query, None if it is not cached
+        """
+        key = get_query_key(endpoint, query, result_format)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT body, fetched_at FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None or time.time() - row[1] >= self._ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(row[0])
+
+    def put(self, endpoint: str, query: str, result_format: str, body: bytes) -> None:
+        row = (get_query_key(endpoint, query, result_format), endpoint,
+               normalize_query(query), zlib.compress(body), time.time())
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', row)
+
+    def invalidate(self, text: str = '') -> int:
+        """
+        remove the results of the queries that contain the text, all of them
+        by default, and return their number
+        """
+        with self._lock:
+            removed = self._connection.execute('DELETE FROM results WHERE instr(query, ?) > 0',
+                                               (normalize_query(text),)).rowcount
+        return removed
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __repr__(self):
+        return 'SPARQL cache: {0} hits, {1} queried'.format(self.hits, self.misses)
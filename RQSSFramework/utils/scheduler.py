@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+from multiprocessing.connection import wait
+from multiprocessing.context import Process
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+
+class JobResult(NamedTuple):
+    name: str
+    exit_code: int      # None if the job has been skipped
+    duration: float     # wall time in seconds
+
+    def __repr__(self):
+        if self.exit_code is None:
+            return "Job:{0:40}, Skipped".format(self.name)
+        return "Job:{0:40}, Exit code:{1}, Duration:{2:.2f}s".format(self.name, self.exit_code, self.duration)
+
+
+class Job(NamedTuple):
+    name: str
+    target: Callable
+    args: Tuple = ()
+    inputs: Tuple[str, ...] = ()    # files the job reads
+    outputs: Tuple[str, ...] = ()   # files the job writes
+    resource: str = None            # e.g., the endpoint the job queries
+
+
+def _run_job(target: Callable, args: Tuple) -> None:
+    # the return value of the job function is the exit code of the process
+    sys.exit(target(*args))
+
+
+class JobScheduler:
+    """
+    run the added jobs in separate processes, keeping at most max_workers
+    of them running at the same time. A job that reads a file written by
+    another added job starts only after that job has successfully finished.
+    The number of running jobs that use the same resource is also limited
+    by resource_limits
+    """
+    _jobs: List[Job]
+    _max_workers: int
+    _resource_limits: Dict[str, int]
+    results: List[JobResult] = None
+
+    def __init__(self, max_workers: Optional[int] = None, resource_limits: Optional[Dict[str, int]] = None):
+        self._jobs = []
+        self._max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self._resource_limits = {
+            resource: max(1, limit) for resource, limit in (resource_limits or {}).items()}
+
+    def add_job(self, name: str, target: Callable, *args, inputs: Tuple[str, ...] = (), outputs: Tuple[str, ...] = (), resource: Optional[str] = None) -> None:
+        self._jobs.append(Job(name, target, args, tuple(
+            inputs), tuple(outputs), resource))
+
+    def _is_resource_available(self, resource: Optional[str], running_resources: List[str]) -> bool:
+        if resource is None or resource not in self._resource_limits:
+            return True
+        return running_resources.count(resource) < self._resource_limits[resource]
+
+    def get_requirements(self) -> List[Set[int]]:
+        """
+        compute the indexes of the jobs that each job depends on
+        """
+        producers: Dict[str, int] = {}
+        for index, job in enumerate(self._jobs):
+            for output in job.outputs:
+                producers[os.path.abspath(output)] = index
+        requirements = []
+        for index, job in enumerate(self._jobs):
+            required = set()
+            for input in job.inputs:
+                producer = producers.get(os.path.abspath(input))
+                if producer is not None and producer != index:
+                    required.add(producer)
+            requirements.append(required)
+        return requirements
+
+    def run(self) -> List[JobResult]:
+        requirements = self.get_requirements()
+        pending = list(range(len(self._jobs)))
+        running = {}
+        finished: Dict[int, JobResult] = {}
+        while pending or running:
+            for index in list(pending):
+                if any(finished[i].exit_code != 0 for i in requirements[index] if i in finished):
+                    pending.remove(index)
+                    finished[index] = JobResult(
+                        self._jobs[index].name, None, 0.0)
+                    print('Skipped job {0}: a required job failed'.format(
+                        self._jobs[index].name))
+                    continue
+                job = self._jobs[index]
+                if len(running) >= self._max_workers or not requirements[index].issubset(finished.keys()):
+                    continue
+                if not self._is_resource_available(job.resource, [self._jobs[i[0]].resource for i in running.values()]):
+                    continue
+                pending.remove(index)
+                proc = Process(target=_run_job, args=(
+                    job.target, job.args), name=job.name)
+                proc.start()
+                running[proc.sentinel] = (index, proc, time.perf_counter())
+            if not running:
+                # remaining jobs depend on each other in a cycle
+                for index in pending:
+                    finished[index] = JobResult(
+                        self._jobs[index].name, None, 0.0)
+                    print('Skipped job {0}: circular job requirements'.format(
+                        self._jobs[index].name))
+                break
+            for sentinel in wait(list(running.keys())):
+                index, proc, start_time = running.pop(sentinel)
+                proc.join()
+                finished[index] = JobResult(
+                    self._jobs[index].name, proc.exitcode, time.perf_counter() - start_time)
+        # keep the results in the order the jobs have been added
+        self.results = [finished[i] for i in range(len(self._jobs))]
+        return self.results
+
+    @property
+    def failed(self) -> List[JobResult]:
+        if self.results is not None:
+            return [i for i in self.results if i.exit_code != 0]
+        return None
+
+    def __repr__(self):
+        if self.results == None:
+            return 'Results are not computed'
+        return """job,exit code,duration (s)
+{0}""".format('\n'.join('{0},{1},{2:.2f}'.format(i.name, '<None>' if i.exit_code is None else i.exit_code, i.duration) for i in self.results))
+
+    def print_results(self):
+        """
+        print self.results if it is already computed
+        """
+        if self.results == None:
+            print('Results are not computed')
+            return
+        for r in self.results:
+            print(r)
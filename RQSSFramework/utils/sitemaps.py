@@ -0,0 +1,322 @@
+import io
+import sqlite3
+import zlib
+from typing import (Dict, Iterable, Iterator, List, NamedTuple, Optional, Set,
+                    Tuple)
+from urllib.parse import urljoin, urlparse, urlunparse
+
+from lxml import etree
+
+from utils.fetch import FetchEngine, FetchOptions, FetchResult
+
+# the sitemaps are at most 50 MB uncompressed, according to sitemaps.org
+DEFAULT_SITEMAP_MAX_BODY = 50 << 20
+
+# the sitemap indexes are followed up to this depth
+MAX_SITEMAP_DEPTH = 5
+
+# the common paths of the sitemaps of the domains whose robots.txt lists none
+KNOWN_SITEMAP_PATHS = ['sitemap.xml', 'sitemap_index.xml',
+                       'sitemap-index.xml', 'sitemap.xml.gz', 'sitemap_index.xml.gz']
+
+# the statuses of the sitemaps which are removed with their pages, the
+# sitemaps which fail otherwise keep their pages until they are received
+DROPPED_SITEMAP_STATUSES = (404, 410)
+
+# the start of the URLs embedded in the page URLs, like the archived or redirected URLs
+EMBEDDED_URL_ANCHOR = 'http'
+
+# the version of the tables of the sitemap index, the older indexes are harvested again
+_INDEX_VERSION = 2
+
+
+def normalize_page_url(url: str) -> str:
+    """
+    the URL with lowercased scheme and host and without its fragment
+    """
+    url = url.strip()
+    parsed = urlparse(url)
+    return urlunparse(parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower(), fragment=''))
+
+
+class SitemapRequest(NamedTuple):
+    url: str
+    domain: str
+    parent: Optional[str] = None    # the sitemap index which lists the sitemap
+    lastmod: Optional[str] = None   # the <lastmod> of the sitemap in its index
+
+
+def _get_upper_bound(prefix: str) -> str:
+    """
+    the least string greater than all strings which start with the prefix
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SitemapIndex:
+    """
+    the pages of the harvested sitemaps in an SQLite database, keyed by
+    the domain, the sitemap and the normalized URL of the pages. Each
+    harvested sitemap is kept with its <lastmod>, so it is downloaded again
+    only when its <lastmod> changes. A page listed in several sitemaps is
+    kept in each of them, and the pages are looked up in the order of the
+    sitemap URLs, so the first page found does not depend on the order of
+    the harvests.
+
+    The pages which contain a URL are found with range queries over the
+    ordered pages: the pages which start with the URL, and the suffixes of
+    the pages from each of their embedded http(s) URLs which start with it
+    """
+    _connection: sqlite3.Connection
+    _pending: int = 0
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] != _INDEX_VERSION:
+            for table in ['sitemaps', 'pages', 'suffixes']:
+                self._connection.execute('DROP TABLE IF EXISTS ' + table)
+            self._connection.execute(
+                'PRAGMA user_version = {0}'.format(_INDEX_VERSION))
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS sitemaps (domain TEXT, url TEXT, parent TEXT, lastmod TEXT, PRIMARY KEY (domain, url))')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS pages (domain TEXT, key TEXT, page TEXT, change_frequency TEXT, '
+                                 'sitemap TEXT, UNIQUE (domain, sitemap, key))')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS pages_of_sitemap ON pages (domain, sitemap)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS pages_of_domain ON pages (domain, page)')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS suffixes (domain TEXT, sitemap TEXT, suffix TEXT, page INTEGER)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS suffixes_of_sitemap ON suffixes (domain, sitemap)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS suffixes_of_domain ON suffixes (domain, suffix)')
+        self._connection.commit()
+
+    def is_unchanged(self, request: SitemapRequest) -> bool:
+        """
+        whether the sitemap is harvested with the same <lastmod>
+        """
+        if request.lastmod is None:
+            return False
+        row = self._connection.execute(
+            'SELECT lastmod FROM sitemaps WHERE domain = ? AND url = ?', (request.domain, request.url)).fetchone()
+        return row is not None and row[0] == request.lastmod
+
+    def get_subtree(self, domain: str, url: str) -> List[str]:
+        """
+        the sitemap and the sitemaps listed under it
+        """
+        return [i[0] for i in self._connection.execute(
+            'WITH RECURSIVE subtree(url) AS (VALUES(?) UNION SELECT sitemaps.url FROM sitemaps JOIN subtree ON sitemaps.parent = subtree.url '
+            'WHERE sitemaps.domain = ?) SELECT url FROM subtree', (url, domain))]
+
+    def put_sitemap(self, request: SitemapRequest, pages: Iterable[Tuple[str, Optional[str]]]) -> None:
+        """
+        replace the pages of the sitemap with the (page URL, change frequency) pages
+        """
+        self._remove_pages(request.domain, request.url)
+        self._connection.execute('INSERT OR REPLACE INTO sitemaps VALUES (?, ?, ?, ?)',
+                                 (request.domain, request.url, request.parent, request.lastmod))
+        for page, change_frequency in pages:
+            cursor = self._connection.execute('INSERT OR IGNORE INTO pages VALUES (?, ?, ?, ?, ?)', (
+                request.domain, normalize_page_url(page), page, change_frequency, request.url))
+            if cursor.rowcount == 1:
+                start = page.find(EMBEDDED_URL_ANCHOR, 1)
+                while start != -1:
+                    self._connection.execute('INSERT INTO suffixes VALUES (?, ?, ?, ?)', (
+                        request.domain, request.url, page[start:], cursor.lastrowid))
+                    start = page.find(EMBEDDED_URL_ANCHOR, start + 1)
+            self._pending += 1
+            if self._pending >= 10000:
+                self.commit()
+
+    def get_roots(self, domain: str) -> List[str]:
+        """
+        the harvested sitemaps of the domain which are not listed by a sitemap index
+        """
+        return [i[0] for i in self._connection.execute(
+            'SELECT url FROM sitemaps WHERE domain = ? AND parent IS NULL ORDER BY url', (domain,))]
+
+    def remove_other_sitemaps(self, domain: str, kept: Set[str]) -> None:
+        """
+        remove the sitemaps of the domain which are not listed anymore
+        """
+        removed = [i[0] for i in self._connection.execute(
+            'SELECT url FROM sitemaps WHERE domain = ?', (domain,)) if i[0] not in kept]
+        for url in removed:
+            self._remove_pages(domain, url)
+            self._connection.execute(
+                'DELETE FROM sitemaps WHERE domain = ? AND url = ?', (domain, url))
+
+    def _remove_pages(self, domain: str, sitemap: str) -> None:
+        self._connection.execute(
+            'DELETE FROM pages WHERE domain = ? AND sitemap = ?', (domain, sitemap))
+        self._connection.execute(
+            'DELETE FROM suffixes WHERE domain = ? AND sitemap = ?', (domain, sitemap))
+
+    def get_pages(self, domain: str) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        the (page URL, change frequency) pages of the domain, in the order of
+        their sitemap URLs and then of their sitemap. A page listed in several
+        sitemaps is returned once for each of them
+        """
+        return self._connection.execute(
+            'SELECT page, change_frequency FROM pages WHERE domain = ? ORDER BY sitemap, rowid', (domain,))
+
+    def can_find_page(self, uri: str) -> bool:
+        """
+        whether the pages which contain the URI are found by find_page
+        """
+        return uri.startswith(EMBEDDED_URL_ANCHOR)
+
+    def find_page(self, domain: str, uri: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        the first (page URL, change frequency) page of the domain, in the order
+        of get_pages, which contains the URI. The URI must be accepted by
+        can_find_page
+        """
+        upper_bound = _get_upper_bound(uri)
+        return self._connection.execute(
+            'SELECT page, change_frequency FROM pages WHERE rowid = (SELECT id FROM ('
+            'SELECT sitemap, rowid AS id FROM pages WHERE domain = ? AND page >= ? AND page < ? UNION ALL '
+            'SELECT sitemap, page FROM suffixes WHERE domain = ? AND suffix >= ? AND suffix < ?) '
+            'ORDER BY sitemap, id LIMIT 1)',
+            (domain, uri, upper_bound, domain, uri, upper_bound)).fetchone()
+
+    def count_pages(self, domain: str) -> int:
+        return self._connection.execute('SELECT COUNT(DISTINCT key) FROM pages WHERE domain = ?', (domain,)).fetchone()[0]
+
+    def commit(self) -> None:
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+
+def _decompress(body: bytes, max_body: int) -> bytes:
+    if not body.startswith(b'\x1f\x8b'):
+        return body
+    decompressor = zlib.decompressobj(wbits=31)
+    return decompressor.decompress(body, max_body)
+
+
+def parse_sitemap(body: bytes) -> Tuple[List[Tuple[str, Optional[str]]], List[Tuple[str, Optional[str]]]]:
+    """
+    the (page URL, change frequency) pages of a <urlset> sitemap and the
+    (sitemap URL, lastmod) sitemaps of a <sitemapindex> sitemap. The elements
+    are dropped as soon as they are read
+    """
+    pages, sitemaps = [], []
+    for _, element in etree.iterparse(io.BytesIO(body), events=('end',), recover=True, huge_tree=True,
+                                      resolve_entities=False, no_network=True):
+        if not isinstance(element.tag, str):
+            continue
+        tag = etree.QName(element).localname
+        if tag == 'url':
+            loc = element.findtext('{*}loc')
+            if loc:
+                change_frequency = element.findtext('{*}changefreq')
+                pages.append((loc.strip(), change_frequency.strip().lower() if change_frequency else None))
+        elif tag == 'sitemap':
+            loc = element.findtext('{*}loc')
+            if loc:
+                lastmod = element.findtext('{*}lastmod')
+                sitemaps.append((loc.strip(), lastmod.strip() if lastmod else None))
+        else:
+            continue
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    return pages, sitemaps
+
+
+def get_robots_sitemaps(robots: FetchResult) -> Optional[List[str]]:
+    """
+    the sitemaps listed in the robots.txt, None if the robots.txt cannot be
+    received (a failed request or a server error)
+    """
+    if robots.status is None or robots.status == 429 or robots.status >= 500:
+        return None
+    if not robots.ok:
+        return []
+    ret_val = []
+    for line in robots.text().splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            ret_val.append(urljoin(robots.url, value.strip()))
+    return ret_val
+
+
+def harvest_sitemaps(domains: Iterable[str], index: SitemapIndex, options: Optional[FetchOptions] = None,
+                     max_body: int = DEFAULT_SITEMAP_MAX_BODY, max_depth: int = MAX_SITEMAP_DEPTH) -> None:
+    """
+    add the pages of the sitemaps of the domains to the index. The sitemaps
+    of all domains are requested concurrently, level by level of their
+    sitemap indexes, and each one is parsed as soon as it is received. A
+    listed sitemap whose <lastmod> is not changed since its last harvest is
+    not requested again, nor the sitemaps under it. The pages of a sitemap
+    are removed only when it is not listed anymore or it is not found (404
+    or 410); the sitemaps which fail otherwise keep their pages
+    """
+    domains = list(dict.fromkeys(domains))
+    engine = FetchEngine(options)
+    print('\tGetting the robots.txt of {0} domains ...'.format(len(domains)))
+    robots_sitemaps = engine.fetch_all([d + '/robots.txt' for d in domains], read_body=True,
+                                       max_body=1 << 20, process=get_robots_sitemaps)
+    requests = []
+    for domain, sitemaps in zip(domains, robots_sitemaps):
+        if sitemaps is None:
+            # the harvested sitemaps are requested again when robots.txt fails
+            sitemaps = index.get_roots(domain)
+        # the known paths are tried when robots.txt lists no sitemap
+        sitemaps = sitemaps or [domain + '/' + i for i in KNOWN_SITEMAP_PATHS]
+        requests.extend(SitemapRequest(url, domain)
+                        for url in dict.fromkeys(sitemaps))
+    # the harvested or unchanged sitemaps of each domain
+    kept: Dict[str, Set[str]] = {d: set() for d in domains}
+    requests_of_url: Dict[str, List[SitemapRequest]] = {}
+
+    def put_sitemap(response: FetchResult) -> List[SitemapRequest]:
+        pages, sitemaps = [], []
+        if response.ok:
+            try:
+                pages, sitemaps = parse_sitemap(
+                    _decompress(response.body, max_body))
+            except (etree.LxmlError, zlib.error) as e:
+                print('\t\t ERROR in parsing sitemap: ', response.url, e)
+        elif response.error is not None:
+            print('\t\t ERROR in getting sitemap: ', response.url, response.error)
+        children = []
+        for request in requests_of_url[response.url]:
+            if pages or sitemaps:
+                index.put_sitemap(request, pages)
+                kept[request.domain].add(request.url)
+                children.extend(SitemapRequest(url, request.domain, request.url, lastmod)
+                                for url, lastmod in sitemaps)
+            elif response.status not in DROPPED_SITEMAP_STATUSES:
+                # the pages of a listed sitemap are kept until it is received again
+                kept[request.domain].update(index.get_subtree(request.domain, request.url))
+        return children
+
+    depth = 0
+    while requests and depth <= max_depth:
+        for request in requests:
+            if index.is_unchanged(request):
+                kept[request.domain].update(index.get_subtree(request.domain, request.url))
+        requests_of_url = {}
+        for request in requests:
+            if request.url not in kept[request.domain]:
+                requests_of_url.setdefault(request.url, []).append(request)
+        print('\tGetting {0} sitemaps of depth {1} ...'.format(len(requests_of_url), depth))
+        children = engine.fetch_all(requests_of_url.keys(), read_body=True,
+                                    max_body=max_body, process=put_sitemap)
+        index.commit()
+        # a sitemap listed twice is harvested once
+        requests = list({(i.url, i.domain): i for i in sum(children, [])}.values())
+        depth += 1
+    for domain, sitemaps in kept.items():
+        index.remove_other_sitemaps(domain, sitemaps)
+    index.commit()
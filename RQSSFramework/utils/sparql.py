@@ -0,0 +1,496 @@
+import csv
+import io
+import json
+import multiprocessing
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from utils.query_cache import QueryCache
+
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# the accepted SPARQL results formats and their media types
+RESULT_FORMATS = {
+    'json': 'application/sparql-results+json',
+    'csv': 'text/csv',
+    'tsv': 'text/tab-separated-values',
+}
+
+_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r',
+            'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+_ESCAPE_PATTERN = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+
+
+def get_user_agent() -> str:
+    return "RQSSFramework Python/%s.%s" % (sys.version_info[0], sys.version_info[1])
+
+
+def _unescape(match: re.Match) -> str:
+    escape = match.group(1)
+    if escape[0] in 'uU' and len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return _ESCAPES.get(escape, escape)
+
+
+def unescape_string(lexical: str) -> str:
+    """
+    replace the escape sequences of a Turtle/N-Triples string
+    """
+    return _ESCAPE_PATTERN.sub(_unescape, lexical) if '\\' in lexical else lexical
+
+
+def decode_tsv_term(term: str) -> Optional[str]:
+    """
+    get the value of a term of the SPARQL TSV results, which are written in
+    the Turtle syntax. The value is the same as the 'value' of a JSON
+    binding; None for unbound variables
+    """
+    if term == '':
+        return None
+    if term[0] == '<' and term[-1] == '>':
+        return term[1:-1]
+    if term[0] == '"':
+        # the lexical form is quoted, followed by an optional @lang or ^^<datatype>
+        end = term.rfind('"')
+        if term.startswith('"""') and end >= 3:
+            lexical = term[3:end - 2]
+        else:
+            lexical = term[1:end]
+        return unescape_string(lexical)
+    if term.startswith('_:'):
+        return term[2:]
+    # numbers and booleans in the Turtle abbreviated forms
+    return term
+
+
+def _json_term(binding: Dict[str, str]) -> str:
+    if binding['type'] == 'bnode':
+        return '_:' + binding['value']
+    if binding['type'] in ('literal', 'typed-literal'):
+        return '"' + binding['value']
+    return binding['value']
+
+
+def _tsv_term(term: str) -> Optional[str]:
+    value = decode_tsv_term(term)
+    if value is None or term[0] == '<':
+        return value
+    if term.startswith('_:'):
+        return term
+    return '"' + value
+
+
+def _iter_results(response: requests.Response, result_format: str, terms: bool = False) -> Iterator[List[Optional[str]]]:
+    """
+    yield the variables of the results and then the values of each result
+    row, None for unbound variables. If terms, the values are the terms
+    (see iter_query_terms)
+    """
+    if result_format == 'json':
+        results = response.json()
+        variables = results['head']['vars']
+        yield variables
+        for binding in results['results']['bindings']:
+            yield [(_json_term(binding[var]) if terms else binding[var]['value']) if var in binding else None for var in variables]
+        return
+
+    response.raw.decode_content = True
+    # keeping the raw response open at its end, as it is wrapped in a text stream
+    response.raw.auto_close = False
+    stream = io.TextIOWrapper(response.raw, encoding='utf-8', newline='')
+    if result_format == 'csv':
+        reader = csv.reader(stream)
+        yield next(reader, [])
+        for row in reader:
+            # blank nodes are written as _:label, like in TSV results
+            yield [None if value == '' else value[2:] if value.startswith('_:') else value for value in row]
+        return
+
+    header = stream.readline().rstrip('\r\n')
+    yield [var[1:] if var.startswith('?') else var for var in header.split('\t')] if header else []
+    for line in stream:
+        line = line.rstrip('\r\n')
+        yield [_tsv_term(term) if terms else decode_tsv_term(term) for term in line.split('\t')]
+
+
+# the responses of a throttled or overloaded endpoint, which are requested again
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# the queries in flight of each endpoint: a few for WDQS, which throttles
+# the clients sending many queries at once, and more for the other
+# endpoints, e.g., a local mirror
+WIKIDATA_CONCURRENCY = 5
+DEFAULT_CONCURRENCY = 32
+
+# the errors of unknown hosts, which are not retried (not defined before urllib3 2)
+_NAME_RESOLUTION_ERRORS = getattr(
+    urllib3.exceptions, 'NameResolutionError', ())
+
+
+class RateLimiter:
+    """
+    space the queries by 1/rate seconds, and keep at most concurrency
+    queries in flight. The limiter can be shared by the processes of the
+    metrics, so the rate and the concurrency are of all of them together
+    """
+    _interval: float
+    _next_query: multiprocessing.Value
+    concurrency: Optional[int]
+    _slots: Optional[multiprocessing.BoundedSemaphore] = None
+
+    def __init__(self, rate: Optional[float] = None, concurrency: Optional[int] = None):
+        self._interval = 1 / rate if rate else 0
+        self._next_query = multiprocessing.Value('d', 0.0)
+        self.concurrency = max(1, concurrency) if concurrency else None
+        if self.concurrency is not None:
+            self._slots = multiprocessing.BoundedSemaphore(self.concurrency)
+
+    def slot(self):
+        """
+        the context of a query in flight, which waits for a free slot if the
+        concurrency is limited
+        """
+        return self._slots if self._slots is not None else nullcontext()
+
+    def wait(self) -> None:
+        """
+        wait for the time slot of the next query
+        """
+        with self._next_query.get_lock():
+            now = time.time()
+            start = max(now, self._next_query.value)
+            self._next_query.value = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+    def pause(self, seconds: float) -> None:
+        """
+        delay all of the next queries, e.g., for the Retry-After of a throttled query
+        """
+        with self._next_query.get_lock():
+            self._next_query.value = max(
+                self._next_query.value, time.time() + seconds)
+
+
+def get_retry_after(response: requests.Response) -> Optional[float]:
+    """
+    the seconds of the Retry-After header of the response, None if it is not given
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_body_response(body: bytes, result_format: str) -> requests.Response:
+    """
+    a response of the received or cached results, read like a streamed response
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = RESULT_FORMATS[result_format]
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def _is_host_unknown(error: requests.RequestException) -> bool:
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, _NAME_RESOLUTION_ERRORS)
+
+
+def get_default_concurrency(endpoint: str) -> int:
+    """
+    the queries in flight of the endpoint, WIKIDATA_CONCURRENCY for WDQS
+    and DEFAULT_CONCURRENCY for the other endpoints
+    """
+    return WIKIDATA_CONCURRENCY if endpoint == WIKIDATA_ENDPOINT else DEFAULT_CONCURRENCY
+
+
+class SPARQLClient:
+    """
+    perform the queries over a pool of keep-alive connections. The queries
+    that fail with a connection error (but an unknown host) or a
+    throttled/overloaded response are retried up to max_retries times,
+    waiting backoff * 2^n seconds, or the Retry-After of the response if it
+    is longer. The queries of WIKIDATA_ENDPOINT are sent to
+    wikidata_endpoint, e.g., a local mirror. With a cache, the cached
+    results are read from the cache, and the other results are received
+    whole and added to the cache. With a limiter of the concurrency, the
+    results are also received whole, so the query keeps its slot until its
+    results are read. The client can be used by several threads, see
+    map_queries
+    """
+    wikidata_endpoint: str
+    cache: Optional[QueryCache] = None
+    _max_retries: int
+    _backoff: float
+    _max_backoff: float
+    _limiter: RateLimiter
+    _concurrency: Optional[int]
+    _session: requests.Session
+    _lock: threading.Lock
+    queries: int = 0
+    retried: int = 0
+    failed: int = 0
+
+    def __init__(self, wikidata_endpoint: str = WIKIDATA_ENDPOINT, max_retries: int = 5, backoff: float = 1,
+                 max_backoff: float = 300, limiter: Optional[RateLimiter] = None, cache: Optional[QueryCache] = None,
+                 concurrency: Optional[int] = None):
+        self.wikidata_endpoint = wikidata_endpoint
+        self.cache = cache
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._limiter = limiter if limiter is not None else RateLimiter()
+        self._concurrency = concurrency
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = get_user_agent()
+        # a connection for each query in flight
+        pool_size = max(concurrency or 0, DEFAULT_CONCURRENCY)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def get_concurrency(self, endpoint: str) -> int:
+        """
+        the number of queries in flight of the endpoint, the one of the
+        options, or WIKIDATA_CONCURRENCY for WDQS and DEFAULT_CONCURRENCY
+        for the other endpoints
+        """
+        if endpoint == WIKIDATA_ENDPOINT:
+            endpoint = self.wikidata_endpoint
+        if self._concurrency is not None:
+            return max(1, self._concurrency)
+        return get_default_concurrency(endpoint)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _get_cached(self, endpoint: str, query: str, result_format: str) -> Optional[bytes]:
+        """
+        the cached results of the query, None if they are not cached or the
+        cache cannot be read, so the query is sent to the endpoint
+        """
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(endpoint, query, result_format)
+        except sqlite3.Error as e:
+            print('\t\t ERROR in reading the SPARQL cache: ', e)
+            return None
+
+    def _put_cached(self, endpoint: str, query: str, result_format: str, body: bytes) -> None:
+        try:
+            self.cache.put(endpoint, query, result_format, body)
+        except sqlite3.Error as e:
+            print('\t\t ERROR in writing the SPARQL cache: ', e)
+
+    def post(self, endpoint: str, query: str, result_format: str, timeout: Optional[float] = None) -> requests.Response:
+        """
+        the streamed response of the query. Raise the exception of the last
+        try if all of them fail
+        """
+        if endpoint == WIKIDATA_ENDPOINT:
+            endpoint = self.wikidata_endpoint
+        body = self._get_cached(endpoint, query, result_format)
+        if body is not None:
+            return _get_body_response(body, result_format)
+        self._count('queries')
+        for retry in range(self._max_retries + 1):
+            self._limiter.wait()
+            wait = min(self._backoff * 2 ** retry, self._max_backoff)
+            try:
+                with self._limiter.slot():
+                    response = self._session.post(endpoint, data={'query': query}, headers={
+                        'Accept': RESULT_FORMATS[result_format]}, stream=True, timeout=timeout)
+                    if response.status_code not in RETRY_STATUSES or retry == self._max_retries:
+                        response.raise_for_status()
+                        if self.cache is None and self._limiter.concurrency is None:
+                            return response
+                        with response:
+                            body = response.content
+                        if self.cache is not None:
+                            self._put_cached(endpoint, query, result_format, body)
+                        return _get_body_response(body, result_format)
+                    retry_after = get_retry_after(response)
+                    response.close()
+                if retry_after is not None:
+                    wait = min(max(wait, retry_after), self._max_backoff)
+                    # the endpoint throttles all of the clients
+                    self._limiter.pause(wait)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if retry == self._max_retries or _is_host_unknown(e):
+                    self._count('failed')
+                    raise
+            except requests.RequestException:
+                self._count('failed')
+                raise
+            self._count('retried')
+            time.sleep(wait)
+
+    def close(self) -> None:
+        self._session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __repr__(self):
+        return 'SPARQL client: {0} queries, {1} retried, {2} failed'.format(self.queries, self.retried, self.failed)
+
+
+_client: Optional[SPARQLClient] = None
+
+
+def get_client() -> SPARQLClient:
+    """
+    the shared client of the queries of this process
+    """
+    global _client
+    if _client is None:
+        _client = SPARQLClient()
+    return _client
+
+
+def set_client(client: SPARQLClient) -> None:
+    """
+    replace the shared client, e.g., with the endpoint and rate limit of the options
+    """
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = client
+
+
+def map_queries(function: Callable[[Any], Any], items: Iterable[Any], endpoint: str = WIKIDATA_ENDPOINT) -> List[Any]:
+    """
+    call the function, which queries the endpoint, for each item in a pool
+    of threads, keeping the concurrency of the endpoint (see
+    SPARQLClient.get_concurrency) of queries in flight. The queries in
+    flight of all of the processes are limited by the RateLimiter of their
+    clients. The results are in the order of the items
+    """
+    with ThreadPoolExecutor(get_client().get_concurrency(endpoint)) as executor:
+        return list(executor.map(function, items))
+
+
+def _request_results(endpoint: str, query: str, result_format: str, timeout: Optional[float]) -> requests.Response:
+    if result_format not in RESULT_FORMATS:
+        raise ValueError('Unknown SPARQL results format: {0}'.format(
+            result_format))
+    return get_client().post(endpoint, query, result_format, timeout)
+
+
+def iter_query_rows(endpoint: str, query: str, result_format: str = 'tsv', timeout: Optional[float] = None) -> Iterator[List[str]]:
+    """
+    perform the query and yield the bound values of each result row as soon
+    as it is received. Like the JSON bindings, the unbound variables are
+    skipped; in CSV results unbound variables and empty literals are not
+    distinguishable and both are skipped
+    """
+    with _request_results(endpoint, query, result_format, timeout) as response:
+        results = _iter_results(response, result_format)
+        next(results, None)
+        for row in results:
+            yield [value for value in row if value is not None]
+
+
+def get_query_values(endpoint: str, query: str, variable: str = 'to_ret', result_format: str = 'tsv', timeout: Optional[float] = None) -> List[str]:
+    """
+    perform the query and return the bound values of the variable
+    """
+    with _request_results(endpoint, query, result_format, timeout) as response:
+        results = _iter_results(response, result_format)
+        variables = next(results, [])
+        if variable not in variables:
+            return []
+        index = variables.index(variable)
+        return [row[index] for row in results if len(row) > index and row[index] is not None]
+
+
+def iter_query_terms(endpoint: str, query: str, result_format: str = 'tsv', timeout: Optional[float] = None) -> Iterator[List[Optional[str]]]:
+    """
+    perform the query and yield the terms of each result row in the order
+    of the variables, None for unbound variables. IRIs are their values,
+    blank nodes are _:label and literals are '"' + their lexical form.
+    The CSV results are not supported
+    """
+    if result_format == 'csv':
+        raise ValueError(
+            'The CSV results do not distinguish IRIs, blank nodes and literals')
+    with _request_results(endpoint, query, result_format, timeout) as response:
+        results = _iter_results(response, result_format, True)
+        next(results, None)
+        yield from results
+
+
+# the number of the entities of each VALUES clause of the batched queries
+DEFAULT_BATCH_SIZE = 200
+
+_ENTITY_ID_PATTERN = re.compile(r'^[PQL][1-9][0-9]*$')
+
+
+def get_batched_query_values(batch_query: str, single_query: str, entity_ids: Iterable[str], endpoint: str = WIKIDATA_ENDPOINT,
+                             batch_size: int = DEFAULT_BATCH_SIZE, variable: str = 'to_ret', timeout: Optional[float] = None) -> Dict[str, Optional[List[str]]]:
+    """
+    the bound values of the variable for each Wikidata entity ID. The IDs
+    are queried in batches with batch_query, formatted with the wd: IRIs of
+    its VALUES ?entity clause, and the results are grouped by ?entity. The
+    IDs of a failed batch, and the IDs which are not entity IDs, are queried
+    one by one with single_query formatted with the ID; their values are None
+    if their query fails
+    """
+    entity_ids = list(dict.fromkeys(str(i) for i in entity_ids))
+    ret_val: Dict[str, Optional[List[str]]] = {}
+    singles = [i for i in entity_ids if not _ENTITY_ID_PATTERN.match(i)]
+    batchable = [i for i in entity_ids if _ENTITY_ID_PATTERN.match(i)]
+    for start in range(0, len(batchable), batch_size):
+        batch = batchable[start:start + batch_size]
+        query = batch_query.format(' '.join('wd:' + i for i in batch))
+        try:
+            values = {i: [] for i in batch}
+            with _request_results(endpoint, query, 'json', timeout) as response:
+                results = _iter_results(response, 'json')
+                variables = next(results, [])
+                entity_index, index = variables.index('entity'), variables.index(variable)
+                for row in results:
+                    entity_id = row[entity_index].rsplit('/', 1)[-1] if row[entity_index] is not None else None
+                    if entity_id in values and row[index] is not None:
+                        values[entity_id].append(row[index])
+            ret_val.update(values)
+        except Exception as e:
+            print('\t\t ERROR: batch of {0} entities failed, querying them one by one: {1}'.format(len(batch), e))
+            singles.extend(batch)
+    for entity_id in singles:
+        try:
+            ret_val[entity_id] = get_query_values(
+                endpoint, single_query.format(entity_id), variable, 'json', timeout)
+        except Exception as e:
+            print('\t\t ERROR: ', e)
+            ret_val[entity_id] = None
+    return {i: ret_val[i] for i in entity_ids}
+
+
+def get_count_value(values: Optional[List[str]]) -> int:
+    """
+    the count returned by a COUNT query, 0 if the query failed or the count
+    is not a number
+    """
+    return int(values[-1]) if values and values[-1].isdigit() else 0
@@ -5,8 +5,10 @@ from typing import Dict, List, Optional, Union
 
 import pandas as pd
 from matplotlib import pyplot as plt
-#from Queries import RQSS_QUERIES
-from SPARQLWrapper import JSON, SPARQLWrapper
+from Queries import RQSS_QUERIES
+from utils.query_cache import QueryCache
+from utils.sparql import (WIKIDATA_ENDPOINT, RateLimiter, SPARQLClient,
+                          get_client, get_query_values, set_client)
 
 # input: Qids list of items Q-ids (rdf:type item)
 # output: topic coverage pie chart (like Wikdiata statistics https://www.wikidata.org/wiki/Wikidata:Statistics)
@@ -15,6 +17,10 @@ def genargs(prog: Optional[str] = None) -> ArgumentParser:
     parser = ArgumentParser(prog)
     parser.add_argument("--qids", help="Input file of items of the subset", required=True)
     parser.add_argument("--output", help="Where to save the chart", required=True)
+    parser.add_argument("--wikidata-endpoint", help="The SPARQL endpoint of Wikidata, e.g., a local mirror. The default is WDQS", default=WIKIDATA_ENDPOINT)
+    parser.add_argument("--sparql-rate", help="Maximum number of queries per second. No limit by default", type=float)
+    parser.add_argument("--sparql-cache", help="The SQLite file of the cached query results, e.g., the --sparql-cache of the Framework Runner. No cache by default")
+    parser.add_argument("--sparql-cache-ttl", help="Days a cached query result is used. The default is 30", type=float, default=30)
     return parser
 
 def main(argv: Optional[Union[str, List[str]]] = None, prog: Optional[str] = None) -> int:
@@ -28,12 +34,18 @@ def main(argv: Optional[Union[str, List[str]]] = None, prog: Optional[str] = Non
         return 1
     with open(opts.qids) as file:
         QIDs = file.read().splitlines()
+    cache = QueryCache(opts.sparql_cache, opts.sparql_cache_ttl * 24 * 60 * 60) if opts.sparql_cache else None
+    set_client(SPARQLClient(opts.wikidata_endpoint, limiter=RateLimiter(opts.sparql_rate), cache=cache))
     
     # keys are QIDs, values are list of classess
     print('Getting instances-subclassses of items...')
     QID_class_dict = Dict.fromkeys(QIDs)
     for q in QID_class_dict.keys():
         QID_class_dict[q] = set(get_instances_subclass_of_values_from_Wikidata(q))
+    print(get_client())
+    if cache is not None:
+        print(cache)
+    get_client().close()
 
     print('Fetching distinct classes ...')
     distinct_classes = set.union(*[set(value) for key, value in QID_class_dict.items()])
@@ -79,24 +91,9 @@ def main(argv: Optional[Union[str, List[str]]] = None, prog: Optional[str] = Non
 
 def get_instances_subclass_of_values_from_Wikidata(qid) -> List:
     ret_val = []
-    user_agent = "RQSSFramework Python/%s.%s" % (
-        sys.version_info[0], sys.version_info[1])
-    sparql = SPARQLWrapper(
-        "https://query.wikidata.org/sparql", agent=user_agent)
     print('\t Getting instances or subclasses of value: ', qid)
-    sparql.setQuery(
-        '''SELECT DISTINCT (REPLACE(STR(?item),".*Q","Q") AS ?to_ret) WHERE{{
-  {{wd:{0} wdt:P279+ ?item.}}
-  UNION{{
-    wd:{0} wdt:P31/wdt:279* ?item.
-  }}
-}}'''.format(qid))
     try:
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-        for result in results["results"]["bindings"]:
-            query_value = result["to_ret"]["value"]
-            ret_val.append(query_value)
+        ret_val = get_query_values(WIKIDATA_ENDPOINT, RQSS_QUERIES['get_instances_subclass_of_values_wikimedia'].format(qid), result_format='json')
     except Exception as e:
         print('\t\t ERROR: ', e)
     return ret_val
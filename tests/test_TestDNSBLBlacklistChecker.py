@@ -1,11 +1,30 @@
+import asyncio
 import csv
+import os
+import tempfile
+import sqlite3
 import unittest
 from re import S
-from unittest import result
+from unittest import mock, result
 
+import aiodns
 from rdflib import URIRef
-from RQSSFramework.Reputation.DNSBLBlacklistedChecking import \
-    DNSBLBlacklistedChecker
+from RQSSFramework.Reputation.DNSBLBlacklistedChecking import (
+    CachedDNSBLDomainChecker, DNSBLBlacklistedChecker)
+from RQSSFramework.utils.dnsbl_cache import CachedAnswer, DNSBLCache
+
+
+class ListingResolver:
+    """
+    answer the DNSBL queries of the spam.example.com domain and count the queries
+    """
+    queries = 0
+
+    async def query(self, name, query_type):
+        self.queries += 1
+        if name.startswith('spam.example.com.'):
+            return [CachedAnswer('127.0.1.2', 300)]
+        raise aiodns.error.DNSError(aiodns.error.ARES_ENOTFOUND, 'Domain name not found')
 
 
 class TestLicensing(unittest.TestCase):
@@ -45,3 +64,59 @@ class TestLicensing(unittest.TestCase):
             for result in test_class.results:
                 row = [result._asdict()[field] for field in result._fields]
                 w.writerow(row)
+
+    def test_cache(self):
+        """
+        Test that the cached answers give the same results without any query
+        """
+        domains = ['spam.example.com', 'example.org', 'spam.example.com']
+
+        async def check(cache, resolver):
+            checker = CachedDNSBLDomainChecker(cache, loop=asyncio.get_running_loop())
+            checker._resolver = resolver
+            return [i.blacklisted for i in await asyncio.gather(*[checker.check_async(d) for d in domains])]
+
+        with tempfile.TemporaryDirectory() as directory:
+            # 4 DNSBL providers per domain, and the unlisted names expire with the negative TTL of their run
+            for negative_ttl, queries in [(0, 8), (60, 4), (60, 0)]:
+                with self.subTest(negative_ttl=negative_ttl):
+                    cache = DNSBLCache(os.path.join(directory, 'dnsbl.db'), negative_ttl)
+                    resolver = ListingResolver()
+                    results = asyncio.run(check(cache, resolver))
+                    cache.close()
+                    self.assertEqual(results, [True, False, True])
+                    self.assertEqual(resolver.queries, queries)
+            cache = DNSBLCache(os.path.join(directory, 'dnsbl.db'))
+            self.assertEqual([i.host for i in cache.get('spam.example.com.dbl.spamhaus.org')], ['127.0.1.2'])
+            self.assertEqual(cache.get('example.org.dbl.spamhaus.org'), [])
+            self.assertIsNone(cache.get('other.org.dbl.spamhaus.org'))
+            cache.close()
+
+    def test_shared_cache(self):
+        """
+        Test that a cache write does not lock the cache of the other
+        processes, and that a cache error is a miss
+        """
+        domains = ['spam.example.com', 'example.org']
+
+        async def check(cache, resolver):
+            checker = CachedDNSBLDomainChecker(cache, loop=asyncio.get_running_loop())
+            checker._resolver = resolver
+            return [i.blacklisted for i in await asyncio.gather(*[checker.check_async(d) for d in domains])]
+
+        with tempfile.TemporaryDirectory() as directory:
+            first = DNSBLCache(os.path.join(directory, 'dnsbl.db'))
+            second = DNSBLCache(os.path.join(directory, 'dnsbl.db'))
+            first.put('example.org.dbl.spamhaus.org', None)
+            second._connection.execute('PRAGMA busy_timeout = 0')
+            second.put('example.net.dbl.spamhaus.org', None)
+            self.assertEqual(second.get('example.org.dbl.spamhaus.org'), [])
+
+            error = sqlite3.OperationalError('database is locked')
+            with mock.patch.object(first, 'get', side_effect=error), \
+                    mock.patch.object(first, 'put', side_effect=error):
+                resolver = ListingResolver()
+                self.assertEqual(asyncio.run(check(first, resolver)), [True, False])
+                self.assertEqual(resolver.queries, 8)
+            first.close()
+            second.close()
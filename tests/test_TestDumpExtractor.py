@@ -0,0 +1,246 @@
+import bz2
+import gzip
+import io
+import os
+import queue
+import tempfile
+import unittest
+import zlib
+
+from rdflib import BNode, Graph, Literal, Namespace, RDF, URIRef
+
+from RQSSFramework.DumpExtractor import (_QUERY_METHODS, TurtleParser,
+                                        _iter_bgzf_chunk_lines,
+                                        _iter_plain_chunk_lines,
+                                        _put_chunk_tasks, aggregate_dump,
+                                        get_bgzf_block_offsets,
+                                        iter_ntriples, parse_ntriples_line)
+from RQSSFramework.Queries import RQSS_QUERIES
+
+WD = Namespace('http://www.wikidata.org/entity/')
+WDT = Namespace('http://www.wikidata.org/prop/direct/')
+P = Namespace('http://www.wikidata.org/prop/')
+PS = Namespace('http://www.wikidata.org/prop/statement/')
+PR = Namespace('http://www.wikidata.org/prop/reference/')
+PRV = Namespace('http://www.wikidata.org/prop/reference/value/')
+S = Namespace('http://www.wikidata.org/entity/statement/')
+REF = Namespace('http://www.wikidata.org/reference/')
+WDV = Namespace('http://www.wikidata.org/value/')
+WIKIBASE = Namespace('http://wikiba.se/ontology#')
+PROV = Namespace('http://www.w3.org/ns/prov#')
+
+
+def get_test_graph() -> Graph:
+    graph = Graph()
+    for prefix, namespace in [('wd', WD), ('wdt', WDT), ('p', P), ('ps', PS), ('pr', PR), ('prv', PRV), ('s', S),
+                              ('wdref', REF), ('wdv', WDV), ('wikibase', WIKIBASE), ('prov', PROV)]:
+        graph.bind(prefix, namespace)
+    graph.add((WD.Q1, RDF.type, WIKIBASE.Item))
+    graph.add((WD.Q1, WDT.P31, WD.Q5))
+    graph.add((WD.Q1, WDT.P31, WD.Q215627))
+    graph.add((WD.Q2, RDF.type, WIKIBASE.Item))
+    graph.add((WD.Q5, WDT.P279, WD.Q215627))
+    graph.add((WD.Q215627, WDT.P279, WD.Q35120))
+    statements = [(WD.Q1, 'P21', S['Q1-a'], [REF.r1, REF.r2]),
+                  (WD.Q1, 'P569', S['Q1-b'], [REF.r1]),
+                  (WD.Q2, 'P17', S['Q2-a'], [REF.r3]),
+                  (WD.Q2, 'P31', S['Q2-b'], [])]
+    for item, prop, statement, refs in statements:
+        graph.add((item, P[prop], statement))
+        graph.add((statement, RDF.type, WIKIBASE.Statement))
+        graph.add((statement, PS[prop], WD.Q6581097))
+        for ref in refs:
+            graph.add((statement, PROV.wasDerivedFrom, ref))
+    for ref in [REF.r1, REF.r2, REF.r3]:
+        graph.add((ref, RDF.type, WIKIBASE.Reference))
+    graph.add((REF.r1, PR.P248, WD.Q36578))
+    graph.add((REF.r1, PR.P854, URIRef('http://example.org/source?id=1')))
+    graph.add((REF.r1, PR.P813, Literal('2020-01-01T00:00:00Z')))
+    graph.add((REF.r1, PRV.P813, WDV.t1))
+    graph.add((WDV.t1, RDF.type, WIKIBASE.TimeValue))
+    graph.add((REF.r2, PR.P143, WD.Q328))
+    graph.add((REF.r2, PR.P4656, URIRef('https://en.wikipedia.org/wiki/Page')))
+    graph.add((REF.r2, PR.P1476, Literal('A "quoted"\ntitle', lang='en')))
+    graph.add((REF.r3, PR.P854, URIRef('http://example.org/source?id=1')))
+    graph.add((REF.r3, PR.P1545, Literal(3)))
+    return graph
+
+
+def write_bgzf(path: str, data: bytes, block_size: int) -> None:
+    """
+    write the data in BGZF blocks of block_size uncompressed bytes, like bgzip
+    """
+    with open(path, 'wb') as bgzf:
+        # the last block is the empty EOF block
+        for start in list(range(0, len(data), block_size)) + [len(data)]:
+            block = data[start:start + block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            compressed = compressor.compress(block) + compressor.flush()
+            bgzf.write(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' +
+                       (len(compressed) + 25).to_bytes(2, 'little') + compressed +
+                       zlib.crc32(block).to_bytes(4, 'little') + len(block).to_bytes(4, 'little'))
+
+
+def get_rows(rows) -> list:
+    return sorted([str(value) for value in row if value is not None] for row in rows)
+
+
+class TestDumpExtractor(unittest.TestCase):
+    def setUp(self):
+        self.graph = get_test_graph()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_dump(self, name: str, rdf_format: str) -> str:
+        path = os.path.join(self.tmp.name, name)
+        data = self.graph.serialize(format=rdf_format, encoding='utf-8')
+        with (gzip.open(path, 'wb') if path.endswith('.gz') else open(path, 'wb')) as dump:
+            dump.write(data)
+        return path
+
+    def test_parse_ntriples_line(self):
+        """
+        Test that IRIs, blank nodes and literals of N-Triples lines are parsed
+        """
+        self.assertEqual(parse_ntriples_line(
+            '<http://a> <http://b> "x \\"y\\""@en .\n'), ('http://a', 'http://b', '"x "y"'))
+        self.assertEqual(parse_ntriples_line(
+            '_:b0 <http://b> "42"^^<http://www.w3.org/2001/XMLSchema#integer>.'), ('_:b0', 'http://b', '"42'))
+        self.assertEqual(parse_ntriples_line(
+            '<http://a> <http://b> _:b1 . # comment'), ('http://a', 'http://b', '_:b1'))
+        self.assertEqual(parse_ntriples_line('# comment'), None)
+        self.assertRaises(ValueError, parse_ntriples_line, '<http://a> <http://b> .')
+        self.assertEqual(len(list(iter_ntriples(
+            ['<http://a> <http://b> <http://c> .', 'malformed', '']))), 1)
+
+    def test_turtle_parser(self):
+        """
+        Test that the Turtle abbreviations are parsed to the same triples of rdflib
+        """
+        document = '''
+@prefix wd: <http://www.wikidata.org/entity/> .
+PREFIX pr: <http://www.wikidata.org/prop/reference/>
+@base <http://example.org/> .
+wd:Q1 a wd:Q5 ;
+    pr:P1 wd:Q2, <relative> ;
+    pr:P2 "a\\tb"@en, """long
+"string"."""@en , 'single'^^<http://www.w3.org/2001/XMLSchema#string> ;
+    pr:P3 -1.5, 42, true ; .
+'''
+        expected = {(str(s), str(p), str(o) if not isinstance(o, Literal) else '"' + str(o))
+                    for s, p, o in Graph().parse(data=document, format='turtle')}
+        triples = list(TurtleParser(io.StringIO(document)).triples())
+        self.assertEqual(set(triples), expected)
+        self.assertEqual(len(triples), len(expected))
+
+        triples = list(TurtleParser(io.StringIO(
+            '<http://a> <http://b> [ <http://c> <http://d> ] .')).triples())
+        self.assertEqual(triples[0][2], triples[1][0])
+        self.assertTrue(triples[0][2].startswith('_:'))
+
+    def test_queries_equal_to_sparql(self):
+        """
+        Test that the extraction queries over the aggregated dumps have the same rows of the SPARQL queries
+        """
+        for name, rdf_format in [('dump.nt', 'nt'), ('dump.nt.gz', 'nt'), ('dump.ttl', 'ttl')]:
+            dump = aggregate_dump(self.write_dump(
+                name, 'nt' if rdf_format == 'nt' else 'turtle'), rdf_format)
+            for query_name in _QUERY_METHODS:
+                with self.subTest(dump=name, query=query_name):
+                    # the parenthesized GROUP BY is not supported by rdflib
+                    query = RQSS_QUERIES[query_name].replace(
+                        'GROUP BY (?refProperty)', 'GROUP BY ?refProperty')
+                    self.assertEqual(get_rows(dump.get_query_rows(RQSS_QUERIES[query_name])),
+                                     get_rows(self.graph.query(query)))
+
+    def test_shared_references(self):
+        """
+        Test that the repeated triples of the shared reference nodes are counted once
+        """
+        path = self.write_dump('dump.nt', 'nt')
+        with open(path, encoding='utf-8') as dump:
+            lines = dump.readlines()
+        with open(path, 'a', encoding='utf-8') as dump:
+            dump.writelines(i for i in lines if '/reference/r1' in i)
+        query = RQSS_QUERIES['get_num_of_reference_triples_wikimedia']
+        self.assertEqual(get_rows(aggregate_dump(path, 'nt').get_query_rows(
+            query)), get_rows(self.graph.query(query)))
+
+    def test_unsupported_query(self):
+        dump = aggregate_dump(self.write_dump('dump.nt', 'nt'), 'nt')
+        self.assertRaises(ValueError, dump.get_query_rows,
+                          RQSS_QUERIES['test_query'])
+
+    def test_chunk_lines(self):
+        """
+        Test that every line of the N-Triples dumps is in exactly one chunk
+        """
+        data = self.graph.serialize(format='nt', encoding='utf-8')
+        plain = os.path.join(self.tmp.name, 'dump.nt')
+        with open(plain, 'wb') as dump:
+            dump.write(data)
+        bgzf = os.path.join(self.tmp.name, 'dump.nt.gz')
+        write_bgzf(bgzf, data, 50)
+        self.assertEqual(gzip.open(bgzf).read(), data)
+        self.assertIsNone(get_bgzf_block_offsets(
+            self.write_dump('other.nt.gz', 'nt')))
+
+        lines = data.decode('utf-8').splitlines()
+        for path in [plain, bgzf]:
+            for chunk_size in [1, 37, 200, len(data)]:
+                with self.subTest(path=path, chunk_size=chunk_size):
+                    tasks = queue.Queue()
+                    _put_chunk_tasks(path, tasks, chunk_size)
+                    chunk_lines = []
+                    while not tasks.empty():
+                        kind, args = tasks.get()
+                        chunk_lines += [i.rstrip('\n') for i in (_iter_plain_chunk_lines(*args)
+                                        if kind == 'plain' else _iter_bgzf_chunk_lines(*args))]
+                    self.assertEqual(chunk_lines, lines)
+
+    def test_parallel_equal_to_sequential(self):
+        """
+        Test that the merged aggregates of the chunks have the same rows of the one-pass aggregation
+        """
+        data = self.graph.serialize(format='nt', encoding='utf-8')
+        expected = aggregate_dump(self.write_dump('dump.nt', 'nt'), 'nt')
+        paths = [os.path.join(self.tmp.name, i) for i in [
+            'dump.nt', 'dump.bgzf.nt.gz', 'dump.nt.gz', 'dump.nt.bz2']]
+        write_bgzf(paths[1], data, 100)
+        with gzip.open(paths[2], 'wb') as dump:
+            dump.write(data)
+        with bz2.open(paths[3], 'wb') as dump:
+            dump.write(data)
+        for path in paths:
+            dump = aggregate_dump(path, 'nt', jobs=3, chunk_size=300)
+            for query_name in _QUERY_METHODS:
+                with self.subTest(path=path, query=query_name):
+                    query = RQSS_QUERIES[query_name]
+                    self.assertEqual(get_rows(dump.get_query_rows(query)),
+                                     get_rows(expected.get_query_rows(query)))
+
+    def test_blank_node_counts(self):
+        """
+        Test that the blank reference nodes and values are counted like the SPARQL queries
+        """
+        ref = BNode()
+        self.graph.add((S['Q2-b'], PROV.wasDerivedFrom, ref))
+        self.graph.add((ref, RDF.type, WIKIBASE.Reference))
+        self.graph.add((ref, PR.P50, BNode()))
+        self.graph.add((REF.r3, PR.P50, BNode()))
+        path = self.write_dump('dump.nt', 'nt')
+        # the triples of the blank reference node before its type and prov:wasDerivedFrom
+        with open(path, encoding='utf-8') as dump:
+            lines = sorted(dump.readlines(), key=lambda line: not (
+                line.startswith('_:') and '#type>' not in line))
+        with open(path, 'w', encoding='utf-8') as dump:
+            dump.writelines(lines)
+        dump = aggregate_dump(path, 'nt')
+        for query_name in ['get_num_of_provWasDerivedFrom_wikimedia', 'get_num_of_ref_predicate_wikimedia', 'get_num_of_ref_value_wikimedia',
+                           'get_num_of_BN_provWasDerivedFrom_wikimedia', 'get_num_of_BN_ref_predicate_wikimedia', 'get_num_of_BN_ref_value_wikimedia']:
+            with self.subTest(query=query_name):
+                query = RQSS_QUERIES[query_name]
+                self.assertEqual(get_rows(dump.get_query_rows(query)),
+                                 get_rows(self.graph.query(query)))
@@ -45,3 +45,16 @@ class TestExternalURIsFreshness(unittest.TestCase):
                 row = ['<None>' if result._asdict()[field] == None else result._asdict()[
                     field] for field in result._fields]
                 w.writerow(row)
+
+    def test_join_of_duplicated_uris(self):
+        """
+        Test that each freshness is joined with the volatilities of its URI in their order, up to the first None volatility
+        """
+        uri = URIRef('https://uboat.net/boats/u558.htm')
+        other = URIRef('https://uboat.net/boats/u136.htm')
+        test_class = ExternalURIsTimelinessChecker(
+            [FreshnessOfURI(uri, 0.5), FreshnessOfURI(other, 0.2), FreshnessOfURI(URIRef('https://other.org/'), 0.2)],
+            [VolatilityOfURI(uri, 0.8), VolatilityOfURI(other, 0.1), VolatilityOfURI(uri, 0.4),
+             VolatilityOfURI(uri, None), VolatilityOfURI(uri, 0.9)])
+        self.assertEqual(test_class.check_external_uris_timeliness(), [
+            TimelinessOfURI(uri, 0.625), TimelinessOfURI(uri, 1.0), TimelinessOfURI(uri, None), TimelinessOfURI(other, 1.0)])
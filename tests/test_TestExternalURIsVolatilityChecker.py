@@ -1,10 +1,57 @@
 import csv
+import gzip
+import os
+import random
+import tempfile
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest import result
 
 from rdflib import URIRef
+from RQSSFramework.utils.sitemaps import (SitemapIndex, SitemapRequest,
+                                          harvest_sitemaps)
 from RQSSFramework.Volatility.ExternalURIsVolatilityChecking import *
 
+SITEMAP_INDEX = '''<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>{0}/news.xml</loc><lastmod>{1}</lastmod></sitemap>
+  <sitemap><loc>{0}/books.xml.gz</loc><lastmod>2020-01-01</lastmod></sitemap>
+</sitemapindex>'''
+
+URLSET = '''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{0}</urlset>'''
+
+
+class SitemapHandler(BaseHTTPRequestHandler):
+    """
+    serve the robots.txt, sitemap index and sitemaps of the server, or the
+    error status of the files which are a status. The requested paths are
+    counted
+    """
+
+    def do_GET(self):
+        self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+        if self.path not in self.server.files:
+            self.send_error(404)
+            return
+        if isinstance(self.server.files[self.path], int):
+            self.send_error(self.server.files[self.path])
+            return
+        body = self.server.files[self.path]
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalVolatilityChecker(ExternalURIsVolatilityChecker):
+    def domain_extractor(self, uri):
+        return 'http://' + urlparse(uri).netloc
+
 
 class TestExternalURIsVolatility(unittest.TestCase):
 
@@ -40,3 +87,149 @@ class TestExternalURIsVolatility(unittest.TestCase):
                 row = ['<None>' if result._asdict()[field] == None else result._asdict()[
                     field] for field in result._fields]
                 w.writerow(row)
+
+    def test_sitemap_index(self):
+        """
+        Test that the sitemaps are harvested into the index and only the changed sitemaps are requested again
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SitemapHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+
+        def set_files(news_lastmod, news_frequency):
+            server.requests = {}
+            server.files = {
+                '/robots.txt': 'User-agent: *\nSitemap: /sitemap_index.xml\n'.encode(),
+                '/sitemap_index.xml': SITEMAP_INDEX.format(base, news_lastmod).encode(),
+                '/news.xml': URLSET.format(''.join('<url><loc>{0}/news/{1}</loc><changefreq>{2}</changefreq></url>'.format(
+                    base, i, news_frequency) for i in range(1000))).encode(),
+                '/books.xml.gz': gzip.compress(URLSET.format(
+                    '<url><loc>{0}/books/1</loc><changefreq>yearly</changefreq></url>'
+                    '<url><loc>{0}/books/2</loc></url>'.format(base)).encode())}
+
+        uris = [base + '/news/12', base + '/books/1', base + '/books/2', base + '/other', base + '/news/999']
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                index_file = os.path.join(directory, 'sitemaps.db')
+                for lastmod, frequency, expected, requested in [
+                        ('2020-01-01', 'daily', [0.8, 0.1, None, None, 0.8], ['/news.xml', '/books.xml.gz']),
+                        ('2020-01-01', 'hourly', [0.8, 0.1, None, None, 0.8], []),
+                        ('2020-02-01', 'hourly', [0.9, 0.1, None, None, 0.9], ['/news.xml'])]:
+                    with self.subTest(lastmod=lastmod, frequency=frequency):
+                        set_files(lastmod, frequency)
+                        checker = LocalVolatilityChecker(uris, sitemap_index=index_file)
+                        self.assertEqual([i.volatility for i in checker.check_external_uris_volatility()], expected)
+                        self.assertEqual(sorted(i for i in server.requests if i in ['/news.xml', '/books.xml.gz']),
+                                         sorted(requested))
+                index = SitemapIndex(index_file)
+                self.assertEqual(index.count_pages(base), 1002)
+                index.close()
+                # without an index, the pages are harvested in a temporary file
+                self.assertEqual([i.volatility for i in LocalVolatilityChecker(uris).check_external_uris_volatility()],
+                                 [0.9, 0.1, None, None, 0.9])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_shared_pages(self):
+        """
+        Test that a page listed in two sitemaps is still found when one of them
+        is harvested again without it
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SitemapHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+        index_xml = '<sitemapindex><sitemap><loc>{0}/a.xml</loc><lastmod>{1}</lastmod></sitemap>' \
+                    '<sitemap><loc>{0}/b.xml</loc><lastmod>2020-01-01</lastmod></sitemap></sitemapindex>'
+        page = '<url><loc>{0}/{1}</loc><changefreq>{2}</changefreq></url>'
+
+        uris = [base + '/shared', base + '/a', base + '/b']
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                index_file = os.path.join(directory, 'sitemaps.db')
+                for lastmod, a_pages, expected, requested in [
+                        ('2020-01-01', ['shared', 'a'], [0.8, 0.8, 0.6], ['/a.xml', '/b.xml']),
+                        ('2020-02-01', ['a'], [0.6, 0.8, 0.6], ['/a.xml'])]:
+                    with self.subTest(lastmod=lastmod):
+                        server.requests = {}
+                        server.files = {
+                            '/robots.txt': 'Sitemap: /index.xml\n'.encode(),
+                            '/index.xml': index_xml.format(base, lastmod).encode(),
+                            '/a.xml': URLSET.format(''.join(page.format(base, i, 'daily') for i in a_pages)).encode(),
+                            '/b.xml': URLSET.format(''.join(page.format(base, i, 'weekly') for i in ['b', 'shared'])).encode()}
+                        checker = LocalVolatilityChecker(uris, sitemap_index=index_file)
+                        self.assertEqual([i.volatility for i in checker.check_external_uris_volatility()], expected)
+                        self.assertEqual(sorted(i for i in server.requests if i in ['/a.xml', '/b.xml']), requested)
+                index = SitemapIndex(index_file)
+                self.assertEqual(index.count_pages(base), 3)
+                index.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_failed_sitemaps(self):
+        """
+        Test that the pages of the sitemaps which fail for a moment are kept, and
+        removed only when the sitemaps are not found or not listed anymore
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SitemapHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+        robots = 'Sitemap: /a.xml\nSitemap: /b.xml\n'.encode()
+        sitemaps = {'/a.xml': URLSET.format('<url><loc>{0}/a</loc></url>'.format(base)).encode(),
+                    '/b.xml': URLSET.format('<url><loc>{0}/b</loc></url>'.format(base)).encode()}
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                index_file = os.path.join(directory, 'sitemaps.db')
+                for failed, pages in [({}, [base + '/a', base + '/b']),
+                                      ({'/b.xml': 503}, [base + '/a', base + '/b']),
+                                      ({'/robots.txt': 503, '/a.xml': 503}, [base + '/a', base + '/b']),
+                                      ({'/b.xml': 404}, [base + '/a']),
+                                      ({'/robots.txt': 'Sitemap: /b.xml\n'.encode()}, [base + '/b'])]:
+                    with self.subTest(failed=failed):
+                        server.requests = {}
+                        server.files = dict(sitemaps, **{'/robots.txt': robots})
+                        server.files.update(failed)
+                        index = SitemapIndex(index_file)
+                        harvest_sitemaps([base], index)
+                        self.assertEqual([i[0] for i in index.get_pages(base)], pages)
+                        index.close()
+                        # the stored sitemaps are requested instead of the known paths when robots.txt fails
+                        self.assertNotIn('/sitemap.xml', server.requests)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_find_page(self):
+        """
+        Test that the pages found in the index are the first pages which contain the URIs
+        """
+        rnd = random.Random(7)
+        domain = 'https://example.org'
+        paths = ['/a', '/a/b', '/ab', '/b', '/a?x=1', '/é', '/a/b/c']
+
+        def get_page():
+            page = domain + rnd.choice(paths)
+            if rnd.random() < 0.2:
+                # an archived or redirected page which embeds a URL
+                page = rnd.choice(['https://web.archive.org/web/2020/', domain + '/go?to=']) + page
+            return page
+
+        pages = [(get_page(), rnd.choice(['daily', 'yearly', None])) for _ in range(300)]
+        uris = [domain + i for i in paths] + [domain, domain + '/c', 'example.org/a', 'ftp://example.org/a']
+        with tempfile.TemporaryDirectory() as directory:
+            index = SitemapIndex(os.path.join(directory, 'sitemaps.db'))
+            for i in range(0, len(pages), 100):
+                index.put_sitemap(SitemapRequest('{0}/sitemap{1}.xml'.format(domain, i), domain), pages[i:i + 100])
+            # the order of the pages does not depend on the order of the harvests
+            index.put_sitemap(SitemapRequest(domain + '/sitemap0.xml', domain), pages[:100])
+            pages = list(index.get_pages(domain))
+            for uri in uris:
+                with self.subTest(uri=uri):
+                    expected = next((i for i in pages if uri in i[0]), None)
+                    if index.can_find_page(uri):
+                        self.assertEqual(index.find_page(domain, uri), expected)
+                    checker = ExternalURIsVolatilityChecker([uri])
+                    self.assertEqual(checker._get_domain_volatilities(index, domain, [uri]).get(uri),
+                                     checker._get_page_volatility(expected[1]) if expected else None)
+            index.close()
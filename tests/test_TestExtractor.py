@@ -0,0 +1,179 @@
+import csv
+import os
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from rdflib import Graph, Literal, Namespace as RDFNamespace
+
+from RQSSFramework.DumpExtractor import _QUERY_METHODS
+from RQSSFramework.Queries import RQSS_QUERIES
+from RQSSFramework.RQSS_Extractor import (EXTRACTIONS,
+                                          extract_reference_subgraph,
+                                          get_extraction_resource,
+                                          get_paged_query,
+                                          perform_paged_query,
+                                          write_query_results)
+from test_TestDumpExtractor import get_rows, get_test_graph
+
+PROV = RDFNamespace('http://www.w3.org/ns/prov#')
+PR = RDFNamespace('http://www.wikidata.org/prop/reference/')
+REF = RDFNamespace('http://www.wikidata.org/reference/')
+ST = RDFNamespace('http://www.wikidata.org/entity/statement/')
+
+TEST_QUERY = '''
+PREFIX prov: <http://www.w3.org/ns/prov#>
+SELECT DISTINCT (REPLACE(STR(?refProp),".*P","P") AS ?to_ret1) ?to_ret2 WHERE {
+  ?statement prov:wasDerivedFrom ?ref .
+  ?ref ?refProp ?to_ret2 .
+  FILTER (isLiteral(?to_ret2))
+}
+'''
+
+
+class SPARQLHandler(BaseHTTPRequestHandler):
+    """
+    a minimal SPARQL endpoint over the graph of the server. The server fails
+    the requests after its fail_after number of requests
+    """
+
+    def do_GET(self):
+        self.send_results(parse_qs(urlparse(self.path).query)['query'][0])
+
+    def do_POST(self):
+        self.send_results(parse_qs(self.rfile.read(
+            int(self.headers['Content-Length'])).decode('utf-8'))['query'][0])
+
+    def send_results(self, query):
+        self.server.requests += 1
+        if self.server.fail_after is not None and self.server.requests > self.server.fail_after:
+            self.send_error(500)
+            return
+        body = self.server.graph.query(query).serialize(format='json')
+        self.send_response(200)
+        self.send_header(
+            'Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestExtractor(unittest.TestCase):
+    def setUp(self):
+        graph = Graph()
+        for i in range(25):
+            graph.add((ST['s{0}'.format(i)], PROV.wasDerivedFrom,
+                      REF['r{0}'.format(i)]))
+            graph.add((REF['r{0}'.format(i)], PR.P854,
+                      Literal('value {0}'.format(i))))
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SPARQLHandler)
+        self.server.graph = graph
+        self.server.requests = 0
+        self.server.fail_after = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = 'http://127.0.0.1:{0}/sparql'.format(
+            self.server.server_address[1])
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def read_rows(self, file):
+        with open(file, newline='') as file_handler:
+            return list(csv.reader(file_handler))
+
+    def test_get_paged_query(self):
+        """
+        Test that the prefixes are kept and the page is ordered and limited
+        """
+        query = get_paged_query(TEST_QUERY, 10, 20)
+        self.assertTrue(query.startswith(
+            'PREFIX prov: <http://www.w3.org/ns/prov#>'))
+        self.assertIn('ORDER BY ?refProp ?to_ret1 ?to_ret2', query)
+        self.assertIn('LIMIT 10\nOFFSET 20', query)
+
+    def test_paged_results_equal_to_unpaged(self):
+        """
+        Test that the paged extraction writes the same rows of the one-shot extraction
+        """
+        unpaged = os.path.join(self.tmp.name, 'unpaged.data')
+        paged = os.path.join(self.tmp.name, 'paged.data')
+        write_query_results(Namespace(endpoint=self.endpoint,
+                            dump=None, page_size=None, result_format='json'), TEST_QUERY, unpaged)
+        self.assertEqual(write_query_results(Namespace(
+            endpoint=self.endpoint, dump=None, page_size=10, result_format='json'), TEST_QUERY, paged), 0)
+        self.assertEqual(len(self.read_rows(paged)), 25)
+        self.assertEqual(sorted(self.read_rows(paged)),
+                         sorted(self.read_rows(unpaged)))
+        self.assertFalse(os.path.exists(paged + '.progress'))
+
+    def test_resume(self):
+        """
+        Test that an interrupted paged extraction resumes from its last written page
+        """
+        output_file = os.path.join(self.tmp.name, 'paged.data')
+        self.server.fail_after = 2
+        self.assertEqual(perform_paged_query(
+            self.endpoint, TEST_QUERY, output_file, 10), 1)
+        self.assertEqual(len(self.read_rows(output_file)), 20)
+        self.assertTrue(os.path.exists(output_file + '.progress'))
+
+        self.server.fail_after = None
+        self.server.requests = 0
+        self.assertEqual(perform_paged_query(
+            self.endpoint, TEST_QUERY, output_file, 10), 0)
+        # only the last page is requested again
+        self.assertEqual(self.server.requests, 1)
+        rows = self.read_rows(output_file)
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(len(set(map(tuple, rows))), 25)
+        self.assertFalse(os.path.exists(output_file + '.progress'))
+
+    def test_single_pass(self):
+        """
+        Test that the aggregates of the reference subgraph query have the same rows of the SPARQL queries
+        """
+        graph = get_test_graph()
+        self.server.graph = graph
+        for page_size in [None, 4]:
+            opts = Namespace(endpoint=self.endpoint, output_dir=self.tmp.name,
+                             dump=None, page_size=page_size, result_format='json')
+            self.assertEqual(extract_reference_subgraph(opts), 0)
+            for query_name in _QUERY_METHODS:
+                query = RQSS_QUERIES[query_name].replace(
+                    'GROUP BY (?refProperty)', 'GROUP BY ?refProperty')
+                if not opts.dump.supports_query(RQSS_QUERIES[query_name]):
+                    self.assertIn(query_name, [
+                        'get_fact_ref_triples_wikimedia', 'get_item_refed_facts_wikimedia',
+                        'get_classes_and_facts', 'get_statement_fact_refed_props_wikimedia',
+                        'get_class_hierarchy_wikimedia'])
+                    continue
+                with self.subTest(page_size=page_size, query=query_name):
+                    self.assertEqual(get_rows(opts.dump.get_query_rows(RQSS_QUERIES[query_name])),
+                                     get_rows(graph.query(query)))
+
+    def test_extraction_resources(self):
+        """
+        Test that only the extractions whose queries are sent to the endpoint are limited by its resource
+        """
+        self.server.graph = get_test_graph()
+        opts = Namespace(endpoint=self.endpoint, output_dir=self.tmp.name,
+                         dump=None, page_size=None, result_format='json')
+        extractions = {i.option: i for i in EXTRACTIONS}
+        self.assertTrue(all(i in RQSS_QUERIES for extraction in EXTRACTIONS for i in extraction.queries))
+        self.assertEqual({get_extraction_resource(opts, i) for i in EXTRACTIONS},
+                         {self.endpoint, 'https://www.wikidata.org'})
+        self.assertEqual(extract_reference_subgraph(opts), 0)
+        for option, resource in [('external_uris', None), ('blank_nodes', None), ('amount_of_data', None),
+                                 ('fact_ref_triples', self.endpoint), ('class_hierarchy', self.endpoint),
+                                 ('wikidata_eschema_data', 'https://www.wikidata.org')]:
+            with self.subTest(option=option):
+                self.assertEqual(get_extraction_resource(opts, extractions[option]), resource)
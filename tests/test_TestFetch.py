@@ -0,0 +1,327 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from RQSSFramework.Availability.DereferencePossibility import \
+    DerefrenceExplorer
+from RQSSFramework.Currency.ExternalURIsFreshnessChecking import \
+    ExternalURIsFreshnessChecker
+from RQSSFramework.Licensing.LicenseExistanceChecking import (LicenseChecker,
+                                                             LicenseScanner)
+from RQSSFramework.Security.TLSExistanceChecking import TLSChecker
+from RQSSFramework.utils.fetch import (SCAN_CHUNK_SIZE, FetchEngine,
+                                       FetchOptions, fetch_all)
+from RQSSFramework.utils import probes
+from RQSSFramework.utils.http_cache import HTTPCache
+from RQSSFramework.utils.probes import (ProbeStore, add_probe_requests,
+                                        get_domain_roots, get_https_uris,
+                                        probe_uris)
+from RQSSFramework.Versatility.MultilingualSourcesAndFactsChecking import \
+    MultilingualFactsAndSourcesChecker
+
+
+# the license of the page is after the first chunks of the page
+BIG_PAGE = ('<html lang="en">' + 'x' * (3 * SCAN_CHUNK_SIZE - 5) + ' Apache License, Version 2.0 '
+            + 'y' * (16 * SCAN_CHUNK_SIZE) + '</html>').encode('utf-8')
+BIG_PAGE_LICENSE = BIG_PAGE.index(b'Apache')
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    answer /ok/... with a licensed page, /big/... with a large page whose
+    license is far from its start, /slow/... after the delay of the
+    server and the other paths with 404. The conditional requests of the
+    ETag of the pages are answered with 304. The server keeps the maximum
+    number of concurrent requests
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.send_page(False)
+
+    def do_GET(self):
+        self.send_page(True)
+
+    def send_page(self, send_body):
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.active += 1
+            self.server.max_active = max(
+                self.server.max_active, self.server.active)
+        try:
+            if self.path.startswith('/slow/'):
+                time.sleep(self.server.delay)
+            body = b'<html lang="fr"><a href="https://creativecommons.org/licenses/by/4.0/">CC</a></html>'
+            if self.path.startswith('/big/'):
+                body = BIG_PAGE
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200 if self.path.startswith(
+                ('/ok/', '/big/', '/slow/')) else 404)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Last-Modified', 'Mon, 01 Jun 2020 10:00:00 GMT')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading the page
+            self.close_connection = True
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestFetch(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.active = 0
+        self.server.max_active = 0
+        self.server.delay = 0.1
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_results_in_order(self):
+        """
+        Test that the results are in the order of the URLs and the failures are kept as errors
+        """
+        urls = [self.base + '/ok/1', self.base + '/missing', 'no-scheme.org/page',
+                'http://127.0.0.1:1/refused', self.base + '/ok/2']
+        results = fetch_all(urls, read_body=True)
+        self.assertEqual([i.url for i in results], urls)
+        self.assertEqual([i.status for i in results], [200, 404, None, None, 200])
+        self.assertIsNotNone(results[2].error)
+        self.assertIsNotNone(results[3].error)
+        self.assertIn('lang="fr"', results[0].text())
+
+        results = fetch_all(urls[:1], 'HEAD')
+        self.assertIsNone(results[0].body)
+        self.assertEqual(results[0].headers.get('Last-Modified'), 'Mon, 01 Jun 2020 10:00:00 GMT')
+
+    def test_per_host_limit(self):
+        """
+        Test that the requests of a host are limited and concurrent up to its limit
+        """
+        urls = [self.base + '/slow/{0}'.format(i) for i in range(12)]
+        start_time = time.perf_counter()
+        results = fetch_all(urls, options=FetchOptions(max_connections_per_host=3))
+        duration = time.perf_counter() - start_time
+        self.assertTrue(all(i.ok for i in results))
+        self.assertEqual(self.server.max_active, 3)
+        # 4 rounds of 3 concurrent requests instead of 12 sequential requests
+        self.assertLess(duration, 12 * self.server.delay)
+
+    def test_read_timeout(self):
+        self.server.delay = 2
+        results = fetch_all([self.base + '/slow/1'], options=FetchOptions(read_timeout=0.2))
+        self.assertIsNone(results[0].status)
+        self.assertIsNotNone(results[0].error)
+
+    def test_checkers(self):
+        """
+        Test that the checkers get their results from the fetched pages
+        """
+        deref_checker = DerefrenceExplorer(
+            [self.base + '/ok/1', self.base + '/missing', self.base + '/ok/1'])
+        self.assertEqual([i.deref for i in deref_checker.check_dereferencies()], [True, False])
+        lic_checker = LicenseChecker([self.base + '/ok/1'])
+        # the licensing checker requests the https:// home page of the domain
+        lic_checker._domains = [self.base + '/ok/home']
+        self.assertEqual([i.license for i in lic_checker.check_license_existance()], [True])
+
+    def test_probe_store(self):
+        """
+        Test that the checkers derive the same results from the probed URIs, which are requested once
+        """
+        uris = [self.base + '/ok/1', self.base + '/missing', self.base + '/ok/2']
+        with tempfile.TemporaryDirectory() as directory:
+            requests = {}
+            add_probe_requests(requests, uris, read_body=True)
+            add_probe_requests(requests, get_https_uris(uris))
+            add_probe_requests(requests, get_domain_roots(uris), verify_ssl=False, read_body=True)
+            store = ProbeStore(os.path.join(directory, 'probes.db'), new=True)
+            probe_uris(requests, store, max_body=20)
+            self.assertEqual(len(store), len(requests))
+            # the https:// URLs fail at the TLS handshake with the test server
+            self.assertEqual(self.server.requests, len(uris))
+            self.assertIsNone(store.get(get_https_uris(uris)[0]).status)
+            self.assertEqual(store.get(uris[0]).body, b'<html lang="fr"><a h')
+            self.assertEqual(store.get(uris[0]).headers.get('last-modified'), 'Mon, 01 Jun 2020 10:00:00 GMT')
+            self.assertIsNone(store.get(self.base + '/other').status)
+
+            self.server.requests = 0
+            self.assertEqual(DerefrenceExplorer(uris, probes=store).check_dereferencies(),
+                             DerefrenceExplorer(uris).check_dereferencies())
+            self.assertEqual([i.support for i in TLSChecker(uris, probes=store).check_support_tls()],
+                             [False, False, False])
+            self.assertEqual([i.license for i in LicenseChecker(uris, probes=store).check_license_existance()],
+                             [False])
+            freshness = ExternalURIsFreshnessChecker(uris, probes=store).check_external_uris_freshness()
+            self.assertEqual([i.uri for i in freshness if i.freshness_last_modif is not None], uris)
+            freshness = ExternalURIsFreshnessChecker(uris).check_external_uris_freshness()
+            self.assertEqual([i.uri for i in freshness if i.freshness_last_modif is not None], uris)
+            self.assertEqual(MultilingualFactsAndSourcesChecker({'s1': uris[:1]}, probes=store)._extract_html_lang_attributes(uris),
+                             [['fr'], ['fr'], ['fr']])
+            # only the checkers without the store requested the URIs
+            self.assertEqual(self.server.requests, 2 * len(uris))
+            store.close()
+
+    def test_probe_store_verify_ssl(self):
+        """
+        Test that the https:// URL of the security metric and the domain root
+        of the licensing metric are probed and stored apart when they are the
+        same URL, since only the licensing metric skips the certificate checks
+        """
+        uris = [self.base]
+        root = get_domain_roots(uris)[0]
+        self.assertEqual(get_https_uris(uris), [root])
+        with tempfile.TemporaryDirectory() as directory:
+            requests = {}
+            add_probe_requests(requests, get_https_uris(uris))
+            add_probe_requests(requests, get_domain_roots(uris), verify_ssl=False, read_body=True)
+            self.assertEqual(requests, {(root, True): (True, False), (root, False): (False, True)})
+
+            store = ProbeStore(os.path.join(directory, 'probes.db'), new=True)
+            fetch_all = probes.FetchEngine.fetch_all
+            with mock.patch.object(probes.FetchEngine, 'fetch_all', autospec=True, side_effect=fetch_all) as fetches:
+                probe_uris(requests, store)
+            self.assertEqual(sorted((list(i.args[1]), i.kwargs['verify_ssl']) for i in fetches.call_args_list),
+                             [([root], False), ([root], True)])
+            self.assertEqual(len(store), 2)
+
+            with mock.patch.object(store, 'get', wraps=store.get) as gets:
+                LicenseChecker(uris, probes=store).check_license_existance()
+                TLSChecker(uris, probes=store).check_support_tls()
+            self.assertEqual([i.args for i in gets.call_args_list], [(root, False), (root, True)])
+            store.close()
+
+    def test_http_cache(self):
+        """
+        Test that the cached responses are used while fresh and revalidated with 304 when expired
+        """
+        urls = [self.base + '/ok/1', self.base + '/missing', 'http://127.0.0.1:1/refused']
+        with tempfile.TemporaryDirectory() as directory:
+            cache_file = os.path.join(directory, 'cache.db')
+            expected = fetch_all(urls, read_body=True)
+            self.server.requests = 0
+            for options, requests, body in [(FetchOptions(cache_file=cache_file), 2, True),
+                                            (FetchOptions(cache_file=cache_file), 0, True),
+                                            # the bodies are not cached for HEAD requests
+                                            (FetchOptions(cache_file=cache_file), 2, False),
+                                            (FetchOptions(cache_file=cache_file, cache_ttl=0, cache_revalidate=True), 2, True),
+                                            (FetchOptions(cache_file=cache_file, cache_ttl=0), 2, True)]:
+                with self.subTest(options=options, body=body):
+                    engine = FetchEngine(options)
+                    results = engine.fetch_all(urls, read_body=body) if body else engine.fetch_all(urls, 'HEAD')
+                    self.assertEqual(self.server.requests, requests)
+                    self.server.requests = 0
+                    self.assertEqual([i.status for i in results], [i.status for i in expected])
+                    self.assertEqual([i.body for i in results], [i.body if body else None for i in expected])
+                    self.assertEqual(results[0].headers.get('etag'), '"v1"')
+            self.assertEqual((engine._cache.hits, engine._cache.revalidated, engine._cache.misses), (0, 0, 2))
+            engine = FetchEngine(FetchOptions(cache_file=cache_file, cache_ttl=0, cache_revalidate=True))
+            engine.fetch_all(urls, read_body=True)
+            self.assertEqual((engine._cache.hits, engine._cache.revalidated, engine._cache.misses), (0, 2, 0))
+
+    def test_http_cache_keeps_body(self):
+        """
+        Test that a response without body does not drop the cached body of the same URL and status
+        """
+        url = self.base + '/ok/1'
+        with tempfile.TemporaryDirectory() as directory:
+            cache_file = os.path.join(directory, 'cache.db')
+            expected = fetch_all([url], read_body=True)[0].body
+            FetchEngine(FetchOptions(cache_file=cache_file)).fetch_all([url], read_body=True)
+            FetchEngine(FetchOptions(cache_file=cache_file, cache_ttl=0)).fetch_all([url])
+            self.server.requests = 0
+            results = FetchEngine(FetchOptions(cache_file=cache_file)).fetch_all([url], read_body=True)
+            self.assertEqual((self.server.requests, results[0].body), (0, expected))
+
+            cache = HTTPCache(cache_file)
+            cache.put('GET', url, True, 404, [], None)
+            self.assertIsNone(cache.get('GET', url, True, True).body)
+            cache.close()
+
+    def test_shared_http_cache(self):
+        """
+        Test that a cache write does not lock the cache of the other
+        processes, and that a cache error is not a failed request
+        """
+        urls = [self.base + '/ok/1', self.base + '/ok/2']
+        with tempfile.TemporaryDirectory() as directory:
+            cache_file = os.path.join(directory, 'cache.db')
+            first, second = HTTPCache(cache_file), HTTPCache(cache_file)
+            first.put('GET', urls[0], True, 200, [], b'page')
+            second._connection.execute('PRAGMA busy_timeout = 0')
+            second.put('GET', urls[1], True, 200, [], b'page')
+            first.close()
+            second.close()
+
+            engine = FetchEngine(FetchOptions(cache_file=cache_file, cache_ttl=0))
+            error = sqlite3.OperationalError('database is locked')
+            with mock.patch.object(engine._cache, 'get', side_effect=error), \
+                    mock.patch.object(engine._cache, 'put', side_effect=error):
+                results = engine.fetch_all(urls, read_body=True)
+            self.assertEqual([(i.status, i.error) for i in results], [(200, None), (200, None)])
+
+    def test_license_scanner(self):
+        """
+        Test that the keywords across the chunks are found, in the charset of the page
+        """
+        for charset in ['utf-8', 'utf-16']:
+            with self.subTest(charset=charset):
+                page = 'é <p>GNU Affero General Public License</p>'.encode(charset)
+                # the last chunk starts in the middle of 'License' (and of its 'n' in UTF-16 with its BOM)
+                end = len(page) - len('nse</p>'.encode(charset)) + 1
+                scanner = LicenseScanner({'Content-Type': 'text/html; charset=' + charset})
+                # the chunks split the characters and the keyword
+                self.assertFalse(any(scanner.feed(page[i:min(i + 3, end)]) for i in range(0, end, 3)))
+                self.assertFalse(scanner.result)
+                self.assertTrue(scanner.feed(page[end:]))
+                self.assertTrue(scanner.result)
+        scanner = LicenseScanner({})
+        self.assertFalse(scanner.feed(b'the ibm public license'[:-1]))
+        self.assertTrue(scanner.feed(b'e'))
+
+    def test_license_scan_limit(self):
+        """
+        Test that the pages are scanned up to the byte cap and their download stops at the first keyword
+        """
+        urls = [self.base + '/big/1', self.base + '/ok/1', self.base + '/missing']
+        for max_body, expected in [(BIG_PAGE_LICENSE, [False, True, False]),
+                                   (BIG_PAGE_LICENSE + 100, [True, True, False])]:
+            with self.subTest(max_body=max_body):
+                checker = LicenseChecker([], max_body=max_body)
+                checker._domains = urls
+                self.assertEqual([i.license for i in checker.check_license_existance()], expected)
+        with tempfile.TemporaryDirectory() as directory:
+            engine = FetchEngine(FetchOptions(cache_file=os.path.join(directory, 'cache.db')))
+            self.assertEqual([i.scanned for i in engine.fetch_all(urls[:1], scan=LicenseScanner)], [True])
+            cached = engine._cache.get('GET', urls[0], True, True)
+            self.assertFalse(cached.complete)
+            self.assertLess(len(cached.body), len(BIG_PAGE) // 2)
+            # the cached part of the page is enough for the scanner, but not for reading the page
+            self.server.requests = 0
+            engine = FetchEngine(FetchOptions(cache_file=os.path.join(directory, 'cache.db')))
+            self.assertEqual([i.scanned for i in engine.fetch_all(urls[:1], scan=LicenseScanner)], [True])
+            self.assertEqual([i.body for i in engine.fetch_all(urls[:1], read_body=True)], [BIG_PAGE])
+            self.assertEqual((engine._cache.hits, engine._cache.misses, self.server.requests), (1, 1, 1))
+            self.assertTrue(engine._cache.get('GET', urls[0], True, True).complete)
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import time
+import unittest
+
+from RQSSFramework.utils.scheduler import JobScheduler
+
+
+def sleep_job(seconds: float) -> int:
+    time.sleep(seconds)
+    return 0
+
+
+def failing_job(exit_code: int) -> int:
+    return exit_code
+
+
+def raising_job() -> int:
+    raise ValueError('test error')
+
+
+def writing_job(seconds: float, output_file: str) -> int:
+    time.sleep(seconds)
+    with open(output_file, 'w') as f:
+        f.write(str(time.time()))
+    return 0
+
+
+def reading_job(output_file: str, *input_files: str) -> int:
+    # fails if any of the inputs is not written yet
+    with open(output_file, 'w') as f:
+        for input_file in input_files:
+            with open(input_file) as i:
+                f.write(i.read() + '\n')
+    return 0
+
+
+class TestJobScheduler(unittest.TestCase):
+
+    def test_not_computed(self):
+        """
+        Test the type of a non computed class be NoneType
+        """
+        test_class = JobScheduler(2)
+        self.assertEqual(test_class.results, None)
+        self.assertEqual(test_class.failed, None)
+
+    def test_parallel_run(self):
+        """
+        Test that the jobs are actually running at the same time
+        """
+        test_class = JobScheduler(3)
+        for i in range(3):
+            test_class.add_job('sleep_{0}'.format(i), sleep_job, 1)
+        start_time = time.perf_counter()
+        results = test_class.run()
+        self.assertLess(time.perf_counter() - start_time, 2.5)
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertEqual(result.exit_code, 0)
+            self.assertGreaterEqual(result.duration, 1)
+
+    def test_concurrency_limit(self):
+        """
+        Test that no more than max_workers jobs are running at the same time
+        """
+        test_class = JobScheduler(1)
+        for i in range(3):
+            test_class.add_job('sleep_{0}'.format(i), sleep_job, 0.5)
+        start_time = time.perf_counter()
+        test_class.run()
+        self.assertGreaterEqual(time.perf_counter() - start_time, 1.5)
+
+    def test_exit_codes(self):
+        """
+        Test that exit codes of the jobs are collected in the added order
+        """
+        test_class = JobScheduler(2)
+        test_class.add_job('sleep', sleep_job, 0.1)
+        test_class.add_job('failing', failing_job, 2)
+        test_class.add_job('raising', raising_job)
+        results = test_class.run()
+        self.assertEqual([i.name for i in results],
+                         ['sleep', 'failing', 'raising'])
+        self.assertEqual([i.exit_code for i in results], [0, 2, 1])
+        self.assertEqual([i.name for i in test_class.failed],
+                         ['failing', 'raising'])
+
+    def test_dependencies(self):
+        """
+        Test that a job starts after the jobs that write its inputs
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            first = os.path.join(tmp, 'first.csv')
+            second = os.path.join(tmp, 'second.csv')
+            third = os.path.join(tmp, 'third.csv')
+            test_class = JobScheduler(3)
+            # the dependent job is added first on purpose
+            test_class.add_job('reading', reading_job, third, first, second,
+                               inputs=[first, second], outputs=[third])
+            test_class.add_job('writing_1', writing_job, 0.5, first,
+                               outputs=[first])
+            test_class.add_job('writing_2', writing_job, 0.5, second,
+                               outputs=[second])
+            start_time = time.perf_counter()
+            results = test_class.run()
+            # the two writers run at the same time
+            self.assertLess(time.perf_counter() - start_time, 1.5)
+            self.assertEqual([i.exit_code for i in results], [0, 0, 0])
+            self.assertTrue(os.path.isfile(third))
+
+    def test_failed_dependency(self):
+        """
+        Test that a job is skipped if a job that writes its inputs fails
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            first = os.path.join(tmp, 'first.csv')
+            second = os.path.join(tmp, 'second.csv')
+            test_class = JobScheduler(2)
+            test_class.add_job('failing', failing_job, 3, outputs=[first])
+            test_class.add_job('reading', reading_job, second, first,
+                               inputs=[first], outputs=[second])
+            results = test_class.run()
+            self.assertEqual([i.exit_code for i in results], [3, None])
+            self.assertEqual([i.name for i in test_class.failed],
+                             ['failing', 'reading'])
+            self.assertFalse(os.path.isfile(second))
+
+    def test_resource_limit(self):
+        """
+        Test that no more than the limit of a resource jobs use it at the same time
+        """
+        test_class = JobScheduler(4, resource_limits={'endpoint': 2})
+        for i in range(4):
+            test_class.add_job('sleep_{0}'.format(i), sleep_job, 0.5,
+                               resource='endpoint')
+        test_class.add_job('other', sleep_job, 0.5, resource='other')
+        start_time = time.perf_counter()
+        results = test_class.run()
+        self.assertGreaterEqual(time.perf_counter() - start_time, 1)
+        self.assertLess(time.perf_counter() - start_time, 1.8)
+        self.assertEqual([i.exit_code for i in results], [0, 0, 0, 0, 0])
@@ -1,5 +1,7 @@
 import csv
+import math
 import unittest
+from unittest import mock
 
 from RQSSFramework.Accuracy.LiteralSyntaxChecking import \
     WikibaseRefLiteralSyntaxChecker
@@ -30,3 +32,21 @@ class TestLiteralSyntaxChecking(unittest.TestCase):
             for result in test_class.results:
                 row = [result._asdict()[field] for field in result._fields]
                 w.writerow(row)
+
+    def test_check_literals_regex_given_regexes(self):
+        data = {'P356': ['10.1234/a', 'doi:10.1/x', '10.1234/a', ''] * 5,
+                'P1476': ['A title'],
+                'P2093': ['Author', ' Author', 'Author']}
+        regexes = {'P356': [r'10\.\d{4,9}/[^\s]+'],
+                   'P1476': [],
+                   'P2093': [r'[^\s].*[^\s]', '(', '[']}
+        with mock.patch('RQSSFramework.Accuracy.LiteralSyntaxChecking.LITERALS_CHUNK_SIZE', 1):
+            results = WikibaseRefLiteralSyntaxChecker(
+                data, regexes).check_literals_regex()
+            parallel_results = WikibaseRefLiteralSyntaxChecker(
+                data, regexes, jobs=2).check_literals_regex()
+        self.assertEqual(results[0], ('P356', 20, 10, 0, 1))
+        self.assertEqual(results[1][:2], ('P1476', 1))
+        self.assertTrue(math.isnan(results[1].fails))
+        self.assertEqual(results[2], ('P2093', 3, 1, 2, 3))
+        self.assertEqual(str(parallel_results), str(results))
@@ -105,3 +105,22 @@ class TestRefPropertiesCompletenessChecking(unittest.TestCase):
             for result in test_class.results:
                 row = [result._asdict()[field] for field in result._fields]
                 w.writerow(row)
+
+    def test_grouped_counts_equal_to_filters(self):
+        """
+        Test that the counts of the grouped rows are the counts of filtering the rows of each fact and reference property
+        """
+        for data in [self.data, self.data_2, self.data_3]:
+            test_class = PropertyCompletenessChecker(data)
+            df = test_class._df
+            expected = []
+            for fact, refs in test_class._get_distinct_fact_and_ref_predicates().items():
+                for ref in refs:
+                    expected.append(PropertyCompletenessResult(
+                        fact, ref,
+                        len(df.loc[(df['fact'] == fact) & ~(df['ref_predicate'].isna())].drop_duplicates('statement_id')),
+                        len(df.loc[(df['fact'] == fact)].drop_duplicates('statement_id')),
+                        len(df.loc[(df['fact'] == fact) & (df['ref_predicate'] == ref)].drop_duplicates('statement_id'))))
+            self.assertEqual(test_class.check_property_completeness_Wikidata(), expected)
+        self.assertIn(PropertyCompletenessResult('P31', 'P407', 5, 6, 2), PropertyCompletenessChecker(
+            self.data).check_property_completeness_Wikidata())
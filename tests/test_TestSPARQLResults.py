@@ -0,0 +1,527 @@
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import requests
+from rdflib import Graph
+from RQSSFramework.Consistency.RefPropertiesConsistencyChecking import (
+    PropConsistencyResult, RefPropertiesConsistencyChecker)
+from RQSSFramework.Queries import RQSS_QUERIES
+from RQSSFramework.Understandability.HumanReadableMetadataChecking import (
+    HumanReadableMetadataChecker, HumanReadableMetadataResult)
+from RQSSFramework.Verifiability.TypeofSourcesChecking import (
+    SourceVerifiabilityScore, TypeOfSourcesChecker)
+from RQSSFramework.utils.query_cache import QueryCache, normalize_query
+from RQSSFramework.utils.sparql import (WIKIDATA_ENDPOINT, RateLimiter,
+                                        SPARQLClient, decode_tsv_term,
+                                        get_batched_query_values,
+                                        get_query_values, get_retry_after,
+                                        iter_query_rows, map_queries,
+                                        set_client)
+
+TEST_RESULTS = {
+    'text/tab-separated-values': '?s\t?o\n'
+    '<http://www.wikidata.org/entity/Q42>\t"Douglas \\"DNA\\" Adams"@en\n'
+    '<http://www.wikidata.org/entity/Q5>\t\n'
+    '_:b0\t"1952-03-11T00:00:00Z"^^<http://www.w3.org/2001/XMLSchema#dateTime>\n',
+    'text/csv': 's,o\r\n'
+    'http://www.wikidata.org/entity/Q42,"Douglas ""DNA"" Adams"\r\n'
+    'http://www.wikidata.org/entity/Q5,\r\n'
+    '_:b0,1952-03-11T00:00:00Z\r\n',
+    'application/sparql-results+json': '{"head":{"vars":["s","o"]},"results":{"bindings":['
+    '{"s":{"type":"uri","value":"http://www.wikidata.org/entity/Q42"},"o":{"type":"literal","xml:lang":"en","value":"Douglas \\"DNA\\" Adams"}},'
+    '{"s":{"type":"uri","value":"http://www.wikidata.org/entity/Q5"}},'
+    '{"s":{"type":"bnode","value":"b0"},"o":{"type":"literal","value":"1952-03-11T00:00:00Z"}}]}}',
+}
+
+
+class ResultsHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        content_type = self.headers['Accept']
+        body = TEST_RESULTS[content_type].encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+WDQS_PREFIXES = '''
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX p: <http://www.wikidata.org/prop/>
+PREFIX pq: <http://www.wikidata.org/prop/qualifier/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX schema: <http://schema.org/>
+'''
+
+TEST_GRAPH = WDQS_PREFIXES + '''
+wd:P854 wdt:P1628 <http://schema.org/url>, <http://purl.org/dc/terms/source> ;
+    rdfs:label "reference URL"@en, "URL de référence"@fr, "Referenz-URL"@de ;
+    schema:description "URL of the source"@en ;
+    p:P2302 [ pq:P5314 wd:Q54828450 ], [ pq:P1793 "https?://.+" ] .
+wd:P248 rdfs:label "stated in"@en ;
+    p:P2302 [ pq:P1793 "Q[1-9][0-9]*" ], [ pq:P1793 "[A-Z].*" ] .
+wd:P813 rdfs:label "date de consultation"@fr ;
+    schema:description "date de consultation"@fr .
+wd:Q1 wdt:P31 wd:Q13442814 .
+wd:Q2 wdt:P31 wd:Q571 .
+'''
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """
+    answer the first server.throttled requests with 429 Too Many Requests
+    """
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests += 1
+        if self.server.requests <= self.server.throttled:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = TEST_RESULTS['application/sparql-results+json'].encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def map_endpoint_queries(endpoint: str, limiter: RateLimiter) -> None:
+    """
+    the queries of a metric process, each one in flight in its own thread
+    """
+    set_client(SPARQLClient(endpoint, limiter=limiter, concurrency=5))
+    values = map_queries(lambda i: get_query_values(
+        WIKIDATA_ENDPOINT, 'ASK {0}'.format(i), result_format='json'), range(10))
+    if values != [['ASK {0}'.format(i)] for i in range(10)]:
+        raise ValueError(values)
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """
+    answer each query with its text as ?to_ret after a delay, and record
+    the most queries in flight at the same time
+    """
+
+    def do_POST(self):
+        query = parse_qs(self.rfile.read(
+            int(self.headers['Content-Length'])).decode('utf-8'))['query'][0]
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(
+                self.server.max_in_flight, self.server.in_flight)
+        time.sleep(0.05)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        body = json.dumps({'head': {'vars': ['to_ret']}, 'results': {'bindings': [
+            {'to_ret': {'type': 'literal', 'value': query}}]}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    """
+    a SPARQL endpoint of the test graph, with the prefixes of WDQS. The
+    queries with a VALUES clause fail if the server fails_batches
+    """
+    # the SPARQL parser of rdflib is not thread-safe
+    query_lock = threading.Lock()
+
+    def do_POST(self):
+        query = parse_qs(self.rfile.read(
+            int(self.headers['Content-Length'])).decode('utf-8'))['query'][0]
+        if self.server.fails_batches and 'VALUES' in query:
+            self.send_error(500)
+            return
+        with self.query_lock:
+            self.server.queries += 1
+            body = self.server.graph.query(
+                WDQS_PREFIXES + query).serialize(format='json')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSPARQLResults(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ResultsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = 'http://127.0.0.1:{0}/sparql'.format(
+            self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_decode_tsv_term(self):
+        """
+        Test that the TSV terms are decoded to the values of the JSON bindings
+        """
+        self.assertEqual(decode_tsv_term(''), None)
+        self.assertEqual(decode_tsv_term(
+            '<http://www.wikidata.org/entity/Q42>'), 'http://www.wikidata.org/entity/Q42')
+        self.assertEqual(decode_tsv_term('"a\\tb\\\\c"@en'), 'a\tb\\c')
+        self.assertEqual(decode_tsv_term(
+            '"42"^^<http://www.w3.org/2001/XMLSchema#integer>'), '42')
+        self.assertEqual(decode_tsv_term('"caf\\u00E9"'), 'café')
+        self.assertEqual(decode_tsv_term('_:b12'), 'b12')
+        self.assertEqual(decode_tsv_term('42'), '42')
+
+    def test_formats_equal_to_json(self):
+        """
+        Test that the rows of every results format are the same
+        """
+        expected = list(iter_query_rows(self.endpoint, 'SELECT', 'json'))
+        self.assertEqual(expected, [
+            ['http://www.wikidata.org/entity/Q42', 'Douglas "DNA" Adams'],
+            ['http://www.wikidata.org/entity/Q5'],
+            ['b0', '1952-03-11T00:00:00Z']])
+        for result_format in ['csv', 'tsv']:
+            self.assertEqual(
+                list(iter_query_rows(self.endpoint, 'SELECT', result_format)), expected)
+
+    def test_cached_formats(self):
+        """
+        Test that the cached results of every format are read like the received ones
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = QueryCache(os.path.join(temp_dir, 'queries.db'))
+            set_client(SPARQLClient(cache=cache))
+            try:
+                for result_format in ['json', 'csv', 'tsv']:
+                    expected = list(iter_query_rows(
+                        self.endpoint, 'SELECT  ?s ?o {}', result_format))
+                    self.assertEqual(list(iter_query_rows(
+                        self.endpoint, 'SELECT ?s\n?o {}', result_format)), expected)
+                self.assertEqual((cache.hits, cache.misses), (3, 3))
+            finally:
+                set_client(SPARQLClient())
+
+    def test_get_query_values(self):
+        """
+        Test that only the bound values of the variable are returned
+        """
+        for result_format in ['json', 'csv', 'tsv']:
+            self.assertEqual(get_query_values(self.endpoint, 'SELECT', 'o', result_format), [
+                'Douglas "DNA" Adams', '1952-03-11T00:00:00Z'])
+            self.assertEqual(get_query_values(
+                self.endpoint, 'SELECT', 'to_ret', result_format), [])
+
+
+class TestBatchedQueries(unittest.TestCase):
+    PROPERTIES = ['P854', 'P248', 'P813', 'P9999', 'P248']
+    QUERIES = [('get_property_equivalents_batch_Wikidata', 'get_property_equivalents_Wikidata'),
+               ('get_property_labels_batch_wikidata',
+                'get_property_labels_wikidata'),
+               ('get_property_comments_batch_wikidata',
+                'get_property_comments_wikidata'),
+               ('get_property_non_en_labels_batch_wikidata',
+                'get_property_non_en_labels_wikidata'),
+               ('get_property_non_en_comments_batch_wikidata',
+                'get_property_non_en_comments_wikidata'),
+               ('get_property_constraints_specificity_batch',
+                'get_property_constraints_specificity'),
+               ('get_property_constraints_regex_batch', 'get_property_constraints_regex')]
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GraphHandler)
+        self.server.graph = Graph().parse(data=TEST_GRAPH, format='turtle')
+        self.server.fails_batches = False
+        self.server.queries = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = 'http://127.0.0.1:{0}/sparql'.format(
+            self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_type_of_sources(self):
+        """
+        Test that the sources queried concurrently are scored in their order
+        """
+        # the checkers use the utils module of the RQSSFramework directory
+        checker_sparql = importlib.import_module('utils.sparql')
+        checker_sparql.set_client(checker_sparql.SPARQLClient(self.endpoint))
+        try:
+            sources = ['Q2', 'Q1', 'http://zenodo.org/record/1', 'Q3'] * 5
+            self.assertEqual(TypeOfSourcesChecker(sources, ['zenodo']).check_type_of_sources_wikidata(), [
+                SourceVerifiabilityScore('Q2', 0.5), SourceVerifiabilityScore('Q1', 1),
+                SourceVerifiabilityScore('http://zenodo.org/record/1', 0.75), SourceVerifiabilityScore('Q3', 0)] * 5)
+        finally:
+            checker_sparql.set_client(checker_sparql.SPARQLClient())
+
+    def get_single_values(self, single_query):
+        return {i: sorted(get_query_values(self.endpoint, RQSS_QUERIES[single_query].format(i), result_format='json'))
+                for i in self.PROPERTIES}
+
+    def test_batches_equal_to_single_queries(self):
+        """
+        Test that the values of the batched queries are the ones of the per-property queries
+        """
+        for batch_query, single_query in self.QUERIES:
+            expected = self.get_single_values(single_query)
+            self.server.queries = 0
+            values = get_batched_query_values(RQSS_QUERIES[batch_query], RQSS_QUERIES[single_query],
+                                              self.PROPERTIES, self.endpoint, batch_size=2)
+            self.assertEqual(list(values.keys()), ['P854', 'P248', 'P813', 'P9999'])
+            self.assertEqual(
+                {i: sorted(j) for i, j in values.items()}, expected, batch_query)
+            self.assertEqual(self.server.queries, 2)
+        self.assertEqual(get_batched_query_values(RQSS_QUERIES['get_property_labels_batch_wikidata'],
+                                                  RQSS_QUERIES['get_property_labels_wikidata'], self.PROPERTIES,
+                                                  self.endpoint)['P854'], ['3'])
+
+    def test_failed_batches(self):
+        """
+        Test that the properties of a failed batch are queried one by one,
+        and that the properties whose query fails have no values
+        """
+        expected = self.get_single_values('get_property_constraints_regex')
+        self.server.fails_batches = True
+        self.server.queries = 0
+        values = get_batched_query_values(RQSS_QUERIES['get_property_constraints_regex_batch'],
+                                          RQSS_QUERIES['get_property_constraints_regex'], self.PROPERTIES, self.endpoint)
+        self.assertEqual({i: sorted(j) for i, j in values.items()}, expected)
+        self.assertEqual(self.server.queries, 4)
+        values = get_batched_query_values(RQSS_QUERIES['get_property_constraints_regex_batch'], 'VALUES {0}',
+                                          ['P854', 'not an ID'], self.endpoint)
+        self.assertEqual(values, {'P854': None, 'not an ID': None})
+
+    def test_checkers(self):
+        """
+        Test that the checkers have one result per property
+        """
+        checker = HumanReadableMetadataChecker(self.PROPERTIES, self.endpoint)
+        self.assertEqual(checker.check_labels_comments_existance_from_Wikdiata(), [
+            HumanReadableMetadataResult('P854', 3, 1), HumanReadableMetadataResult(
+                'P248', 1, 0),
+            HumanReadableMetadataResult('P813', 1, 1), HumanReadableMetadataResult(
+                'P9999', 0, 0),
+            HumanReadableMetadataResult('P248', 1, 0)])
+        checker = RefPropertiesConsistencyChecker(
+            self.PROPERTIES, self.endpoint)
+        self.assertEqual(checker.check_reference_specificity_from_Wikdiata(), [
+            PropConsistencyResult('P854', True), PropConsistencyResult(
+                'P248', False),
+            PropConsistencyResult('P813', False), PropConsistencyResult(
+                'P9999', False),
+            PropConsistencyResult('P248', False)])
+
+
+class TestSPARQLClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+        self.server.requests = 0
+        self.server.throttled = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = 'http://127.0.0.1:{0}/sparql'.format(
+            self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_throttled_queries(self):
+        """
+        Test that the throttled queries are retried and counted
+        """
+        self.server.throttled = 2
+        client = SPARQLClient(max_retries=2, backoff=0.01)
+        with client.post(self.endpoint, 'SELECT', 'json') as response:
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual((client.queries, client.retried,
+                         client.failed, self.server.requests), (1, 2, 0, 3))
+        self.server.requests = 0
+        self.server.throttled = 10
+        with self.assertRaises(Exception):
+            client.post(self.endpoint, 'SELECT', 'json')
+        self.assertEqual((client.queries, client.retried,
+                         client.failed, self.server.requests), (2, 4, 1, 3))
+        self.assertEqual(repr(client), 'SPARQL client: 2 queries, 4 retried, 1 failed')
+        client.close()
+
+    def test_wikidata_mirror(self):
+        """
+        Test that the queries of WDQS are sent to the mirror
+        """
+        client = SPARQLClient(self.endpoint)
+        client.post(WIKIDATA_ENDPOINT, 'SELECT', 'json').close()
+        self.assertEqual(self.server.requests, 1)
+        client.close()
+
+    def test_rate_limiter(self):
+        """
+        Test that the queries are spaced by the rate
+        """
+        limiter = RateLimiter(50)
+        start = time.time()
+        for _ in range(6):
+            limiter.wait()
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        limiter.pause(0.1)
+        start = time.time()
+        limiter.wait()
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        start = time.time()
+        for _ in range(100):
+            RateLimiter().wait()
+        self.assertLess(time.time() - start, 1)
+
+    def test_get_retry_after(self):
+        """
+        Test that the seconds and HTTP dates of Retry-After are read
+        """
+        response = requests.Response()
+        self.assertEqual(get_retry_after(response), None)
+        response.headers['Retry-After'] = '120'
+        self.assertEqual(get_retry_after(response), 120)
+        response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(get_retry_after(response), 0)
+        response.headers['Retry-After'] = 'soon'
+        self.assertEqual(get_retry_after(response), None)
+
+    def test_query_cache(self):
+        """
+        Test that the repeated queries are read from the cache until they
+        are expired or invalidated
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'queries.db')
+            client = SPARQLClient(cache=QueryCache(path))
+            for query in ['SELECT ?s { wd:Q42 ?p ?o }', 'SELECT ?s\n{\n  wd:Q42   ?p ?o\n}']:
+                with client.post(self.endpoint, query, 'json') as response:
+                    self.assertEqual(response.json()['head']['vars'], ['s', 'o'])
+            self.assertEqual((client.queries, self.server.requests), (1, 1))
+            # the WDQS queries are cached with the endpoint they are sent to
+            client.wikidata_endpoint = self.endpoint
+            client.post(WIKIDATA_ENDPOINT, 'SELECT ?s { wd:Q42 ?p ?o }', 'json').close()
+            client.post(self.endpoint, 'SELECT ?s { wd:Q42 ?p ?o }', 'tsv').close()
+            self.assertEqual(self.server.requests, 2)
+            self.assertEqual(repr(client.cache), 'SPARQL cache: 2 hits, 2 queried')
+            client.close()
+
+            client = SPARQLClient(cache=QueryCache(path))
+            client.post(self.endpoint, 'SELECT ?s { wd:Q42 ?p ?o }', 'json').close()
+            self.assertEqual(self.server.requests, 2)
+            self.assertEqual(client.cache.invalidate('wd:Q5'), 0)
+            self.assertEqual(client.cache.invalidate('wd:Q42 ?p'), 2)
+            client.post(self.endpoint, 'SELECT ?s { wd:Q42 ?p ?o }', 'json').close()
+            self.assertEqual(self.server.requests, 3)
+            self.assertEqual(client.cache.invalidate(), 1)
+            client.close()
+
+            client = SPARQLClient(cache=QueryCache(path, ttl=0))
+            client.post(self.endpoint, 'SELECT ?s { wd:Q42 ?p ?o }', 'json').close()
+            self.assertEqual(self.server.requests, 4)
+            client.close()
+
+    def test_shared_query_cache(self):
+        """
+        Test that a cache write does not lock the cache of the other
+        processes, and that a cache error is a cache miss, not a failed query
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'queries.db')
+            first, second = QueryCache(path), QueryCache(path)
+            first.put(self.endpoint, 'SELECT ?s { wd:Q1 ?p ?o }', 'json', b'{}')
+            second._connection.execute('PRAGMA busy_timeout = 0')
+            second.put(self.endpoint, 'SELECT ?s { wd:Q2 ?p ?o }', 'json', b'{}')
+            self.assertEqual(first.get(self.endpoint, 'SELECT ?s { wd:Q2 ?p ?o }', 'json'), b'{}')
+            first.close()
+            second.close()
+
+            client = SPARQLClient(cache=QueryCache(path))
+            with mock.patch.object(client.cache, 'get', side_effect=sqlite3.OperationalError('database is locked')), \
+                    mock.patch.object(client.cache, 'put', side_effect=sqlite3.OperationalError('database is locked')):
+                with client.post(self.endpoint, 'SELECT ?s { wd:Q42 ?p ?o }', 'json') as response:
+                    self.assertEqual(response.json()['head']['vars'], ['s', 'o'])
+            self.assertEqual((client.queries, client.failed), (1, 0))
+            client.close()
+
+    def test_normalize_query(self):
+        """
+        Test that only the whitespaces out of the string literals are collapsed
+        """
+        self.assertEqual(normalize_query('  SELECT\t?s\n{ ?s  rdfs:label "a  b", \'c\\\'  d\' }\n'),
+                         'SELECT ?s { ?s rdfs:label "a  b", \'c\\\'  d\' }')
+        self.assertEqual(normalize_query('FILTER(REGEX(?v, """x\n  "y"  z"""))  .'),
+                         'FILTER(REGEX(?v, """x\n  "y"  z""")) .')
+
+    def test_map_queries(self):
+        """
+        Test that the queries are sent concurrently within the concurrency
+        of the endpoint, and their results are in the order of the items
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        server.lock = threading.Lock()
+        server.in_flight = server.max_in_flight = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = 'http://127.0.0.1:{0}/sparql'.format(server.server_address[1])
+        try:
+            self.assertEqual(SPARQLClient().get_concurrency(WIKIDATA_ENDPOINT), 5)
+            self.assertEqual(SPARQLClient(endpoint).get_concurrency(WIKIDATA_ENDPOINT), 32)
+            set_client(SPARQLClient(endpoint, concurrency=3))
+            values = map_queries(lambda i: get_query_values(
+                WIKIDATA_ENDPOINT, 'ASK {0}'.format(i), result_format='json'), range(20))
+            self.assertEqual(values, [['ASK {0}'.format(i)] for i in range(20)])
+            self.assertEqual(server.max_in_flight, 3)
+        finally:
+            set_client(SPARQLClient())
+            server.shutdown()
+            server.server_close()
+
+    def test_shared_concurrency(self):
+        """
+        Test that the metric processes sharing a limiter keep its concurrency of queries in flight together
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        server.lock = threading.Lock()
+        server.in_flight = server.max_in_flight = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = 'http://127.0.0.1:{0}/sparql'.format(server.server_address[1])
+        try:
+            limiter = RateLimiter(concurrency=2)
+            processes = [multiprocessing.Process(target=map_endpoint_queries, args=(endpoint, limiter))
+                         for _ in range(2)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            self.assertEqual([i.exitcode for i in processes], [0, 0])
+            self.assertEqual(server.max_in_flight, 2)
+        finally:
+            server.shutdown()
+            server.server_close()
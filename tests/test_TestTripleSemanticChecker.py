@@ -1,3 +1,4 @@
+import random
 import unittest
 from RQSSFramework.Accuracy.TripleSemanticChecking import RefTripleSemanticChecker, FactReference, TripleSemanticResult
 
@@ -33,5 +34,26 @@ class TestRefTripleSemanticChecking(unittest.TestCase):
                 self.assertEqual(result.full_matches,0)
                 self.assertEqual(result.score,0)
 
-
-        
+    def test_indexed_equal_to_pairwise(self):
+        """
+        Test that matching by the gold standard index counts the same matches of comparing every pair of triples
+        """
+        rnd = random.Random(0)
+        gold_standard = [FactReference('Q{0}'.format(rnd.randint(1, 20)), 'P{0}'.format(rnd.randint(1, 5)),
+                                       'P{0}'.format(rnd.randint(6, 8)), 'Q{0}'.format(rnd.randint(1, 4))) for i in range(100)]
+        data = [FactReference('Q{0}'.format(rnd.randint(1, 25)), 'P{0}'.format(rnd.randint(1, 6)),
+                              'P{0}'.format(rnd.randint(6, 9)), 'Q{0}'.format(rnd.randint(1, 4))) for i in range(1000)]
+        checker = RefTripleSemanticChecker(gold_standard, data)
+        expected = {}
+        for ref_triple in data:
+            visited_gs_facts = []
+            for fact_gs in gold_standard:
+                expected.setdefault(fact_gs.property, [0, 0])
+                if checker.is_sub_rel_match(ref_triple, fact_gs) and (fact_gs.subject, fact_gs.property, fact_gs.ref_property) not in visited_gs_facts:
+                    visited_gs_facts.append((fact_gs.subject, fact_gs.property, fact_gs.ref_property))
+                    expected[fact_gs.property][0] += 1
+                    if checker.is_triple_exact_match(ref_triple, fact_gs):
+                        expected[fact_gs.property][1] += 1
+        results = RefTripleSemanticChecker(gold_standard, iter(data)).check_semantic_to_gold_standard()
+        self.assertEqual(results, [TripleSemanticResult(prop, half, full) for prop, (half, full) in expected.items()])
+        self.assertEqual(RefTripleSemanticChecker(gold_standard, []).check_semantic_to_gold_standard(), [])
@@ -1,8 +1,18 @@
 import csv
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+from rdflib import Graph, Namespace
 
 from RQSSFramework.Consistency.TriplesRangeConsistencyChecking import \
     TriplesRangeConsistencyChecker
+from RQSSFramework.Queries import RQSS_QUERIES
+from RQSSFramework.utils.class_hierarchy import ClassHierarchyIndex
+
+WD = Namespace('http://www.wikidata.org/entity/')
+WDT = Namespace('http://www.wikidata.org/prop/direct/')
 
 
 class TestTripleRangeConsistencyChecking(unittest.TestCase):
@@ -35,3 +45,61 @@ class TestTripleRangeConsistencyChecking(unittest.TestCase):
             for result in test_class.results:
                 row = [result._asdict()[field] for field in result._fields]
                 w.writerow(row)
+
+    def test_check_each_distinct_value_once(self):
+        data = {'P248': ['Q1'] * 1000 + ['Q2'] * 10, 'P854': ['Q1', 'Q3']}
+        ranges = {'P248': ['Q5', 'Q6'], 'P854': ['Q5']}
+        with mock.patch('RQSSFramework.Consistency.TriplesRangeConsistencyChecking.get_query_values',
+                        side_effect=lambda endpoint, query, result_format: ['Q5'] if 'wd:Q1 ' in query else ['Q7']) as query:
+            test_class = TriplesRangeConsistencyChecker(data, ranges)
+            self.assertEqual(query.call_count, 3)
+        self.assertIsInstance(test_class._instances_subclass_of['Q1'], frozenset)
+        with mock.patch.object(test_class, 'check_range_value', wraps=test_class.check_range_value) as check:
+            results = test_class.check_all_value_ranges()
+        # Q1 is in the first range, Q2 and Q3 in none of them
+        self.assertEqual(check.call_count, 1 + 2 + 1 + 1)
+        self.assertEqual(results, [('P248', 1010, 10, 2), ('P854', 2, 1, 1)])
+
+
+class TestClassHierarchyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.edges = [('Q1', 'P31', 'Q5'), ('Q5', 'P279', 'Q215627'), ('Q215627', 'P279', 'Q35120'),
+                      ('Q35120', 'P279', 'Q215627'), ('Q2', 'P279', 'Q5'), ('Q3', 'P31', 'Q4')]
+        self.index = ClassHierarchyIndex()
+        for edge in self.edges:
+            self.index.add_edge(*edge)
+
+    def test_get_classes_equal_to_sparql(self):
+        """
+        Test that the classes of the index are the results of the get_instances_subclass_of_values_wikimedia query
+        """
+        graph = Graph()
+        for item, prop, item_class in self.edges:
+            graph.add((WD[item], WDT[prop], WD[item_class]))
+        for item in ['Q1', 'Q2', 'Q3', 'Q5', 'Q35120', 'Q6']:
+            with self.subTest(item=item):
+                rows = graph.query(RQSS_QUERIES['get_instances_subclass_of_values_wikimedia'].format(
+                    item), initNs={'wd': WD, 'wdt': WDT})
+                self.assertEqual(sorted(self.index.get_classes(item)), sorted(
+                    str(row[0]) for row in rows))
+
+    def test_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'class_hierarchy.data')
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerows(self.edges)
+            index = ClassHierarchyIndex.from_file(path, ['Q1', 'Q2'])
+        self.assertTrue(index.is_instance_or_subclass('Q1', 'Q35120'))
+        self.assertTrue(index.is_instance_or_subclass('Q2', 'Q5'))
+        self.assertFalse(index.is_instance_or_subclass('Q2', 'Q2'))
+        # only the instance of edges of the given items are kept
+        self.assertFalse(index.is_instance_or_subclass('Q3', 'Q4'))
+
+    def test_check_all_value_ranges(self):
+        data = {'P248': ['Q1', 'Q2', 'Q3', 'Q1'], 'P854': ['Q1']}
+        ranges = {'P248': ['Q35120', 'Q4'], 'P854': []}
+        results = TriplesRangeConsistencyChecker(
+            data, ranges, class_hierarchy=self.index).check_all_value_ranges()
+        self.assertEqual(results[0], ('P248', 4, 0, 2))
+        self.assertEqual(results[1][:2], ('P854', 1))